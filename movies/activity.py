@@ -0,0 +1,102 @@
+"""
+Rating activity over time: rating count and average per day or month,
+for the whole catalog, one movie or one genre.
+
+The aggregation is one GROUP BY over whole UTC days (timestamp / 86400)
+restricted to the requested range, so it reads only the index entries of
+that range:
+
+- catalog and genre: rating_ts_idx (timestamp, movie, rating) covers the
+  query, no table rows are read;
+- movie: rating_movie_ts_idx (movie, timestamp).
+
+Months are folded from the day buckets in Python (counts and rating sums
+add up), which keeps the SQL portable. Empty buckets are filled with zeros.
+"""
+from datetime import date, datetime, timedelta, timezone
+from django.db.models import Count, F, Max, Sum
+from .cache_utils import fetch, generational_key, model_scope
+from .models import Genre, Movie, Rating
+
+CACHE_TTL = 60 * 60 * 6
+DAY = 86400
+BUCKETS = ('day', 'month')
+DEFAULT_DAYS = 30
+
+
+def _day(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).date()
+
+
+def _timestamp(day):
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+
+
+def _bucket_start(day, bucket):
+    return day.replace(day=1) if bucket == 'month' else day
+
+
+def _next_bucket(start, bucket):
+    if bucket == 'day':
+        return start + timedelta(days=1)
+    return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def default_range():
+    """The DEFAULT_DAYS days up to the newest rating (one index lookup), or None."""
+    newest = Rating.objects.aggregate(ts=Max('timestamp'))['ts']
+    if newest is None:
+        return None
+    end = _day(newest)
+    return end - timedelta(days=DEFAULT_DAYS - 1), end
+
+
+def _daily(start, end, movie_id, genre_id):
+    ratings = Rating.objects.filter(timestamp__gte=_timestamp(start), timestamp__lt=_timestamp(end) + DAY)
+    if movie_id is not None:
+        ratings = ratings.filter(movie_id=movie_id)
+    if genre_id is not None:
+        ratings = ratings.filter(movie__genres=genre_id)
+    rows = (
+        ratings.order_by()
+        .values(day=F('timestamp') / DAY)
+        .annotate(count=Count('id'), total=Sum('rating'))
+        .values_list('day', 'count', 'total')
+    )
+    return {date(1970, 1, 1) + timedelta(days=int(day)): (count, total) for day, count, total in rows}
+
+
+def _compute(start, end, bucket, movie_id, genre_id):
+    buckets = {}
+    for day, (count, total) in _daily(start, end, movie_id, genre_id).items():
+        key = _bucket_start(day, bucket)
+        n, s = buckets.get(key, (0, 0.0))
+        buckets[key] = (n + count, s + total)
+
+    series = []
+    current = _bucket_start(start, bucket)
+    while current <= end:
+        count, total = buckets.get(current, (0, 0.0))
+        series.append({
+            'bucket': current.isoformat() if bucket == 'day' else current.strftime('%Y-%m'),
+            'count': count,
+            'average': round(total / count, 4) if count else None,
+        })
+        current = _next_bucket(current, bucket)
+    return series
+
+
+def rating_activity(start, end, bucket='day', movie_id=None, genre_id=None):
+    """
+    Rating count and average per bucket for the UTC days start..end
+    (inclusive). Returns (series, cache outcome).
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(bucket)
+    scopes = [model_scope(Rating)]
+    if genre_id is not None:
+        # Genre membership is read through movie.genres: a movie's genres
+        # changing bumps the Movie scope, a genre's deletion the Genre scope
+        scopes += [model_scope(Movie), model_scope(Genre)]
+    key = generational_key(f'activity:{bucket}:{start}:{end}:{movie_id}:{genre_id}', *scopes)
+    return fetch(key, lambda: _compute(start, end, bucket, movie_id, genre_id), CACHE_TTL)
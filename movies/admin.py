@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Movie, Rating, Tag, Link, Genre
+from .models import Movie, Rating, Tag, Link, Genre, MovieStats
 
 
 @admin.register(Genre)
@@ -37,3 +37,10 @@ class TagAdmin(admin.ModelAdmin):
 class LinkAdmin(admin.ModelAdmin):
     list_display = ['movie', 'imdb_id', 'tmdb_id']
     search_fields = ['movie__title', 'imdb_id', 'tmdb_id']
+
+
+@admin.register(MovieStats)
+class MovieStatsAdmin(admin.ModelAdmin):
+    list_display = ['movie', 'count', 'average', 'min_rating', 'max_rating']
+    search_fields = ['movie__title']
+    raw_id_fields = ['movie']
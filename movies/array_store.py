@@ -0,0 +1,95 @@
+"""
+Versioned on-disk store for precomputed NumPy arrays (similarity tables,
+factor matrices, columnar snapshots).
+
+Each store lives in ANALYTICS_DIR/<name>/ as one directory per version
+holding plain .npy files, plus a manifest.json naming the current version.
+Writers fill a temporary directory, rename it to a new, never reused
+version name and then atomically replace the manifest, so readers never
+see a half-written store and mapped files are never overwritten. Readers
+open the arrays with mmap_mode='r': every worker process maps the same
+pages from the OS page cache instead of holding its own copy.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+
+KEEP_VERSIONS = 2
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def store_dir(name):
+    return Path(settings.ANALYTICS_DIR) / name
+
+
+def _new_version():
+    # Sortable by creation time, and unique even for several saves per second
+    # from one process (version directories must never be rewritten: readers
+    # may have their files memory-mapped)
+    seconds, nanoseconds = divmod(time.time_ns(), 10**9)
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(seconds))
+    return f'{stamp}-{nanoseconds:09d}-{uuid.uuid4().hex[:8]}'
+
+
+def save_arrays(name, arrays, meta=None):
+    """Write a new version of a store and make it current."""
+    root = store_dir(name)
+    root.mkdir(parents=True, exist_ok=True)
+    version = _new_version()
+    # Filled under a temporary name, then renamed into place in one step
+    tmp_dir = root / f'.tmp-{version}'
+    tmp_dir.mkdir()
+    try:
+        for key, array in arrays.items():
+            np.save(tmp_dir / f'{key}.npy', array)
+        os.rename(tmp_dir, root / version)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    manifest = {'version': version, 'created': time.time(), 'meta': meta or {}}
+    tmp = root / f'.manifest-{version}.json'
+    tmp.write_text(json.dumps(manifest))
+    os.replace(tmp, root / 'manifest.json')
+
+    # Old versions may still be mapped by running processes; keep the last few
+    versions = sorted(p for p in root.iterdir() if p.is_dir() and not p.name.startswith('.'))
+    for old in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(old, ignore_errors=True)
+    return version
+
+
+def load_arrays(name):
+    """
+    Return (arrays, meta) for the current version of a store, memory-mapped
+    and cached per process, or (None, None) if the store was never built.
+    The manifest is stat()ed on every call, so a rebuilt store is picked up
+    without restarting the process.
+    """
+    manifest_path = store_dir(name) / 'manifest.json'
+    try:
+        mtime = manifest_path.stat().st_mtime
+    except FileNotFoundError:
+        return None, None
+
+    cached = _loaded.get(name)
+    if cached and cached[0] == mtime:
+        return cached[1], cached[2]
+
+    with _lock:
+        manifest = json.loads(manifest_path.read_text())
+        version_dir = store_dir(name) / manifest['version']
+        arrays = {
+            path.stem: np.load(path, mmap_mode='r')
+            for path in version_dir.glob('*.npy')
+        }
+        _loaded[name] = (mtime, arrays, manifest['meta'])
+    return arrays, manifest['meta']
@@ -0,0 +1,381 @@
+"""
+Two-tier cache-aside helpers.
+
+Values are looked up first in a small in-process LRU, then in the shared
+cache (CACHES['default'], Redis), and only then recomputed. On top of plain
+cache-aside:
+
+- Single-flight: when a key is missing, only the worker that wins a
+  cache.add() lock recomputes it; the others wait for its result.
+- Stale-while-revalidate: an expired value is kept for `stale_ttl` more
+  seconds and served to everyone while one worker refreshes it.
+- Probabilistic early refresh (XFetch): shortly before expiry, a request
+  is picked at random to recompute, with higher probability the closer the
+  key is to expiring and the longer it takes to compute, so hot keys are
+  usually refreshed before they ever expire.
+
+Values are stored in the shared cache wrapped in an envelope
+{'value', 'expires', 'delta'}, where `expires` is the soft (fresh) expiry
+and `delta` the last recompute time in seconds.
+
+Invalidation is generational: keys built with generational_key() embed
+the current generation of the data they depend on (a model, or one
+movie), and writes just bump those counters. Old entries are never looked
+up again and age out of Redis on their own, so invalidation is O(1) per
+scope with no key scanning, and TTLs can be long.
+
+Generations live in Redis and are read on every lookup, all scopes of a
+key in one MGET, so a bump is seen at once by every process: a value in
+another process's LRU was stored under the old key and is not served again.
+
+When Redis is unreachable, generational_key() returns None and fetch()
+computes the value without caching it (as it does if the shared cache
+fails mid-lookup), and bumps are skipped with a warning, so reads and
+writes keep working.
+"""
+import functools
+import logging
+import math
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from redis import RedisError
+
+logger = logging.getLogger(__name__)
+
+LOCK_PREFIX = 'lock:'
+GENERATION_PREFIX = 'gen:'
+# Writes touching more movies than this bump the shared 'movies' scope
+# instead of one counter per movie
+MAX_MOVIE_BUMPS = 1000
+
+# Lookup outcomes, also used as counter names
+LOCAL_HIT = 'local_hit'
+HIT = 'hit'
+STALE = 'stale'
+EARLY_REFRESH = 'early_refresh'
+MISS = 'miss'
+
+
+class LocalLRU:
+    """Thread-safe in-process LRU whose entries also expire after a TTL."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, envelope, ttl):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.time() + ttl, envelope)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+local_cache = LocalLRU(settings.CACHE_LOCAL_MAX_ENTRIES)
+
+_counters = Counter()
+_counters_lock = threading.Lock()
+
+
+def _count(name, n=1):
+    with _counters_lock:
+        _counters[name] += n
+
+
+def cache_stats():
+    """Per-process counters of lookup outcomes and recomputes."""
+    with _counters_lock:
+        counters = dict(_counters)
+    lookups = sum(counters.get(name, 0) for name in (LOCAL_HIT, HIT, STALE, EARLY_REFRESH, MISS))
+    served = lookups - counters.get(MISS, 0) - counters.get(EARLY_REFRESH, 0)
+    return {
+        'counters': counters,
+        'lookups': lookups,
+        'hit_ratio': round(served / lookups, 4) if lookups else None,
+        'local_entries': len(local_cache),
+    }
+
+
+def reset_cache_stats():
+    with _counters_lock:
+        _counters.clear()
+
+
+def _should_refresh_early(envelope, beta):
+    """XFetch: recompute early with probability growing towards expiry."""
+    if beta <= 0:
+        return False
+    # -log(U) for U in (0, 1] is an Exp(1) sample
+    gap = envelope['delta'] * beta * -math.log(1.0 - random.random())
+    return time.time() + gap >= envelope['expires']
+
+
+def _store(key, value, delta, ttl, stale_ttl):
+    envelope = {'value': value, 'expires': time.time() + ttl, 'delta': delta}
+    try:
+        cache.set(key, envelope, timeout=ttl + stale_ttl)
+    except RedisError as exc:
+        logger.warning('Shared cache unavailable, not storing %s: %s', key, exc)
+    local_cache.set(key, envelope, min(settings.CACHE_LOCAL_TTL, ttl))
+    return envelope
+
+
+def _recompute(key, compute, ttl, stale_ttl):
+    start = time.perf_counter()
+    value = compute()
+    _count('recomputes')
+    _store(key, value, time.perf_counter() - start, ttl, stale_ttl)
+    return value
+
+
+def _with_lock(key, recompute):
+    """Run recompute() if this worker wins the key's lock; returns (won, value)."""
+    lock_key = LOCK_PREFIX + key
+    if not cache.add(lock_key, 1, timeout=settings.CACHE_LOCK_TIMEOUT):
+        return False, None
+    try:
+        return True, recompute()
+    finally:
+        try:
+            cache.delete(lock_key)
+        except RedisError:
+            pass  # Expires after CACHE_LOCK_TIMEOUT
+
+
+def fetch(key, compute, ttl, stale_ttl=None, beta=None):
+    """
+    Cache-aside lookup returning (value, outcome), outcome being one of
+    LOCAL_HIT, HIT, STALE, EARLY_REFRESH or MISS. A key of None (see
+    generational_key) means caching is unavailable: compute() is just called.
+
+    compute() is called at most once per key at a time across all workers
+    sharing the cache; its result is fresh for `ttl` seconds and may be
+    served stale for `stale_ttl` more while it is being refreshed.
+    """
+    if key is None:
+        _count('uncached')
+        return compute(), MISS
+    stale_ttl = settings.CACHE_STALE_TTL if stale_ttl is None else stale_ttl
+    beta = settings.CACHE_XFETCH_BETA if beta is None else beta
+
+    envelope = local_cache.get(key)
+    if envelope is not None and envelope['expires'] > time.time():
+        _count(LOCAL_HIT)
+        return envelope['value'], LOCAL_HIT
+
+    try:
+        return _fetch_shared(key, compute, ttl, stale_ttl, beta)
+    except RedisError as exc:
+        # Redis went away after the generations were read
+        logger.warning('Shared cache unavailable, not caching %s: %s', key, exc)
+        _count('uncached')
+        return compute(), MISS
+
+
+def _fetch_shared(key, compute, ttl, stale_ttl, beta):
+    """The shared-cache part of fetch(), after a local miss."""
+    def recompute():
+        return _recompute(key, compute, ttl, stale_ttl)
+
+    envelope = cache.get(key)
+    if envelope is not None:
+        expired = envelope['expires'] <= time.time()
+        if not expired and not _should_refresh_early(envelope, beta):
+            local_cache.set(key, envelope, min(settings.CACHE_LOCAL_TTL, envelope['expires'] - time.time()))
+            _count(HIT)
+            return envelope['value'], HIT
+        # Expired or picked for early refresh: one worker recomputes,
+        # everybody else keeps serving the current value
+        won, value = _with_lock(key, recompute)
+        if won:
+            _count(EARLY_REFRESH if not expired else MISS)
+            return value, EARLY_REFRESH if not expired else MISS
+        _count(STALE if expired else HIT)
+        return envelope['value'], STALE if expired else HIT
+
+    # Nothing cached: single-flight, losers wait for the winner's result
+    won, value = _with_lock(key, recompute)
+    if won:
+        _count(MISS)
+        return value, MISS
+
+    _count('lock_waits')
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        envelope = cache.get(key)
+        if envelope is not None:
+            _count(HIT)
+            return envelope['value'], HIT
+    # The winner is too slow or died; compute without the lock
+    _count(MISS)
+    return recompute(), MISS
+
+
+def get_or_set(key, compute, ttl, stale_ttl=None, beta=None):
+    """Like fetch(), returning just the value."""
+    return fetch(key, compute, ttl, stale_ttl, beta)[0]
+
+
+def invalidate(*keys):
+    """
+    Drop keys from the shared cache and this process's LRU. Other processes
+    may keep serving their local copy for up to CACHE_LOCAL_TTL seconds.
+    """
+    keys = [key for key in keys if key is not None]
+    for key in keys:
+        local_cache.delete(key)
+    cache.delete_many(keys)
+
+
+def make_key(prefix, *args, **kwargs):
+    parts = [prefix, *map(str, args)]
+    parts += [f'{name}={kwargs[name]}' for name in sorted(kwargs)]
+    return ':'.join(parts)
+
+
+def cached(ttl, key=None, scopes=(), stale_ttl=None, beta=None):
+    """
+    Decorator form of get_or_set(). The key is `key` (a string, or a callable
+    taking the function's arguments) or else built from the function's
+    qualified name and arguments. `scopes` (a tuple, or a callable taking
+    the function's arguments) are generation scopes embedded in the key.
+    """
+    def decorator(func):
+        prefix = f'{func.__module__}.{func.__qualname__}'
+
+        def base_key(*args, **kwargs):
+            if callable(key):
+                return key(*args, **kwargs)
+            return key if key is not None else make_key(prefix, *args, **kwargs)
+
+        def full_key(*args, **kwargs):
+            key_scopes = scopes(*args, **kwargs) if callable(scopes) else scopes
+            return generational_key(base_key(*args, **kwargs), *key_scopes)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return get_or_set(full_key(*args, **kwargs), lambda: func(*args, **kwargs), ttl, stale_ttl, beta)
+
+        wrapper.invalidate = lambda *args, **kwargs: invalidate(full_key(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+# Generations
+
+def _initial_generation():
+    # Counters never expire, but if Redis evicts or loses one it restarts
+    # from the clock, above any value it had before, so old keys stay dead
+    return int(time.time() * 1000)
+
+
+def generations(*scopes):
+    """
+    Current generation of each scope, as {scope: int}, from one MGET; None
+    if Redis is unreachable.
+    """
+    result = {}
+    keys = {GENERATION_PREFIX + scope: scope for scope in scopes}
+    if not keys:
+        return result
+    try:
+        found = cache.get_many(list(keys))
+        for key, scope in keys.items():
+            if key not in found:
+                cache.add(key, _initial_generation(), timeout=None)
+                found[key] = cache.get(key)
+            result[scope] = found[key]
+    except RedisError as exc:
+        logger.warning('Cache generations unavailable, not caching: %s', exc)
+        return None
+    return result
+
+
+def bump_generations(*scopes):
+    """
+    Invalidate everything cached under these scopes. Best effort: with Redis
+    unreachable the bump is logged and dropped (nothing can be cached then
+    either, but entries cached before the outage may be served once it is
+    back, until their TTL).
+    """
+    try:
+        for scope in scopes:
+            key = GENERATION_PREFIX + scope
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, _initial_generation(), timeout=None)
+    except RedisError as exc:
+        logger.warning('Cache generation bump of %s failed: %s', ', '.join(scopes), exc)
+        return
+    _count('generation_bumps', len(scopes))
+
+
+def model_scope(model):
+    return model._meta.label_lower
+
+
+def movie_scopes(movie_id):
+    """Scopes of data about one movie: its own counter plus the bulk-write epoch."""
+    return ('movies', f'movie:{movie_id}')
+
+
+def generational_key(base, *scopes):
+    """
+    Cache key for `base` that changes whenever any of the scopes is bumped;
+    None if the generations can't be read (Redis unreachable).
+    """
+    current = generations(*scopes)
+    if current is None:
+        return None
+    return ':'.join([base, *(f'{scope}@{current[scope]}' for scope in scopes)])
+
+
+def writes_committed(model, movie_ids=None):
+    """
+    Bump the generations a write to `model` invalidates, once the surrounding
+    transaction commits - before that, a concurrent reader could cache the
+    old rows under the new generation. `movie_ids` are the movies whose rows
+    changed; None (the default) means any movie (e.g. an update() by a
+    non-movie filter), an empty collection none (e.g. a genre rename).
+
+    Signals call this for single-row writes; bulk paths (queryset.update(),
+    bulk_create, imports) must call it themselves.
+    """
+    movie_ids = None if movie_ids is None else set(movie_ids)
+    if movie_ids is None or len(movie_ids) > MAX_MOVIE_BUMPS:
+        scopes = [model_scope(model), 'movies']
+    else:
+        scopes = [model_scope(model)] + [f'movie:{movie_id}' for movie_id in sorted(movie_ids)]
+    transaction.on_commit(lambda: bump_generations(*scopes))
@@ -0,0 +1,322 @@
+"""
+Incremental (delta) import of MovieLens CSV snapshots.
+
+Every CSV is fingerprinted twice:
+  - the whole file (chunk -1), so an unchanged file is skipped after one
+    sequential read;
+  - partitions of its leading id column (movieId for movies/links, userId
+    for ratings/tags), so only partitions whose bytes changed are parsed
+    and compared against the database.
+
+A changed partition is diffed row by row against the rows currently stored
+for the same id range, and only the differences are written: inserts,
+updates and deletes. Ratings are keyed on (user_id, movie_id); tags have no
+natural key, so they are compared as a multiset of full rows.
+"""
+import csv
+import hashlib
+from collections import Counter, defaultdict
+from django.db import transaction
+from .models import Movie, Rating, Tag, Link, Genre, ImportChunk
+from .titles import title_fields
+
+FILE_CHUNK = -1
+DB_BATCH_SIZE = 500
+
+
+def file_digest(path):
+    """sha256 of the whole file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_lines(path, width):
+    """Yield (partition, line) for each data row, partition = leading id // width."""
+    with open(path, 'rb') as file:
+        file.readline()  # header
+        for line in file:
+            line = line.rstrip(b'\r\n')
+            if line:
+                yield int(line[:line.index(b',')]) // width, line
+
+
+def partition_digests(path, width):
+    """sha256 of every partition, computed in one streaming pass."""
+    hashers = defaultdict(hashlib.sha256)
+    for partition, line in iter_lines(path, width):
+        hasher = hashers[partition]
+        hasher.update(line)
+        hasher.update(b'\n')
+    return {partition: hasher.hexdigest() for partition, hasher in hashers.items()}
+
+
+def read_partitions(path, width, wanted):
+    """Raw lines of the wanted partitions only; everything else is skipped unparsed."""
+    lines = defaultdict(list)
+    if wanted:
+        for partition, line in iter_lines(path, width):
+            if partition in wanted:
+                lines[partition].append(line)
+    return lines
+
+
+def parse_lines(lines):
+    return csv.reader(line.decode('utf-8') for line in lines)
+
+
+def batched(items, size=DB_BATCH_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class DeltaImporter:
+    """Apply the differences between a MovieLens snapshot and the database."""
+
+    # (source name, file name, partition width on the leading id column)
+    TABLES = [
+        ('movies', 'movies.csv', 1000),
+        ('links', 'links.csv', 1000),
+        ('ratings', 'ratings.csv', 1000),
+        ('tags', 'tags.csv', 1000),
+    ]
+
+    def __init__(self, data_dir, log=print):
+        self.data_dir = data_dir
+        self.log = log
+        # movie ids whose ratings/tags/genres/links changed; used to refresh
+        # anything derived from them and invalidate their cached payloads
+        # after the import.
+        self.touched_movies = set()
+        # timestamps of ratings inserted, deleted or changed (old and new
+        # values); the rating months whose rollups must be recomputed
+        self.rating_timestamps = set()
+        self.summary = {}
+
+    # Models each source writes (genres are created by the movies diff)
+    MODELS = {
+        'movies': (Movie, Genre),
+        'links': (Link,),
+        'ratings': (Rating,),
+        'tags': (Tag,),
+    }
+
+    def run(self):
+        for source, filename, width in self.TABLES:
+            self.summary[source] = self.import_table(source, self.data_dir / filename, width)
+        return self.summary
+
+    def changed_models(self):
+        """Models whose tables the last run() wrote to."""
+        return [
+            model
+            for source, counts in self.summary.items()
+            if counts['inserted'] or counts['updated'] or counts['deleted']
+            for model in self.MODELS[source]
+        ]
+
+    def record_fingerprints(self):
+        """Store fingerprints for a snapshot that was loaded by a full import."""
+        for source, filename, width in self.TABLES:
+            path = self.data_dir / filename
+            chunks = [ImportChunk(source=source, chunk=FILE_CHUNK, digest=file_digest(path))]
+            chunks += [
+                ImportChunk(source=source, chunk=partition, digest=digest)
+                for partition, digest in partition_digests(path, width).items()
+            ]
+            with transaction.atomic():
+                ImportChunk.objects.filter(source=source).delete()
+                ImportChunk.objects.bulk_create(chunks, batch_size=1000)
+
+    def import_table(self, source, path, width):
+        counts = Counter()
+        stored = dict(ImportChunk.objects.filter(source=source).values_list('chunk', 'digest'))
+
+        whole = file_digest(path)
+        if stored.get(FILE_CHUNK) == whole:
+            self.log(f'{source}: unchanged, skipped')
+            return counts
+
+        digests = partition_digests(path, width)
+        changed = {p for p, digest in digests.items() if stored.get(p) != digest}
+        # Partitions that disappeared from the file entirely
+        removed = set(stored) - set(digests) - {FILE_CHUNK}
+        lines = read_partitions(path, width, changed)
+
+        diff = getattr(self, f'diff_{source}')
+        for partition in sorted(changed | removed):
+            with transaction.atomic():
+                counts.update(diff(
+                    partition * width, (partition + 1) * width, parse_lines(lines.pop(partition, []))
+                ))
+                if partition in removed:
+                    ImportChunk.objects.filter(source=source, chunk=partition).delete()
+                else:
+                    ImportChunk.objects.update_or_create(
+                        source=source, chunk=partition, defaults={'digest': digests[partition]}
+                    )
+            counts['partitions'] += 1
+
+        ImportChunk.objects.update_or_create(source=source, chunk=FILE_CHUNK, defaults={'digest': whole})
+        self.log(
+            f"{source}: {counts['partitions']} changed partitions, "
+            f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['deleted']} deleted"
+        )
+        return counts
+
+    # ------------------------------------------------------------------
+    # Per-table diffs. Each receives the id range of one partition and the
+    # parsed CSV rows of that partition, writes the differences and returns
+    # a Counter of inserted/updated/deleted rows.
+    # ------------------------------------------------------------------
+    def diff_movies(self, lo, hi, rows):
+        incoming = {}
+        for movie_id, title, genres in rows:
+            incoming[int(movie_id)] = (title, frozenset(g for g in genres.split('|') if g))
+
+        existing_genres = defaultdict(set)
+        through_model = Movie.genres.through
+        for movie_id, name in through_model.objects.filter(
+            movie_id__gte=lo, movie_id__lt=hi
+        ).values_list('movie_id', 'genre__name'):
+            existing_genres[movie_id].add(name)
+        existing = {
+            movie_id: (title, frozenset(existing_genres[movie_id]))
+            for movie_id, title in Movie.objects.filter(
+                movie_id__gte=lo, movie_id__lt=hi
+            ).values_list('movie_id', 'title')
+        }
+
+        inserted = [m for m in incoming if m not in existing]
+        updated = [m for m in incoming if m in existing and incoming[m] != existing[m]]
+        deleted = [m for m in existing if m not in incoming]
+
+        Movie.objects.bulk_create(
+            [Movie(movie_id=m, title=incoming[m][0], **title_fields(incoming[m][0])) for m in inserted],
+            batch_size=1000,
+        )
+        Movie.objects.bulk_update(
+            [
+                Movie(movie_id=m, title=incoming[m][0], **title_fields(incoming[m][0]))
+                for m in updated if incoming[m][0] != existing[m][0]
+            ],
+            ['title', 'year', 'normalized_title'], batch_size=DB_BATCH_SIZE,
+        )
+
+        regenre = inserted + [m for m in updated if incoming[m][1] != existing[m][1]]
+        if regenre:
+            names = set().union(*(incoming[m][1] for m in regenre))
+            Genre.objects.bulk_create([Genre(name=n) for n in names], ignore_conflicts=True)
+            genre_lookup = dict(Genre.objects.filter(name__in=names).values_list('name', 'id'))
+            for batch in batched(regenre):
+                through_model.objects.filter(movie_id__in=batch).delete()
+            through_model.objects.bulk_create(
+                [through_model(movie_id=m, genre_id=genre_lookup[n]) for m in regenre for n in incoming[m][1]],
+                batch_size=1000,
+            )
+
+        for batch in batched(deleted):
+            Movie.objects.filter(movie_id__in=batch).delete()
+
+        self.touched_movies.update(inserted, updated, deleted)
+        return Counter(inserted=len(inserted), updated=len(updated), deleted=len(deleted))
+
+    def diff_links(self, lo, hi, rows):
+        incoming = {int(movie_id): (imdb_id, tmdb_id or None) for movie_id, imdb_id, tmdb_id in rows}
+        existing = {
+            movie_id: (imdb_id, tmdb_id)
+            for movie_id, imdb_id, tmdb_id in Link.objects.filter(
+                movie_id__gte=lo, movie_id__lt=hi
+            ).values_list('movie_id', 'imdb_id', 'tmdb_id')
+        }
+
+        inserted = [m for m in incoming if m not in existing]
+        updated = [m for m in incoming if m in existing and incoming[m] != existing[m]]
+        deleted = [m for m in existing if m not in incoming]
+
+        Link.objects.bulk_create(
+            [Link(movie_id=m, imdb_id=incoming[m][0], tmdb_id=incoming[m][1]) for m in inserted],
+            batch_size=1000,
+        )
+        Link.objects.bulk_update(
+            [Link(movie_id=m, imdb_id=incoming[m][0], tmdb_id=incoming[m][1]) for m in updated],
+            ['imdb_id', 'tmdb_id'], batch_size=DB_BATCH_SIZE,
+        )
+        for batch in batched(deleted):
+            Link.objects.filter(movie_id__in=batch).delete()
+
+        self.touched_movies.update(inserted, updated, deleted)
+        return Counter(inserted=len(inserted), updated=len(updated), deleted=len(deleted))
+
+    def diff_ratings(self, lo, hi, rows):
+        incoming = {}
+        for user_id, movie_id, rating, timestamp in rows:
+            incoming[(int(user_id), int(movie_id))] = (float(rating), int(timestamp))
+
+        existing = {}
+        deleted = []
+        for pk, user_id, movie_id, rating, timestamp in Rating.objects.filter(
+            user_id__gte=lo, user_id__lt=hi
+        ).values_list('id', 'user_id', 'movie_id', 'rating', 'timestamp'):
+            key = (user_id, movie_id)
+            if key in existing:
+                # Left behind by an earlier non-incremental re-import
+                deleted.append((pk, movie_id))
+                self.rating_timestamps.add(timestamp)
+            else:
+                existing[key] = (pk, rating, timestamp)
+
+        inserts, updates = [], []
+        for key, (rating, timestamp) in incoming.items():
+            current = existing.pop(key, None)
+            if current is None:
+                inserts.append(Rating(user_id=key[0], movie_id=key[1], rating=rating, timestamp=timestamp))
+            elif current[1:] != (rating, timestamp):
+                updates.append(Rating(id=current[0], user_id=key[0], movie_id=key[1], rating=rating, timestamp=timestamp))
+                self.rating_timestamps.add(current[2])
+        # Whatever is left in existing is no longer in the snapshot
+        deleted += [(pk, key[1]) for key, (pk, _, _) in existing.items()]
+        self.rating_timestamps.update(timestamp for _, _, timestamp in existing.values())
+
+        for batch in batched(pk for pk, _ in deleted):
+            Rating.objects.filter(id__in=batch).delete()
+        Rating.objects.bulk_update(updates, ['rating', 'timestamp'], batch_size=DB_BATCH_SIZE)
+        Rating.objects.bulk_create(inserts, batch_size=1000)
+
+        self.touched_movies.update(r.movie_id for r in inserts + updates)
+        self.touched_movies.update(movie_id for _, movie_id in deleted)
+        self.rating_timestamps.update(r.timestamp for r in inserts + updates)
+        return Counter(inserted=len(inserts), updated=len(updates), deleted=len(deleted))
+
+    def diff_tags(self, lo, hi, rows):
+        incoming = Counter(
+            (int(user_id), int(movie_id), tag, int(timestamp))
+            for user_id, movie_id, tag, timestamp in rows
+        )
+
+        existing = defaultdict(list)
+        for pk, user_id, movie_id, tag, timestamp in Tag.objects.filter(
+            user_id__gte=lo, user_id__lt=hi
+        ).values_list('id', 'user_id', 'movie_id', 'tag', 'timestamp'):
+            existing[(user_id, movie_id, tag, timestamp)].append(pk)
+
+        inserts, deleted = [], []
+        for key in incoming.keys() | existing.keys():
+            surplus = incoming[key] - len(existing.get(key, ()))
+            if surplus > 0:
+                inserts += [
+                    Tag(user_id=key[0], movie_id=key[1], tag=key[2], timestamp=key[3]) for _ in range(surplus)
+                ]
+            elif surplus < 0:
+                deleted += [(pk, key[1]) for pk in existing[key][:-surplus]]
+
+        for batch in batched(pk for pk, _ in deleted):
+            Tag.objects.filter(id__in=batch).delete()
+        Tag.objects.bulk_create(inserts, batch_size=1000)
+
+        self.touched_movies.update(t.movie_id for t in inserts)
+        self.touched_movies.update(movie_id for _, movie_id in deleted)
+        return Counter(inserted=len(inserts), deleted=len(deleted))
@@ -0,0 +1,85 @@
+"""
+Rating distributions (half-star histogram, mean, median, standard
+deviation) per movie, user or genre.
+
+Every scope is reduced to an 11-bin histogram by one query, and all
+statistics are derived from the histogram:
+
+- movie: the precomputed MovieStats row (primary-key lookup);
+- genre: SUM of the MovieStats histogram columns over the genre's movies,
+  so the query reads one row per movie instead of every rating;
+- user: one GROUP BY rating over the user's ratings (rating_user_idx).
+
+Results are cached per scope under generational keys, so rating writes
+invalidate them (see cache_utils).
+"""
+import numpy as np
+from django.db.models import Count, Sum
+from .cache_utils import fetch, generational_key, model_scope, movie_scopes
+from .models import Genre, Movie, MovieStats, Rating
+
+CACHE_TTL = 60 * 60 * 6
+HALF_STARS = np.arange(1, 11) / 2  # bin i holds ratings of HALF_STARS[i]
+
+
+def describe(histogram):
+    """count/mean/median/std and the histogram itself, from 10 half-star counts."""
+    counts = np.asarray(histogram, dtype=np.int64)
+    count = int(counts.sum())
+    result = {
+        'count': count,
+        'mean': None,
+        'median': None,
+        'std': None,
+        'histogram': {f'{value:.1f}': int(n) for value, n in zip(HALF_STARS, counts)},
+    }
+    if not count:
+        return result
+    mean = float(counts @ HALF_STARS) / count
+    variance = float(counts @ (HALF_STARS - mean) ** 2) / count
+    # Middle element(s) of the sorted ratings, located on the cumulative counts
+    cumulative = np.cumsum(counts)
+    low, high = np.searchsorted(cumulative, [(count - 1) // 2 + 1, count // 2 + 1])
+    result.update(
+        mean=round(mean, 4),
+        median=float(HALF_STARS[low] + HALF_STARS[high]) / 2,
+        std=round(variance ** 0.5, 4),
+    )
+    return result
+
+
+def _movie_histogram(movie_id):
+    row = MovieStats.objects.filter(movie_id=movie_id).values_list(*MovieStats.HISTOGRAM_FIELDS).first()
+    return row or [0] * len(HALF_STARS)
+
+
+def _genre_histogram(genre_id):
+    sums = MovieStats.objects.filter(movie__genres=genre_id).aggregate(
+        **{field: Sum(field) for field in MovieStats.HISTOGRAM_FIELDS}
+    )
+    return [sums[field] or 0 for field in MovieStats.HISTOGRAM_FIELDS]
+
+
+def _user_histogram(user_id):
+    counts = np.zeros(len(HALF_STARS), dtype=np.int64)
+    rows = Rating.objects.filter(user_id=user_id).order_by().values_list('rating').annotate(n=Count('id'))
+    for rating, n in rows:
+        counts[min(max(int(round(rating * 2)), 1), 10) - 1] += n
+    return counts
+
+
+def movie_distribution(movie_id):
+    key = generational_key(f'distribution:movie:{movie_id}', *movie_scopes(movie_id))
+    return fetch(key, lambda: describe(_movie_histogram(movie_id)), CACHE_TTL)
+
+
+def genre_distribution(genre):
+    key = generational_key(
+        f'distribution:genre:{genre.id}', model_scope(Rating), model_scope(Movie), model_scope(Genre)
+    )
+    return fetch(key, lambda: describe(_genre_histogram(genre.id)), CACHE_TTL)
+
+
+def user_distribution(user_id):
+    key = generational_key(f'distribution:user:{user_id}', model_scope(Rating))
+    return fetch(key, lambda: describe(_user_histogram(user_id)), CACHE_TTL)
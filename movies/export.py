@@ -0,0 +1,100 @@
+"""
+Constant-memory export of the ratings and tags tables.
+
+Rows come from values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE), so
+the database cursor is read a chunk at a time and no model instances are
+built. Each chunk is encoded (CSV or NDJSON), optionally gzip-compressed
+with a zlib stream, and handed to StreamingHttpResponse. Memory therefore
+stays at about one chunk whether the export has 100 rows or 25 million.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, timezone
+from django.conf import settings
+from .models import Rating, Tag
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+EXPORTS = {
+    'ratings': (Rating, ('user_id', 'movie_id', 'rating', 'timestamp')),
+    'tags': (Tag, ('user_id', 'movie_id', 'tag', 'timestamp')),
+}
+
+
+def parse_time(value, end=False):
+    """A Unix timestamp, or a YYYY-MM-DD UTC date (end=True: the end of that day)."""
+    if value.isdigit():
+        return int(value)
+    day = date.fromisoformat(value)
+    start = int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+    return start + 86400 - 1 if end else start
+
+
+def export_queryset(kind, movie_id=None, user_id=None, start=None, end=None):
+    """values_list() of the export's columns, with the optional filters."""
+    model, fields = EXPORTS[kind]
+    rows = model.objects.order_by()
+    if movie_id is not None:
+        rows = rows.filter(movie_id=movie_id)
+    if user_id is not None:
+        rows = rows.filter(user_id=user_id)
+    if start is not None:
+        rows = rows.filter(timestamp__gte=start)
+    if end is not None:
+        rows = rows.filter(timestamp__lte=end)
+    return rows.values_list(*fields)
+
+
+def _chunks(rows, chunk_size):
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def encode(rows, fields, fmt, chunk_size=None):
+    """Yield the export as text, one block per chunk of rows."""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == 'csv':
+        writer.writerow(fields)
+    for chunk in _chunks(rows, chunk_size):
+        if fmt == 'csv':
+            writer.writerows(chunk)
+        else:
+            buffer.writelines(json.dumps(dict(zip(fields, row))) + '\n' for row in chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzipped(blocks, level=6):
+    """gzip-compress a stream of text blocks on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for block in blocks:
+        data = compressor.compress(block.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(kind, fmt, compress=False, **filters):
+    """(iterator of bytes/str, content type, file name) for StreamingHttpResponse."""
+    _, fields = EXPORTS[kind]
+    blocks = encode(export_queryset(kind, **filters), fields, fmt)
+    filename = f'{kind}.{fmt}'
+    if compress:
+        return gzipped(blocks), 'application/gzip', filename + '.gz'
+    return blocks, FORMATS[fmt], filename
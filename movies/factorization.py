@@ -0,0 +1,118 @@
+"""
+Per-user top-N recommendations from a matrix factorization model.
+
+Training is implicit-feedback ALS (Hu, Koren & Volinsky 2008) on the rating
+matrix, with confidence 1 + alpha * rating: every rated movie is a positive
+preference weighted by how much the user liked it. It runs offline in a
+Celery task and stores the factor matrices with movies.array_store.
+
+Serving memory-maps those arrays, so every web worker shares one copy
+through the OS page cache, and scores a user with one matrix-vector product
+plus argpartition, skipping the movies the user already rated.
+"""
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+from .array_store import load_arrays, save_arrays
+from .similarity import load_ratings
+
+STORE_NAME = 'mf_model'
+
+
+def _als_step(interactions, fixed, regularization, alpha):
+    """
+    Solve every row of the free factor matrix given the fixed one.
+    interactions: CSR (rows to solve x columns of `fixed`) of ratings.
+    """
+    n_factors = fixed.shape[1]
+    gram = fixed.T @ fixed
+    identity = regularization * np.eye(n_factors, dtype=np.float64)
+    solved = np.zeros((interactions.shape[0], n_factors), dtype=np.float32)
+
+    indptr, indices, data = interactions.indptr, interactions.indices, interactions.data
+    for row in range(interactions.shape[0]):
+        start, stop = indptr[row], indptr[row + 1]
+        if start == stop:
+            continue
+        cols = indices[start:stop]
+        confidence = 1.0 + alpha * data[start:stop]
+        factors = fixed[cols]
+        # (YtY + Yu^T (Cu - I) Yu + lambda I) x = Yu^T Cu p(u), with p(u) = 1
+        a = gram + (factors.T * (confidence - 1.0)) @ factors + identity
+        b = factors.T @ confidence
+        solved[row] = np.linalg.solve(a, b)
+    return solved
+
+
+def train_als(factors=None, iterations=None, regularization=None, alpha=None, progress=None):
+    """Train on the full rating table and store the model. Returns a summary dict."""
+    factors = factors or settings.RECOMMENDER_FACTORS
+    iterations = iterations or settings.RECOMMENDER_ITERATIONS
+    regularization = regularization if regularization is not None else settings.RECOMMENDER_REGULARIZATION
+    alpha = alpha if alpha is not None else settings.RECOMMENDER_ALPHA
+
+    users, movies, values = load_ratings()
+    user_ids, user_index = np.unique(users, return_inverse=True)
+    movie_ids, item_index = np.unique(movies, return_inverse=True)
+    del users, movies
+    if not len(user_ids):
+        return {'users': 0, 'movies': 0, 'message': 'No ratings found'}
+
+    user_items = sparse.csr_matrix(
+        (values.astype(np.float32), (user_index, item_index)),
+        shape=(len(user_ids), len(movie_ids)),
+    )
+    user_items.sum_duplicates()
+    item_users = user_items.T.tocsr()
+
+    rng = np.random.default_rng(42)
+    user_factors = (rng.standard_normal((len(user_ids), factors)) * 0.01).astype(np.float32)
+    item_factors = (rng.standard_normal((len(movie_ids), factors)) * 0.01).astype(np.float32)
+
+    for iteration in range(iterations):
+        user_factors = _als_step(user_items, item_factors, regularization, alpha)
+        item_factors = _als_step(item_users, user_factors, regularization, alpha)
+        if progress:
+            progress(iteration + 1, iterations)
+
+    version = save_arrays(
+        STORE_NAME,
+        {
+            'user_ids': user_ids.astype(np.int32),
+            'movie_ids': movie_ids.astype(np.int32),
+            'user_factors': user_factors,
+            'item_factors': item_factors,
+            # Movies each user already rated, as CSR row pointers + column indices
+            'rated_indptr': user_items.indptr.astype(np.int64),
+            'rated_indices': user_items.indices.astype(np.int32),
+        },
+        meta={'factors': factors, 'iterations': iterations,
+              'regularization': regularization, 'alpha': alpha},
+    )
+    return {'users': len(user_ids), 'movies': len(movie_ids), 'factors': factors, 'version': version}
+
+
+def recommend_for_user(user_id, limit=10):
+    """
+    Top-N unseen movies for a user as a list of (movie_id, score).
+    Returns None if no model has been trained, [] for users the model doesn't know.
+    """
+    arrays, _ = load_arrays(STORE_NAME)
+    if arrays is None:
+        return None
+    user_ids = arrays['user_ids']
+    row = int(np.searchsorted(user_ids, user_id))
+    if row >= len(user_ids) or user_ids[row] != user_id:
+        return []
+
+    scores = arrays['item_factors'] @ arrays['user_factors'][row]
+    rated = arrays['rated_indices'][arrays['rated_indptr'][row]:arrays['rated_indptr'][row + 1]]
+    scores[rated] = -np.inf
+
+    limit = min(limit, len(scores) - len(rated))
+    if limit <= 0:
+        return []
+    top = np.argpartition(-scores, limit - 1)[:limit]
+    top = top[np.argsort(-scores[top])]
+    movie_ids = arrays['movie_ids']
+    return [(int(movie_ids[i]), float(scores[i])) for i in top]
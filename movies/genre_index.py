@@ -0,0 +1,159 @@
+"""
+Genre similarity and genre filters on packed bitsets.
+
+There are only ~20 genres, so each movie's genres fit in one uint32 bitmask.
+The masks are precomputed from the movies_genres table into the array
+store and loaded once per process; "movies sharing genres with X" and
+"movies with all/any of these genres" then become vectorized bit operations
+over one small array instead of M2M joins.
+
+A rebuild is a full scan and a new store version, so catalog edits don't
+rebuild inline: schedule_rebuild() enqueues one delayed rebuild task and
+every edit until that task starts shares it.
+"""
+import logging
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from .array_store import load_arrays, save_arrays
+from .models import Genre, Movie, MovieStats
+
+STORE_NAME = 'genre_bitsets'
+MAX_GENRES = 32
+REBUILD_PENDING_KEY = 'genre-index:rebuild-pending'
+
+logger = logging.getLogger(__name__)
+
+if hasattr(np, 'bitwise_count'):
+    popcount = np.bitwise_count
+else:  # NumPy < 2.0
+    _BYTE_BITS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def popcount(masks):
+        return _BYTE_BITS[masks.view(np.uint8)].reshape(-1, masks.itemsize).sum(axis=1)
+
+
+def rebuild_genre_index():
+    """Recompute every movie's genre mask from movies_genres and store it."""
+    genres = list(Genre.objects.order_by('id').values_list('id', 'name'))
+    if len(genres) > MAX_GENRES:
+        raise ValueError(f'{len(genres)} genres do not fit in a {MAX_GENRES}-bit mask')
+    genre_names = [name for _, name in genres]
+    # genre id -> bit position
+    bit_of = np.zeros(max((g for g, _ in genres), default=0) + 1, dtype=np.uint32)
+    bit_of[[g for g, _ in genres]] = np.arange(len(genres), dtype=np.uint32)
+
+    movie_ids = np.array(sorted(Movie.objects.values_list('movie_id', flat=True)), dtype=np.int32)
+    masks = np.zeros(len(movie_ids), dtype=np.uint32)
+    links = np.array(
+        list(Movie.genres.through.objects.values_list('movie_id', 'genre_id')), dtype=np.int64
+    ).reshape(-1, 2)
+    if len(links):
+        rows = np.searchsorted(movie_ids, links[:, 0])
+        np.bitwise_or.at(masks, rows, np.left_shift(np.uint32(1), bit_of[links[:, 1]]))
+
+    # Popularity, used to break ties between equally similar movies
+    popularity = np.zeros(len(movie_ids), dtype=np.int32)
+    counts = np.array(list(MovieStats.objects.values_list('movie_id', 'count')), dtype=np.int64).reshape(-1, 2)
+    if len(counts):
+        rows = np.searchsorted(movie_ids, counts[:, 0])
+        valid = (rows < len(movie_ids)) & (movie_ids[np.minimum(rows, len(movie_ids) - 1)] == counts[:, 0])
+        popularity[rows[valid]] = counts[valid, 1]
+
+    save_arrays(
+        STORE_NAME,
+        {'movie_ids': movie_ids, 'masks': masks, 'popularity': popularity},
+        meta={'genres': genre_names},
+    )
+    return len(movie_ids)
+
+
+def schedule_rebuild():
+    """
+    Rebuild the index GENRE_INDEX_REBUILD_DELAY seconds from now, unless a
+    rebuild is already scheduled and hasn't started yet. Without Redis
+    (cache and broker) the index is rebuilt inline.
+    """
+    from .tasks import rebuild_genre_index as task
+
+    delay = settings.GENRE_INDEX_REBUILD_DELAY
+    try:
+        # Outlives the countdown, but not a lost task by much
+        if not cache.add(REBUILD_PENDING_KEY, 1, timeout=delay + 60):
+            return
+        task.apply_async(countdown=delay)
+    except Exception as exc:
+        logger.warning('Could not schedule a genre index rebuild, rebuilding now: %s', exc)
+        rebuild_genre_index()
+
+
+def _index():
+    arrays, meta = load_arrays(STORE_NAME)
+    if arrays is None:
+        rebuild_genre_index()
+        arrays, meta = load_arrays(STORE_NAME)
+    return arrays, meta['genres']
+
+
+def genre_mask(names):
+    """Bitmask for genre names; raises KeyError on an unknown genre."""
+    _, genres = _index()
+    bit_of = {name.lower(): bit for bit, name in enumerate(genres)}
+    mask = 0
+    for name in names:
+        mask |= 1 << bit_of[name.strip().lower()]
+    return np.uint32(mask)
+
+
+def genres_of(mask):
+    _, genres = _index()
+    return [name for bit, name in enumerate(genres) if int(mask) >> bit & 1]
+
+
+def _ranked(candidates, primary, popularity, limit):
+    """Sort candidate rows by primary desc, then popularity desc; keep `limit`."""
+    order = np.lexsort((-popularity[candidates], -primary))
+    return candidates[order[:limit]]
+
+
+def similar_by_genres(movie_id, limit=20):
+    """
+    Movies ranked by Jaccard similarity of their genre sets to this movie
+    (ties broken by number of ratings). Returns a list of (movie_id, jaccard),
+    or None for an unknown movie.
+    """
+    arrays, _ = _index()
+    movie_ids, masks, popularity = arrays['movie_ids'], arrays['masks'], arrays['popularity']
+    row = int(np.searchsorted(movie_ids, movie_id))
+    if row >= len(movie_ids) or movie_ids[row] != movie_id:
+        return None
+
+    target = masks[row]
+    union = popcount(masks | target).astype(np.float32)
+    jaccard = np.divide(popcount(masks & target), union, out=np.zeros_like(union), where=union > 0)
+    jaccard[row] = 0
+
+    candidates = np.flatnonzero(jaccard > 0)
+    # Pre-select with argpartition so only ~limit rows are fully sorted
+    if len(candidates) > limit * 4:
+        keep = np.argpartition(-jaccard[candidates], limit)[:limit]
+        threshold = jaccard[candidates[keep]].min()
+        candidates = candidates[jaccard[candidates] >= threshold]
+    top = _ranked(candidates, jaccard[candidates], popularity, limit)
+    return [(int(movie_ids[i]), float(jaccard[i])) for i in top]
+
+
+def movies_with_genres(mask, match='all', limit=50, offset=0):
+    """
+    Movies whose genres include all (match='all') or any (match='any') of
+    the mask's bits, most rated first. Returns (total, [movie_id, ...]).
+    """
+    arrays, _ = _index()
+    masks = arrays['masks']
+    if match == 'all':
+        hits = np.flatnonzero((masks & mask) == mask)
+    else:
+        hits = np.flatnonzero((masks & mask) != 0)
+    order = np.argsort(-arrays['popularity'][hits], kind='stable')
+    page = hits[order[offset:offset + limit]]
+    return len(hits), [int(m) for m in arrays['movie_ids'][page]]
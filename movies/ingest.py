@@ -0,0 +1,164 @@
+"""
+Batched rating ingestion.
+
+A batch of {user_id, movie_id, rating, timestamp} records is validated in
+Python against an in-memory set of movie ids (cached under the Movie
+generation, so it is loaded once, not queried per row), then written chunk
+by chunk. Each chunk runs in one transaction:
+
+- one SELECT of the ratings already stored for the chunk's users and
+  movies, to tell inserts from updates and know the previous values;
+- one bulk_create(update_conflicts=True) upserting on rating_user_movie_uniq;
+- the MovieStats update: F() deltas for new ratings, a grouped recompute
+  for movies whose existing ratings changed.
+
+Invalid records are reported by index and skipped; they never fail the batch.
+"""
+import time
+from django.db import transaction
+from .cache_utils import get_or_set, generational_key, model_scope, writes_committed
+from .models import Movie, Rating
+from .stats import apply_rating_deltas, rebuild_movie_stats
+
+CHUNK_SIZE = 1000
+MOVIE_IDS_TTL = 60 * 60 * 6
+MAX_INT = 2 ** 63 - 1  # SQLite integers are signed 64-bit
+MAX_CLOCK_SKEW = 24 * 60 * 60  # Timestamps may be at most this far in the future
+
+
+def known_movie_ids():
+    """
+    Every movie id, as a set kept in the two-tier cache until movies change
+    (queried from the database each time while Redis is unreachable).
+    """
+    key = generational_key('known_movie_ids', model_scope(Movie))
+    return get_or_set(key, lambda: frozenset(Movie.objects.values_list('movie_id', flat=True)), MOVIE_IDS_TTL)
+
+
+def _as_int(value):
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError
+    value = int(value)
+    if not -MAX_INT - 1 <= value <= MAX_INT:
+        raise ValueError
+    return value
+
+
+def validate_rating(record, movie_ids, now):
+    """Return ((user_id, movie_id, rating, timestamp), None) or (None, errors)."""
+    if not isinstance(record, dict):
+        return None, {'non_field_errors': 'Expected an object'}
+    errors = {}
+    try:
+        user_id = _as_int(record.get('user_id'))
+        if user_id <= 0:
+            raise ValueError
+    except (TypeError, ValueError, OverflowError):
+        errors['user_id'] = 'Must be a positive integer'
+    try:
+        movie_id = _as_int(record.get('movie_id'))
+        if movie_id not in movie_ids:
+            errors['movie_id'] = f'Unknown movie {movie_id}'
+    except (TypeError, ValueError, OverflowError):
+        errors['movie_id'] = 'Must be an integer'
+    try:
+        rating = float(record.get('rating'))
+        if not 0.5 <= rating <= 5.0 or rating * 2 != int(rating * 2):
+            raise ValueError
+    except (TypeError, ValueError, OverflowError):
+        errors['rating'] = 'Must be 0.5 to 5.0 in half-star steps'
+    try:
+        timestamp = _as_int(record.get('timestamp', now))
+        if not 0 <= timestamp <= now + MAX_CLOCK_SKEW:
+            raise ValueError
+    except (TypeError, ValueError, OverflowError):
+        errors['timestamp'] = 'Must be a Unix timestamp, not in the future'
+    if errors:
+        return None, errors
+    return (user_id, movie_id, rating, timestamp), None
+
+
+def _existing(pairs):
+    """{(user_id, movie_id): (rating, timestamp)} stored for the given pairs."""
+    # users x movies lookup on the (user_id, movie_id) unique index, narrowed
+    # to the wanted pairs in Python (an OR per pair overflows SQLite's
+    # expression depth limit at ~1000 terms)
+    rows = Rating.objects.filter(
+        user_id__in={user_id for user_id, _ in pairs},
+        movie_id__in={movie_id for _, movie_id in pairs},
+    ).values_list('user_id', 'movie_id', 'rating', 'timestamp')
+    return {
+        (user_id, movie_id): (rating, timestamp)
+        for user_id, movie_id, rating, timestamp in rows
+        if (user_id, movie_id) in pairs
+    }
+
+
+def _write_chunk(rows, newer_only):
+    """Upsert one chunk; returns (inserted, updated, unchanged) counts."""
+    with transaction.atomic():
+        existing = _existing(rows)
+        changed = []
+        for (user_id, movie_id), (rating, timestamp) in rows.items():
+            stored = existing.get((user_id, movie_id))
+            if stored is not None and (stored[0] == rating or newer_only and stored[1] > timestamp):
+                continue
+            changed.append(Rating(user_id=user_id, movie_id=movie_id, rating=rating, timestamp=timestamp))
+        Rating.objects.bulk_create(
+            changed,
+            update_conflicts=True,
+            unique_fields=['user_id', 'movie'],
+            update_fields=['rating', 'timestamp'],
+        )
+
+        inserted = [(r.movie_id, r.rating) for r in changed if (r.user_id, r.movie_id) not in existing]
+        updated_movies = {r.movie_id for r in changed if (r.user_id, r.movie_id) in existing}
+        # bulk_create bypasses the signals, so maintain the aggregates here
+        apply_rating_deltas(inserted)
+        if updated_movies:
+            # Old values can't be subtracted from min/max, recompute those movies
+            rebuild_movie_stats(updated_movies)
+        writes_committed(Rating, {r.movie_id for r in changed})
+    return len(inserted), len(changed) - len(inserted), len(rows) - len(changed)
+
+
+def validate_ratings(records):
+    """
+    Validate a batch of rating records. Returns ({(user_id, movie_id):
+    (rating, timestamp)}, errors); if a pair occurs more than once, the last
+    record wins.
+    """
+    movie_ids = known_movie_ids()
+    now = int(time.time())
+
+    valid = {}
+    errors = []
+    for index, record in enumerate(records):
+        row, record_errors = validate_rating(record, movie_ids, now)
+        if record_errors:
+            errors.append({'index': index, 'errors': record_errors})
+            continue
+        user_id, movie_id, rating, timestamp = row
+        valid.pop((user_id, movie_id), None)
+        valid[(user_id, movie_id)] = (rating, timestamp)
+    return valid, errors
+
+
+def write_ratings(rows, chunk_size=CHUNK_SIZE, newer_only=False):
+    """
+    Upsert validated {(user_id, movie_id): (rating, timestamp)} rows, one
+    transaction per chunk. With newer_only, a row older than the stored
+    rating of the same pair is skipped, so replaying old rows is harmless.
+    Returns {'inserted', 'updated', 'unchanged'} counts.
+    """
+    inserted = updated = unchanged = 0
+    items = list(rows.items())
+    for start in range(0, len(items), chunk_size):
+        i, u, n = _write_chunk(dict(items[start:start + chunk_size]), newer_only)
+        inserted += i
+        updated += u
+        unchanged += n
+    return {'inserted': inserted, 'updated': updated, 'unchanged': unchanged}
+
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0002_rename_ratings_user_id_bd9bb9_idx_rating_user_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50)),
+                ('chunk', models.IntegerField()),
+                ('digest', models.CharField(max_length=64)),
+            ],
+            options={
+                'db_table': 'import_chunks',
+                'constraints': [models.UniqueConstraint(fields=('source', 'chunk'), name='import_chunk_uniq')],
+            },
+        ),
+    ]
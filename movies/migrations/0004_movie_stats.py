@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_import_chunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieStats',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='movies.movie')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('total_sq', models.FloatField(default=0)),
+                ('min_rating', models.FloatField(blank=True, null=True)),
+                ('max_rating', models.FloatField(blank=True, null=True)),
+                ('hist_05', models.PositiveIntegerField(default=0)),
+                ('hist_10', models.PositiveIntegerField(default=0)),
+                ('hist_15', models.PositiveIntegerField(default=0)),
+                ('hist_20', models.PositiveIntegerField(default=0)),
+                ('hist_25', models.PositiveIntegerField(default=0)),
+                ('hist_30', models.PositiveIntegerField(default=0)),
+                ('hist_35', models.PositiveIntegerField(default=0)),
+                ('hist_40', models.PositiveIntegerField(default=0)),
+                ('hist_45', models.PositiveIntegerField(default=0)),
+                ('hist_50', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'movie stats',
+                'db_table': 'movie_stats',
+            },
+        ),
+    ]
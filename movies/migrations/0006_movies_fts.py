@@ -0,0 +1,66 @@
+from django.db import migrations
+
+# Frozen copy of the movies_fts schema at this migration: later changes to
+# movies.search must not alter what an old migration does
+INSTALL_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5(
+        title,
+        content='movies',
+        content_rowid='movie_id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_fts_insert AFTER INSERT ON movies BEGIN
+        INSERT INTO movies_fts(rowid, title) VALUES (new.movie_id, new.title);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_fts_delete AFTER DELETE ON movies BEGIN
+        INSERT INTO movies_fts(movies_fts, rowid, title) VALUES ('delete', old.movie_id, old.title);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_fts_update AFTER UPDATE OF title ON movies BEGIN
+        INSERT INTO movies_fts(movies_fts, rowid, title) VALUES ('delete', old.movie_id, old.title);
+        INSERT INTO movies_fts(rowid, title) VALUES (new.movie_id, new.title);
+    END
+    """,
+    # Index the titles already in the table
+    "INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')",
+]
+
+UNINSTALL_SQL = [
+    'DROP TRIGGER IF EXISTS movies_fts_insert',
+    'DROP TRIGGER IF EXISTS movies_fts_delete',
+    'DROP TRIGGER IF EXISTS movies_fts_update',
+    'DROP TABLE IF EXISTS movies_fts',
+]
+
+
+def install(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in INSTALL_SQL:
+        schema_editor.execute(sql)
+
+
+def uninstall(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in UNINSTALL_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_recent_activity_indexes'),
+    ]
+
+    operations = [
+        # SQLite FTS5 index over movies.title, kept in sync by triggers
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_movies_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=500, unique=True)),
+                ('movies_count', models.PositiveIntegerField(default=0)),
+                ('uses_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'tag_terms',
+            },
+        ),
+        migrations.CreateModel(
+            name='TagPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_postings', to='movies.movie')),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='movies.tagterm')),
+            ],
+            options={
+                'db_table': 'tag_postings',
+                'indexes': [models.Index(fields=['movie', '-count'], name='tag_posting_movie_idx')],
+                'constraints': [models.UniqueConstraint(fields=('term', 'movie'), name='tag_posting_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:46
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicate_ratings(apps, schema_editor):
+    """Keep the newest row of each (user, movie) pair so the constraint can be added."""
+    Rating = apps.get_model('movies', 'Rating')
+    keep = (
+        Rating.objects.values('user_id', 'movie_id')
+        .annotate(keep_id=Max('id'))
+        .values('keep_id')
+    )
+    duplicated = Rating.objects.values('user_id', 'movie_id').annotate(n=models.Count('id')).filter(n__gt=1)
+    for pair in duplicated:
+        Rating.objects.filter(user_id=pair['user_id'], movie_id=pair['movie_id']).exclude(
+            id__in=keep.filter(user_id=pair['user_id'], movie_id=pair['movie_id'])
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0007_tag_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_ratings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='rating',
+            constraint=models.UniqueConstraint(fields=('user_id', 'movie'), name='rating_user_movie_uniq'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0008_rating_user_movie_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('high_water_timestamp', models.BigIntegerField(default=-1)),
+                ('high_water_id', models.BigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'rollup_state',
+            },
+        ),
+        migrations.CreateModel(
+            name='RatingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('release_year', models.PositiveSmallIntegerField()),
+                ('month', models.DateField()),
+                ('ratings_count', models.PositiveIntegerField(default=0)),
+                ('rating_total', models.FloatField(default=0)),
+                ('distinct_users', models.PositiveIntegerField(default=0)),
+                ('genre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='movies.genre')),
+            ],
+            options={
+                'db_table': 'rating_rollups',
+                'indexes': [models.Index(fields=['month'], name='rating_rollup_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('genre', 'release_year', 'month'), name='rating_rollup_cell_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:56
+
+import re
+import unicodedata
+from django.db import migrations, models
+
+# Frozen copies of movies.titles and of the movies_fts schema at this
+# migration: later changes to the app modules must not alter what an old
+# migration does
+YEAR_RE = re.compile(r'\((\d{4})(?:\s*[-–]\s*\d{0,4})?\)\s*$')
+ARTICLE_RE = re.compile(
+    r"^(?P<base>.+?),\s+(?P<article>the|a|an|l'|la|le|les|il|lo|gli|die|der|das|el|los|las|un|une)"
+    r"(?P<rest>\s*\(.*\))?$",
+    re.IGNORECASE,
+)
+
+
+def title_fields(title):
+    match = YEAR_RE.search(title or '')
+    year = int(match.group(1)) if match else None
+    normalized = unicodedata.normalize('NFKC', YEAR_RE.sub('', title or ''))
+    normalized = ' '.join(normalized.split())
+    match = ARTICLE_RE.match(normalized)
+    if match:
+        article = match.group('article')
+        separator = '' if article.endswith("'") else ' '
+        normalized = f"{article}{separator}{match.group('base')}{match.group('rest') or ''}"
+    return {'year': year, 'normalized_title': normalized.casefold()}
+
+
+TITLE_INDEX_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5(
+        title,
+        content='movies',
+        content_rowid='movie_id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_fts_insert AFTER INSERT ON movies BEGIN
+        INSERT INTO movies_fts(rowid, title) VALUES (new.movie_id, new.title);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_fts_delete AFTER DELETE ON movies BEGIN
+        INSERT INTO movies_fts(movies_fts, rowid, title) VALUES ('delete', old.movie_id, old.title);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_fts_update AFTER UPDATE OF title ON movies BEGIN
+        INSERT INTO movies_fts(movies_fts, rowid, title) VALUES ('delete', old.movie_id, old.title);
+        INSERT INTO movies_fts(rowid, title) VALUES (new.movie_id, new.title);
+    END
+    """,
+    "INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')",
+]
+
+
+def populate_title_fields(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+    movies = []
+    for movie_id, title in Movie.objects.values_list('movie_id', 'title').iterator(chunk_size=2000):
+        movies.append(Movie(movie_id=movie_id, **title_fields(title)))
+    Movie.objects.bulk_update(movies, ['year', 'normalized_title'], batch_size=500)
+
+
+def reinstall_title_index(apps, schema_editor):
+    # Adding/removing a column with a default remakes the movies table on
+    # SQLite, which drops the movies_fts triggers
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in TITLE_INDEX_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0009_rating_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, reinstall_title_index),
+        migrations.AddField(
+            model_name='movie',
+            name='normalized_title',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='year',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(populate_title_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['year', 'movie_id'], name='movie_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['normalized_title', 'movie_id'], name='movie_norm_title_idx'),
+        ),
+        migrations.RunPython(reinstall_title_index, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from .titles import title_fields
 
 
 class Genre(models.Model):
@@ -15,16 +16,28 @@ class Genre(models.Model):
 class Movie(models.Model):
     movie_id = models.IntegerField(primary_key=True)
     title = models.CharField(max_length=500)
+    # Derived from title (see movies.titles): release year, None if the title
+    # has none, and the case-folded, article-first form used for sorting
+    year = models.PositiveSmallIntegerField(null=True, blank=True)
+    normalized_title = models.CharField(max_length=500, default='', blank=True)
     genres = models.ManyToManyField(Genre, related_name='movies', blank=True)
     
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        for field, value in title_fields(self.title).items():
+            setattr(self, field, value)
+        super().save(*args, **kwargs)
     
     class Meta:
         db_table = 'movies'
         # Add index on title for faster searches
         indexes = [
             models.Index(fields=['title'], name='movie_title_idx'),
+            # Year range filters and year ordering, movie_id breaks ties
+            models.Index(fields=['year', 'movie_id'], name='movie_year_idx'),
+            models.Index(fields=['normalized_title', 'movie_id'], name='movie_norm_title_idx'),
         ]
 
 
@@ -42,7 +55,15 @@ class Rating(models.Model):
         indexes = [
             models.Index(fields=['user_id'], name='rating_user_idx'),  # Indexed - for performance comparison
             models.Index(fields=['rating'], name='rating_value_idx'),
-            # Note: timestamp is NOT indexed - we'll compare performance with indexed fields
+            # Most recent ratings of a movie (movie detail) without sorting all of them
+            models.Index(fields=['movie', 'timestamp'], name='rating_movie_ts_idx'),
+            # Time-range scans (activity buckets, rollup refresh); movie and rating
+            # make it covering for the catalog and per-genre activity queries
+            models.Index(fields=['timestamp', 'movie', 'rating'], name='rating_ts_idx'),
+        ]
+        constraints = [
+            # One rating per user and movie; the batch API upserts on it
+            models.UniqueConstraint(fields=['user_id', 'movie'], name='rating_user_movie_uniq'),
         ]
 
 
@@ -60,6 +81,7 @@ class Tag(models.Model):
         indexes = [
             models.Index(fields=['user_id']),
             models.Index(fields=['tag']),
+            models.Index(fields=['movie', 'timestamp'], name='tag_movie_ts_idx'),
         ]
 
 
@@ -77,3 +99,163 @@ class Link(models.Model):
         indexes = [
             models.Index(fields=['imdb_id'], name='link_imdb_idx'),
         ]
+
+
+class MovieStats(models.Model):
+    """
+    Materialized rating statistics for one movie, so averages and counts are
+    an O(1) lookup instead of a scan over `ratings`. Kept up to date by
+    movies.stats (signals for single writes, explicit refreshes for bulk ones).
+    """
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, related_name='stats', to_field='movie_id', primary_key=True)
+    count = models.PositiveIntegerField(default=0)
+    total = models.FloatField(default=0)  # sum of ratings
+    total_sq = models.FloatField(default=0)  # sum of squared ratings
+    min_rating = models.FloatField(null=True, blank=True)
+    max_rating = models.FloatField(null=True, blank=True)
+    # Histogram, one column per half star (hist_05 = 0.5 stars ... hist_50 = 5.0 stars)
+    hist_05 = models.PositiveIntegerField(default=0)
+    hist_10 = models.PositiveIntegerField(default=0)
+    hist_15 = models.PositiveIntegerField(default=0)
+    hist_20 = models.PositiveIntegerField(default=0)
+    hist_25 = models.PositiveIntegerField(default=0)
+    hist_30 = models.PositiveIntegerField(default=0)
+    hist_35 = models.PositiveIntegerField(default=0)
+    hist_40 = models.PositiveIntegerField(default=0)
+    hist_45 = models.PositiveIntegerField(default=0)
+    hist_50 = models.PositiveIntegerField(default=0)
+
+    HISTOGRAM_FIELDS = [
+        'hist_05', 'hist_10', 'hist_15', 'hist_20', 'hist_25',
+        'hist_30', 'hist_35', 'hist_40', 'hist_45', 'hist_50',
+    ]
+
+    def __str__(self):
+        return f"Stats for movie {self.movie_id}: {self.count} ratings"
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def variance(self):
+        if not self.count:
+            return None
+        mean = self.total / self.count
+        return max(self.total_sq / self.count - mean * mean, 0.0)
+
+    @property
+    def histogram(self):
+        return {
+            (i + 1) / 2: getattr(self, name) for i, name in enumerate(self.HISTOGRAM_FIELDS)
+        }
+
+    class Meta:
+        db_table = 'movie_stats'
+        verbose_name_plural = 'movie stats'
+
+
+class TagTerm(models.Model):
+    """
+    Normalized tag vocabulary: case-folded, whitespace-collapsed, deduplicated.
+    """
+    term = models.CharField(max_length=500, unique=True)
+    movies_count = models.PositiveIntegerField(default=0)  # movies tagged with this term
+    uses_count = models.PositiveIntegerField(default=0)  # total times the term was applied
+
+    def __str__(self):
+        return self.term
+
+    class Meta:
+        db_table = 'tag_terms'
+
+
+class TagPosting(models.Model):
+    """
+    Inverted index entry: how many times a movie was tagged with a term.
+    """
+    term = models.ForeignKey(TagTerm, on_delete=models.CASCADE, related_name='postings')
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='tag_postings', to_field='movie_id')
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.term_id} -> {self.movie_id} ({self.count})"
+
+    class Meta:
+        db_table = 'tag_postings'
+        constraints = [
+            # Also the term -> movies lookup index
+            models.UniqueConstraint(fields=['term', 'movie'], name='tag_posting_uniq'),
+        ]
+        indexes = [
+            # Per-movie tag cloud, heaviest terms first
+            models.Index(fields=['movie', '-count'], name='tag_posting_movie_idx'),
+        ]
+
+
+class ImportChunk(models.Model):
+    """
+    Fingerprint of one partition of a MovieLens CSV, used by
+    `import_data --incremental` to skip partitions that did not change.
+    chunk = -1 holds the fingerprint of the whole file.
+    """
+    source = models.CharField(max_length=50)
+    chunk = models.IntegerField()
+    digest = models.CharField(max_length=64)
+
+    def __str__(self):
+        return f"{self.source}[{self.chunk}] {self.digest[:12]}"
+
+    class Meta:
+        db_table = 'import_chunks'
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'chunk'], name='import_chunk_uniq'),
+        ]
+
+
+class RatingRollup(models.Model):
+    """
+    Ratings aggregated per (genre, release year, rating month) cell, so
+    dashboards read a few hundred rows instead of scanning `ratings`.
+    Maintained incrementally by movies.rollups.
+    """
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE, related_name='rollups')
+    release_year = models.PositiveSmallIntegerField()  # 0 when the title has no year
+    month = models.DateField()  # first day of the month the ratings were given
+    ratings_count = models.PositiveIntegerField(default=0)
+    rating_total = models.FloatField(default=0)  # sum of ratings
+    distinct_users = models.PositiveIntegerField(default=0)  # exact for this cell only
+
+    def __str__(self):
+        return f"{self.genre_id}/{self.release_year}/{self.month:%Y-%m}: {self.ratings_count}"
+
+    @property
+    def average(self):
+        return self.rating_total / self.ratings_count if self.ratings_count else None
+
+    class Meta:
+        db_table = 'rating_rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['genre', 'release_year', 'month'], name='rating_rollup_cell_uniq'),
+        ]
+        indexes = [
+            # Incremental refreshes replace whole months
+            models.Index(fields=['month'], name='rating_rollup_month_idx'),
+        ]
+
+
+class RollupState(models.Model):
+    """
+    High-water mark of a rollup: ratings with a newer timestamp or a higher
+    id than this were not aggregated yet.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    high_water_timestamp = models.BigIntegerField(default=-1)
+    high_water_id = models.BigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} @ ts={self.high_water_timestamp} id={self.high_water_id}"
+
+    class Meta:
+        db_table = 'rollup_state'
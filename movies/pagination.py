@@ -0,0 +1,58 @@
+from rest_framework.pagination import CursorPagination
+
+
+class MovieCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the movie_id primary key.
+    Each page is `WHERE movie_id > <cursor> ORDER BY movie_id LIMIT n`,
+    so deep pages cost the same as the first one (no OFFSET scan).
+    """
+    ordering = 'movie_id'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    # ?ordering= values; each is served by an index ending in movie_id
+    # (movie_year_idx, movie_norm_title_idx), which also breaks ties
+    ORDERINGS = {
+        'movie_id': 'movie_id',
+        'year': ('year', 'movie_id'),
+        '-year': ('-year', '-movie_id'),
+        'title': ('normalized_title', 'movie_id'),
+    }
+
+    def __init__(self, ordering='movie_id'):
+        self.ordering = self.ORDERINGS[ordering]
+
+
+class RecentFirstCursorPagination(CursorPagination):
+    """
+    Newest-first keyset pagination for a movie's ratings or tags,
+    served from the (movie, timestamp) indexes.
+    """
+    ordering = ('-timestamp', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    embedded = False
+
+    def paginate_embedded(self, queryset, request, base_url, page_size):
+        """
+        First page of a sub-collection embedded in another resource.
+        The `next` link points at the sub-collection's own endpoint (base_url).
+        """
+        self.embedded = True
+        self.page_size = page_size
+        page = self.paginate_queryset(queryset, request)
+        self.base_url = base_url
+        return page
+
+    def decode_cursor(self, request):
+        if self.embedded:
+            return None
+        return super().decode_cursor(request)
+
+    def get_page_size(self, request):
+        if self.embedded:
+            return self.page_size
+        return super().get_page_size(request)
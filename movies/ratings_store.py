@@ -0,0 +1,158 @@
+"""
+Columnar snapshot of the ratings table for analytics.
+
+The table is copied into NumPy columns twice, once sorted by movie and once
+by user, each with an offsets array (CSR style), and saved with
+movies.array_store so every process memory-maps the same pages:
+
+    movie_ids[i]                      i-th movie, ascending
+    movie_offsets[i]:movie_offsets[i+1]
+                                      its rows in by_movie_user / by_movie_rating / by_movie_ts
+    user_ids, user_offsets, by_user_movie, by_user_rating, by_user_ts
+                                      the same, grouped by user
+
+Ratings are stored as uint8 half stars (rating * 2) and timestamps as int32,
+so a rating costs 13 bytes per ordering instead of a ~1 KB ORM object, and
+per-movie/per-user aggregates are np.add.reduceat / np.bincount calls.
+
+The snapshot is rebuilt by import_data and by the refresh_ratings_snapshot
+Beat task; writes in between are not reflected until the next rebuild
+(meta['built_at'] tells how old it is).
+"""
+import time
+import numpy as np
+from .array_store import load_arrays, save_arrays
+from .models import Rating
+
+STORE_NAME = 'ratings_columnar'
+LOAD_CHUNK_SIZE = 100000
+HALF_STARS = 11  # bincount bins 0..10, bin k counts ratings of k / 2 stars
+
+
+def _load_columns():
+    """
+    All ratings as (user_id, movie_id, half_stars, timestamp) arrays, chunk
+    by chunk. Sized from count(), grown if rows are inserted while reading.
+    """
+    columns = np.empty((Rating.objects.count(), 4), dtype=np.int64)
+    n = 0
+    rows = Rating.objects.order_by().values_list('user_id', 'movie_id', 'rating', 'timestamp')
+    chunk = []
+    for row in rows.iterator(chunk_size=LOAD_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) == LOAD_CHUNK_SIZE:
+            columns, n = _fill(columns, chunk, n)
+            chunk = []
+    if chunk:
+        columns, n = _fill(columns, chunk, n)
+    columns = columns[:n]
+    return columns[:, 0], columns[:, 1], columns[:, 2], columns[:, 3]
+
+
+def _fill(columns, chunk, offset):
+    block = np.array(chunk, dtype=np.float64)
+    block[:, 2] = np.rint(block[:, 2] * 2)
+    end = offset + len(block)
+    if end > len(columns):
+        grown = np.empty((max(end, len(columns) * 3 // 2), 4), dtype=columns.dtype)
+        grown[:offset] = columns[:offset]
+        columns = grown
+    columns[offset:end] = block
+    return columns, end
+
+
+def _grouped(keys, secondary):
+    """Sort order by (keys, secondary), the distinct keys and CSR offsets."""
+    order = np.lexsort((secondary, keys))
+    sorted_keys = keys[order]
+    ids, starts = np.unique(sorted_keys, return_index=True)
+    offsets = np.append(starts, len(sorted_keys)).astype(np.int64)
+    return order, ids.astype(np.int32), offsets
+
+
+def rebuild_ratings_store():
+    """Snapshot the ratings table into the columnar store. Returns the row count."""
+    users, movies, half_stars, timestamps = _load_columns()
+
+    by_movie, movie_ids, movie_offsets = _grouped(movies, users)
+    by_user, user_ids, user_offsets = _grouped(users, movies)
+    save_arrays(
+        STORE_NAME,
+        {
+            'movie_ids': movie_ids,
+            'movie_offsets': movie_offsets,
+            'by_movie_user': users[by_movie].astype(np.int32),
+            'by_movie_rating': half_stars[by_movie].astype(np.uint8),
+            'by_movie_ts': timestamps[by_movie].astype(np.int32),
+            'user_ids': user_ids,
+            'user_offsets': user_offsets,
+            'by_user_movie': movies[by_user].astype(np.int32),
+            'by_user_rating': half_stars[by_user].astype(np.uint8),
+            'by_user_ts': timestamps[by_user].astype(np.int32),
+        },
+        meta={'rows': int(len(users)), 'built_at': time.time()},
+    )
+    return len(users)
+
+
+def load_store():
+    """(arrays, meta) of the current snapshot, or (None, None) if never built."""
+    return load_arrays(STORE_NAME)
+
+
+def _rows(ids, offsets, key):
+    """Slice bounds of one movie/user, or None if it has no ratings."""
+    i = int(np.searchsorted(ids, key))
+    if i >= len(ids) or ids[i] != key:
+        return None
+    return int(offsets[i]), int(offsets[i + 1])
+
+
+def movie_rows(movie_id):
+    """(user_ids, half_stars, timestamps) of a movie's ratings, or None."""
+    arrays, _ = load_store()
+    bounds = arrays and _rows(arrays['movie_ids'], arrays['movie_offsets'], movie_id)
+    if not bounds:
+        return None
+    start, stop = bounds
+    return arrays['by_movie_user'][start:stop], arrays['by_movie_rating'][start:stop], arrays['by_movie_ts'][start:stop]
+
+
+def user_rows(user_id):
+    """(movie_ids, half_stars, timestamps) of a user's ratings, or None."""
+    arrays, _ = load_store()
+    bounds = arrays and _rows(arrays['user_ids'], arrays['user_offsets'], user_id)
+    if not bounds:
+        return None
+    start, stop = bounds
+    return arrays['by_user_movie'][start:stop], arrays['by_user_rating'][start:stop], arrays['by_user_ts'][start:stop]
+
+
+def summarize(half_stars):
+    """Count, average and half-star histogram of a block of ratings."""
+    histogram = np.bincount(half_stars, minlength=HALF_STARS)
+    count = int(histogram.sum())
+    total = float(np.dot(histogram, np.arange(HALF_STARS))) / 2
+    return {
+        'count': count,
+        'average': round(total / count, 4) if count else None,
+        'histogram': {f'{k / 2:.1f}': int(n) for k, n in enumerate(histogram) if k},
+    }
+
+
+def group_aggregates(by='movie'):
+    """
+    Count and average rating of every movie (or user) as arrays
+    (ids, counts, averages), from one np.add.reduceat over the sorted column.
+    """
+    arrays, _ = load_store()
+    if arrays is None:
+        return None
+    ids = arrays[f'{by}_ids']
+    offsets = arrays[f'{by}_offsets']
+    ratings = arrays[f'by_{by}_rating']
+    counts = np.diff(offsets)
+    if not len(ids):
+        return ids, counts, np.zeros(0)
+    sums = np.add.reduceat(ratings, offsets[:-1], dtype=np.int64)
+    return ids, counts, sums / 2 / counts
@@ -0,0 +1,243 @@
+"""
+Genre x release year x rating month rollups (RatingRollup).
+
+refresh_rollups() is incremental: it looks only at ratings past the
+RollupState high-water mark (a newer timestamp, or a higher id for rows
+inserted with an old timestamp), finds the months they fall in, and
+recomputes just those months - count, rating total and distinct users of
+every (genre, release year) cell - from the ratings of those months.
+Recomputing whole months rather than adding deltas keeps the refresh
+idempotent and keeps distinct_users exact.
+
+Deletions and edits that keep an old timestamp are not seen by the
+high-water mark: writers that know them pass their timestamps (see
+import_data --incremental), and refresh_rollups(full=True), run nightly,
+rebuilds everything. The full rebuild fills a temporary staging table batch
+by batch, outside any transaction, and swaps it in with one short
+transaction at the end, so the SQLite write lock is never held while
+ratings are read and aggregated.
+
+The aggregation itself is NumPy: ratings of a batch of months are
+expanded to one row per (rating, genre of its movie), keyed by cell, and
+reduced with np.unique / np.bincount.
+"""
+from datetime import date
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Max, Min, Q, Sum
+from django.utils import timezone
+from .models import Movie, RatingRollup, Rating, RollupState
+
+STATE_NAME = 'genre_year_month'
+MONTHS_PER_BATCH = 12
+LOAD_CHUNK_SIZE = 100000
+STAGING_TABLE = 'rating_rollups_staging'
+COLUMNS = ('genre_id', 'release_year', 'month', 'ratings_count', 'rating_total', 'distinct_users')
+
+
+def _month_index(timestamps):
+    """Months since 1970-01 of Unix timestamps."""
+    return np.asarray(timestamps, dtype='datetime64[s]').astype('datetime64[M]').astype(np.int64)
+
+
+def _month_bounds(month):
+    """[start, end) Unix timestamps of a month index."""
+    start = np.datetime64(int(month), 'M').astype('datetime64[s]').astype(np.int64)
+    end = np.datetime64(int(month) + 1, 'M').astype('datetime64[s]').astype(np.int64)
+    return int(start), int(end)
+
+
+def _month_date(month):
+    return date(1970 + int(month) // 12, int(month) % 12 + 1, 1)
+
+
+def _movie_lookup():
+    """(movie_ids, years, genre_offsets, genre_ids): each movie's year and genres, CSR style."""
+    movies = sorted(Movie.objects.values_list('movie_id', 'year'))
+    movie_ids = np.array([m for m, _ in movies], dtype=np.int64)
+    years = np.array([year or 0 for _, year in movies], dtype=np.int64)
+
+    links = np.array(
+        sorted(Movie.genres.through.objects.values_list('movie_id', 'genre_id')), dtype=np.int64
+    ).reshape(-1, 2)
+    rows = np.searchsorted(movie_ids, links[:, 0])
+    counts = np.bincount(rows, minlength=len(movie_ids))
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    return movie_ids, years, offsets, links[:, 1]
+
+
+def _aggregate(ratings, lookup):
+    """RatingRollup rows for an array of (user_id, movie_id, rating, timestamp) rows."""
+    movie_ids, years, offsets, genre_ids = lookup
+    users, movies, values, timestamps = ratings.T
+    rows = np.searchsorted(movie_ids, movies)
+    known = (rows < len(movie_ids)) & (movie_ids[np.minimum(rows, len(movie_ids) - 1)] == movies)
+    users, values, timestamps, rows = users[known], values[known], timestamps[known], rows[known]
+
+    # One entry per (rating, genre of its movie)
+    per_rating = offsets[rows + 1] - offsets[rows]
+    rating_idx = np.repeat(np.arange(len(rows)), per_rating)
+    genre_pos = offsets[rows][rating_idx] + (
+        np.arange(len(rating_idx)) - np.repeat(np.cumsum(per_rating) - per_rating, per_rating)
+    )
+    genres = genre_ids[genre_pos]
+    cell_year = years[rows][rating_idx]
+    cell_month = _month_index(timestamps[rating_idx].astype(np.int64))
+
+    cells, cell_of = np.unique(np.stack([genres, cell_year, cell_month], axis=1), axis=0, return_inverse=True)
+    cell_of = cell_of.ravel()
+    counts = np.bincount(cell_of, minlength=len(cells))
+    totals = np.bincount(cell_of, weights=values[rating_idx], minlength=len(cells))
+    user_pairs = np.unique(np.stack([cell_of, users[rating_idx].astype(np.int64)], axis=1), axis=0)
+    distinct = np.bincount(user_pairs[:, 0], minlength=len(cells))
+
+    return [
+        RatingRollup(
+            genre_id=int(genre), release_year=int(year), month=_month_date(month),
+            ratings_count=int(n), rating_total=float(total), distinct_users=int(d),
+        )
+        for (genre, year, month), n, total, d in zip(cells, counts, totals, distinct)
+    ]
+
+
+def _load(queryset):
+    """
+    (user_id, movie_id, rating, timestamp) rows of a queryset as one array,
+    filled chunk by chunk. Sized from count(), grown if rows are inserted
+    while reading.
+    """
+    columns = np.empty((queryset.count(), 4), dtype=np.float64)
+    n = 0
+    rows = queryset.order_by().values_list('user_id', 'movie_id', 'rating', 'timestamp')
+    chunk = []
+    for row in rows.iterator(chunk_size=LOAD_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) == LOAD_CHUNK_SIZE:
+            columns, n = _fill(columns, chunk, n)
+            chunk = []
+    if chunk:
+        columns, n = _fill(columns, chunk, n)
+    return columns[:n]
+
+
+def _fill(columns, chunk, offset):
+    end = offset + len(chunk)
+    if end > len(columns):
+        grown = np.empty((max(end, len(columns) * 3 // 2), 4), dtype=columns.dtype)
+        grown[:offset] = columns[:offset]
+        columns = grown
+    columns[offset:end] = chunk
+    return columns, end
+
+
+def _month_batches(months, lookup):
+    """(month indexes, rollup rows) for every MONTHS_PER_BATCH months."""
+    months = sorted(months)
+    for i in range(0, len(months), MONTHS_PER_BATCH):
+        batch = months[i:i + MONTHS_PER_BATCH]
+        ranges = Q()
+        for month in batch:
+            start, end = _month_bounds(month)
+            ranges |= Q(timestamp__gte=start, timestamp__lt=end)
+        yield batch, _aggregate(_load(Rating.objects.filter(ranges)), lookup)
+
+
+def _rebuild_months(months, lookup):
+    """Replace the rollup rows of the given month indexes; returns rows written."""
+    written = 0
+    for batch, rows in _month_batches(months, lookup):
+        with transaction.atomic():
+            RatingRollup.objects.filter(month__in=[_month_date(m) for m in batch]).delete()
+            RatingRollup.objects.bulk_create(rows, batch_size=1000)
+        written += len(rows)
+    return written
+
+
+def _rebuild_all(months, lookup, state, marks):
+    """
+    Replace every rollup row with those of `months`, staged in a temporary
+    table first; the old rollups stay readable, and are kept if any batch
+    fails. Returns rows written.
+    """
+    columns = ', '.join(COLUMNS)
+    placeholders = ', '.join(['%s'] * len(COLUMNS))
+    written = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE TEMPORARY TABLE {STAGING_TABLE} ({columns})')
+        try:
+            for _, rows in _month_batches(months, lookup):
+                cursor.executemany(
+                    f'INSERT INTO {STAGING_TABLE} ({columns}) VALUES ({placeholders})',
+                    [
+                        (row.genre_id, row.release_year, row.month.isoformat(),
+                         row.ratings_count, row.rating_total, row.distinct_users)
+                        for row in rows
+                    ],
+                )
+                written += len(rows)
+            with transaction.atomic():
+                RatingRollup.objects.all().delete()
+                cursor.execute(
+                    f'INSERT INTO {RatingRollup._meta.db_table} ({columns}) '
+                    f'SELECT {columns} FROM {STAGING_TABLE}'
+                )
+                _advance(state, marks)
+        finally:
+            cursor.execute(f'DROP TABLE {STAGING_TABLE}')
+    return written
+
+
+def refresh_rollups(full=False, timestamps=()):
+    """
+    Bring RatingRollup up to date. The months of `timestamps` (of deleted
+    or edited ratings) are recomputed along with those past the high-water
+    mark. Returns a summary dict with the months recomputed and the rollup
+    rows written.
+    """
+    state, _ = RollupState.objects.get_or_create(name=STATE_NAME)
+    marks = Rating.objects.aggregate(ts=Max('timestamp'), id=Max('id'))
+    if marks['id'] is None:
+        RatingRollup.objects.all().delete()
+        return {'months': 0, 'rows': 0}
+
+    if full:
+        first, last = _month_index([Rating.objects.aggregate(ts=Min('timestamp'))['ts'], marks['ts']])
+        months = set(range(int(first), int(last) + 1))
+        written = _rebuild_all(months, _movie_lookup(), state, marks)
+    else:
+        changed = Rating.objects.filter(
+            Q(timestamp__gt=state.high_water_timestamp) | Q(id__gt=state.high_water_id)
+        )
+        timestamps = np.concatenate([
+            np.array(changed.order_by().values_list('timestamp', flat=True), dtype=np.int64),
+            np.fromiter(timestamps, dtype=np.int64),
+        ])
+        months = set(np.unique(_month_index(timestamps)).tolist())
+        written = _rebuild_months(months, _movie_lookup()) if months else 0
+        _advance(state, marks)
+    return {'months': len(months), 'rows': written, 'full': full}
+
+
+def _advance(state, marks):
+    """Move the high-water mark past the ratings seen by this refresh."""
+    state.high_water_timestamp = max(marks['ts'], state.high_water_timestamp)
+    state.high_water_id = max(marks['id'], state.high_water_id)
+    state.refreshed_at = timezone.now()
+    state.save()
+
+
+def rollup_totals(group_by, **filters):
+    """
+    Dashboard query: sum RatingRollup rows grouped by any of 'genre',
+    'release_year', 'month'. distinct_users is exact only when grouping by
+    all three (a user active in two cells is counted in both), and a rating
+    appears once per genre of its movie, so callers group or filter by genre.
+    """
+    fields = [{'genre': 'genre__name'}.get(field, field) for field in group_by]
+    rows = (
+        RatingRollup.objects.filter(**filters)
+        .values(*fields)
+        .annotate(ratings=Sum('ratings_count'), total=Sum('rating_total'), users=Sum('distinct_users'))
+        .order_by(*fields)
+    )
+    return list(rows)
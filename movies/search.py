@@ -0,0 +1,68 @@
+"""
+Full-text title search backed by an SQLite FTS5 index.
+
+`movies_fts` is an external-content FTS5 table over `movies.title`
+(rowid = movie_id), so it stores only the inverted index, not a second copy
+of the titles. Triggers on `movies` keep it in sync with every insert,
+update and delete, including the rows written by import_data. The table
+and triggers are created by migration 0006 (and recreated by 0010, after
+SQLite remade the movies table).
+"""
+import re
+from django.db import connection
+
+FTS_TABLE = 'movies_fts'
+
+
+def rebuild_title_index(conn=connection):
+    """Re-read every title from `movies`, e.g. after loading rows with triggers bypassed."""
+    with conn.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def match_expression(query):
+    """
+    Turn free text into an FTS5 MATCH expression: every word becomes a quoted
+    prefix term, so 'star wa' matches 'Star Wars' and FTS syntax characters
+    in user input are never interpreted.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_titles(query, limit=20, year_from=None, year_to=None, ordering='rank'):
+    """
+    Ranked title search. Returns a list of (movie_id, title, year, rank)
+    where a lower bm25 rank is a better match. year_from/year_to narrow the
+    matches to a release year range; ordering='year' or '-year' sorts them
+    by year (movies without a year last), then by rank.
+    """
+    expression = match_expression(query)
+    if not expression:
+        return []
+    conditions = [f'{FTS_TABLE} MATCH %s']
+    params = [expression]
+    if year_from is not None:
+        conditions.append('m.year >= %s')
+        params.append(year_from)
+    if year_to is not None:
+        conditions.append('m.year <= %s')
+        params.append(year_to)
+    order_by = {
+        'rank': 'rank',
+        'year': 'm.year IS NULL, m.year, rank',
+        '-year': 'm.year IS NULL, m.year DESC, rank',
+    }[ordering]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT m.movie_id, m.title, m.year, bm25({FTS_TABLE}) AS rank
+            FROM {FTS_TABLE}
+            JOIN movies m ON m.movie_id = {FTS_TABLE}.rowid
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {order_by}
+            LIMIT %s
+            """,
+            [*params, limit],
+        )
+        return cursor.fetchall()
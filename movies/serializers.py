@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Movie, Rating, Tag, Link, Genre
+from .models import Movie, Rating, Tag, Link, Genre, MovieStats
 
 
 class GenreSerializer(serializers.ModelSerializer):
@@ -32,28 +32,39 @@ class MovieListSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Movie
-        fields = ['movie_id', 'title', 'genres']
+        fields = ['movie_id', 'title', 'year', 'genres']
 
 
 class MovieDetailSerializer(serializers.ModelSerializer):
-    """Detailed serializer with related data"""
+    """
+    Detailed serializer with related data.
+    Aggregates come from MovieStats (select_related('stats')); ratings and tags
+    are not nested here because a popular movie has tens of thousands of them,
+    the movie detail view adds a newest-first page of each instead.
+    """
     genres = GenreSerializer(many=True, read_only=True)
     links = LinkSerializer(read_only=True)
-    ratings = RatingSerializer(many=True, read_only=True)
-    tags = TagSerializer(many=True, read_only=True)
     average_rating = serializers.SerializerMethodField()
     ratings_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Movie
-        fields = ['movie_id', 'title', 'genres', 'links', 'average_rating', 
-                  'ratings_count', 'ratings', 'tags']
+        fields = ['movie_id', 'title', 'year', 'genres', 'links', 'average_rating', 
+                  'ratings_count']
+    
+    def _stats(self, obj):
+        # Use select_related('stats') on the queryset to avoid an extra query
+        try:
+            return obj.stats
+        except MovieStats.DoesNotExist:
+            return None
     
     def get_average_rating(self, obj):
-        ratings = obj.ratings.all()
-        if ratings:
-            return round(sum(r.rating for r in ratings) / len(ratings), 2)
+        stats = self._stats(obj)
+        if stats and stats.count:
+            return round(stats.average, 2)
         return None
     
     def get_ratings_count(self, obj):
-        return obj.ratings.count()
+        stats = self._stats(obj)
+        return stats.count if stats else 0
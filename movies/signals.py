@@ -0,0 +1,127 @@
+"""
+Signal receivers that keep derived data (MovieStats, the tag index, the
+genre bitsets, cache generations) in sync with single-row writes. Bulk
+paths (bulk_create, queryset.update(), import_data) bypass these and
+refresh the derived data explicitly.
+"""
+import threading
+from contextlib import contextmanager
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import Genre, Link, Movie, Rating, Tag
+from . import stats, tag_index
+from .cache_utils import writes_committed
+
+_state = threading.local()
+
+
+@contextmanager
+def deferred_signals():
+    """
+    Suspend per-row maintenance, for bulk writers that refresh the
+    derived data of the movies they touched afterwards.
+    """
+    previous = getattr(_state, 'deferred', False)
+    _state.deferred = True
+    try:
+        yield
+    finally:
+        _state.deferred = previous
+
+
+def signals_deferred():
+    return getattr(_state, 'deferred', False)
+
+
+@receiver(post_save, sender=Rating)
+def rating_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or signals_deferred():
+        return
+    if created:
+        stats.apply_rating_deltas([(instance.movie_id, instance.rating)])
+    else:
+        # The previous value is unknown, recompute this movie only
+        stats.rebuild_movie_stats([instance.movie_id])
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance, **kwargs):
+    if signals_deferred():
+        return
+    stats.rebuild_movie_stats([instance.movie_id])
+
+
+@receiver(pre_save, sender=Tag)
+def tag_saving(sender, instance, raw=False, **kwargs):
+    # Remember the stored tag so an edit can be moved to its new term
+    instance._previous_tag = None
+    if raw or signals_deferred() or instance._state.adding:
+        return
+    instance._previous_tag = Tag.objects.filter(pk=instance.pk).values_list('movie_id', 'tag').first()
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or signals_deferred():
+        return
+    previous = getattr(instance, '_previous_tag', None)
+    tag_index.apply_tag_deltas(
+        added=[(instance.movie_id, instance.tag)],
+        removed=[previous] if previous else [],
+    )
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    if signals_deferred():
+        return
+    tag_index.apply_tag_deltas(removed=[(instance.movie_id, instance.tag)])
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+@receiver(m2m_changed, sender=Movie.genres.through)
+def catalog_changed(sender, raw=False, created=True, action='post_add', **kwargs):
+    if raw or signals_deferred() or not created or not action.startswith('post_'):
+        return
+    from .genre_index import schedule_rebuild
+    transaction.on_commit(schedule_rebuild)
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Link)
+@receiver(post_delete, sender=Link)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def bump_cache_generations(sender, instance, raw=False, **kwargs):
+    if raw or signals_deferred():
+        return
+    movie_id = getattr(instance, 'movie_id', None)
+    writes_committed(sender, [movie_id] if movie_id is not None else [])
+
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+def bump_genre_generations(sender, instance, action, reverse, pk_set, **kwargs):
+    if signals_deferred():
+        return
+    if reverse and action == 'pre_clear':
+        # genre.movies.clear() sends no pk_set, and by post_clear the links
+        # are gone: remember the movies that are about to leave the genre
+        instance._cleared_movie_ids = list(instance.movies.values_list('movie_id', flat=True))
+        return
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        movie_ids = [instance.movie_id]
+    elif action == 'post_clear':
+        movie_ids = instance.__dict__.pop('_cleared_movie_ids', [])
+    else:
+        # genre.movies.add(...) / remove(...): pk_set holds the movie ids
+        movie_ids = pk_set
+    writes_committed(Movie, movie_ids)
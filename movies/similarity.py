@@ -0,0 +1,186 @@
+"""
+Offline item-item collaborative filtering.
+
+Ratings are loaded into a sparse item x user CSR matrix (optionally
+centered on each user's mean: adjusted cosine), rows are L2-normalized, and
+item-item cosine similarities are computed block by block as sparse matrix
+products X[block] @ X.T. Only the top-K neighbours of each item are kept,
+so memory is bounded by the block size, never by n_items^2.
+
+The result is stored with movies.array_store as two (n_movies, K) arrays:
+neighbour movie ids (int32) and scores (float16).
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+from .array_store import load_arrays, save_arrays
+from .models import Rating
+
+STORE_NAME = 'item_similarity'
+LOAD_CHUNK_SIZE = 100000
+
+
+def load_ratings():
+    """
+    All ratings as parallel NumPy arrays (user_id, movie_id, rating),
+    filled chunk by chunk so no list of row objects is ever built. The
+    arrays are sized from count() but grow if rows are inserted while they
+    are read, and are trimmed to the rows actually read.
+    """
+    columns = [
+        np.empty(Rating.objects.count(), dtype=dtype)
+        for dtype in (np.int32, np.int32, np.float32)
+    ]
+    n = 0
+    rows = Rating.objects.order_by().values_list('user_id', 'movie_id', 'rating')
+    chunk = []
+    for row in rows.iterator(chunk_size=LOAD_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) == LOAD_CHUNK_SIZE:
+            columns, n = _fill(chunk, columns, n)
+            chunk = []
+    if chunk:
+        columns, n = _fill(chunk, columns, n)
+    return tuple(column[:n] for column in columns)
+
+
+def _fill(chunk, columns, offset):
+    """Copy a chunk of rows into the column arrays at offset, growing them if needed."""
+    block = np.array(chunk, dtype=np.float64)
+    end = offset + len(block)
+    if end > len(columns[0]):
+        size = max(end, len(columns[0]) * 3 // 2)
+        columns = [_grown(column, size) for column in columns]
+    for i, column in enumerate(columns):
+        column[offset:end] = block[:, i]
+    return columns, end
+
+
+def _grown(array, size):
+    grown = np.empty(size, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def item_user_matrix(users, movies, values, adjusted=True):
+    """
+    Build the L2-row-normalized item x user CSR matrix.
+    Returns (matrix, movie_ids) where row i belongs to movie_ids[i].
+    """
+    movie_ids, item_index = np.unique(movies, return_inverse=True)
+    _, user_index = np.unique(users, return_inverse=True)
+    n_users = int(user_index.max()) + 1 if len(user_index) else 0
+
+    data = values.astype(np.float32)
+    if adjusted:
+        # Adjusted cosine: remove each user's rating bias
+        sums = np.bincount(user_index, weights=data, minlength=n_users)
+        counts = np.bincount(user_index, minlength=n_users)
+        data = data - (sums / np.maximum(counts, 1)).astype(np.float32)[user_index]
+
+    matrix = sparse.csr_matrix(
+        (data, (item_index, user_index)), shape=(len(movie_ids), n_users), dtype=np.float32
+    )
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    matrix = sparse.diags(1.0 / norms).astype(np.float32) @ matrix
+    return matrix.tocsr(), movie_ids.astype(np.int32)
+
+
+# Peak bytes per row of a score block, per item: the dense float32 scores
+# (4), the sparse product they come from, float32 data + int32 indices
+# when dense (8), and argpartition's int64 indices (8)
+BYTES_PER_SCORE = 4 + 8 + 8
+
+
+def top_k_block(matrix, transposed, start, stop, k):
+    """Top-k neighbours (indices, scores) of rows start:stop."""
+    scores = (matrix[start:stop] @ transposed).toarray()
+    # argpartition selects the smallest: negate in place rather than
+    # allocating a negated copy. An item is not its own neighbour.
+    np.negative(scores, out=scores)
+    scores[np.arange(stop - start), np.arange(start, stop)] = np.inf
+
+    k = min(k, scores.shape[1] - 1)
+    top = np.argpartition(scores, k, axis=1)[:, :k]
+    top_scores = -np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def compute_similarities(matrix, k, memory_mb, workers=None, progress=None):
+    """
+    Top-k cosine neighbours of every row of a normalized CSR matrix.
+    Blocks are sized so that all workers' score blocks, with the temporaries
+    of computing them (BYTES_PER_SCORE per item), stay within memory_mb
+    together, and are processed concurrently by a thread pool.
+    """
+    n_items = matrix.shape[0]
+    workers = workers or os.cpu_count() or 1
+    bytes_per_row = max(n_items, 1) * BYTES_PER_SCORE
+    block_rows = max(1, min(n_items, int(memory_mb * 1024 * 1024 / workers / bytes_per_row)))
+
+    k = max(1, min(k, n_items - 1))
+    neighbours = np.zeros((n_items, k), dtype=np.int32)
+    scores = np.zeros((n_items, k), dtype=np.float32)
+    transposed = matrix.T.tocsr()
+
+    starts = range(0, n_items, block_rows)
+    done = 0
+
+    def run(start):
+        stop = min(start + block_rows, n_items)
+        idx, vals = top_k_block(matrix, transposed, start, stop, k)
+        neighbours[start:stop] = idx
+        scores[start:stop] = vals
+        return stop - start
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for rows in pool.map(run, starts):
+            done += rows
+            if progress:
+                progress(done, n_items)
+    return neighbours, scores
+
+
+def build_item_similarities(k=None, adjusted=True, memory_mb=None, progress=None):
+    """Compute and store the top-k neighbours of every rated movie."""
+    k = k or settings.SIMILAR_MOVIES_TOP_K
+    memory_mb = memory_mb or settings.SIMILARITY_MEMORY_MB
+
+    users, movies, values = load_ratings()
+    matrix, movie_ids = item_user_matrix(users, movies, values, adjusted=adjusted)
+    del users, movies, values
+    if len(movie_ids) < 2:
+        return {'movies': len(movie_ids), 'message': 'Not enough rated movies'}
+
+    neighbours, scores = compute_similarities(matrix, k, memory_mb, progress=progress)
+    version = save_arrays(
+        STORE_NAME,
+        {
+            'movie_ids': movie_ids,
+            'neighbours': movie_ids[neighbours],
+            'scores': scores.astype(np.float16),
+        },
+        meta={'k': int(neighbours.shape[1]), 'method': 'adjusted_cosine' if adjusted else 'cosine'},
+    )
+    return {'movies': len(movie_ids), 'k': int(neighbours.shape[1]), 'version': version}
+
+
+def similar_movies(movie_id, limit=10):
+    """
+    Stored neighbours of a movie as a list of (movie_id, score), best first.
+    Returns None if the similarity table has not been built yet.
+    """
+    arrays, _ = load_arrays(STORE_NAME)
+    if arrays is None:
+        return None
+    movie_ids = arrays['movie_ids']
+    row = int(np.searchsorted(movie_ids, movie_id))
+    if row >= len(movie_ids) or movie_ids[row] != movie_id:
+        return []
+    neighbours = arrays['neighbours'][row, :limit]
+    scores = arrays['scores'][row, :limit]
+    return [(int(m), float(s)) for m, s in zip(neighbours, scores) if s > 0]
@@ -0,0 +1,179 @@
+"""
+Maintenance of the materialized MovieStats table.
+
+- rebuild_movie_stats(): bulk (re)computation from one grouped query,
+  used after import_data and after bulk writes.
+- refresh_stats_range(): in-place recomputation of one movie-id range, the
+  unit of work of the fan-out movie_stats_job (see movies.tasks).
+- apply_rating_deltas(): incremental updates for newly added ratings.
+- movie_stats_for(): O(1) lookup used by views, serializers and tasks.
+"""
+from collections import Counter, defaultdict
+from django.db import connection, transaction
+from django.db.models import Count
+from .models import Movie, MovieStats, Rating
+
+BATCH_SIZE = 500
+
+
+def histogram_field(rating):
+    """Histogram column for a rating, snapped to the nearest half star."""
+    half_stars = min(max(int(round(rating * 2)), 1), 10)
+    return MovieStats.HISTOGRAM_FIELDS[half_stars - 1]
+
+
+def _build(movie_id, buckets):
+    """Build a MovieStats row from {rating: count} of one movie."""
+    stats = MovieStats(movie_id=movie_id)
+    for rating, n in buckets.items():
+        stats.count += n
+        stats.total += rating * n
+        stats.total_sq += rating * rating * n
+        field = histogram_field(rating)
+        setattr(stats, field, getattr(stats, field) + n)
+    stats.min_rating = min(buckets)
+    stats.max_rating = max(buckets)
+    return stats
+
+
+def rebuild_movie_stats(movie_ids=None):
+    """
+    Recompute MovieStats for the given movies (or every movie) from a single
+    GROUP BY (movie_id, rating) query. Returns the number of rows written.
+    """
+    if movie_ids is None:
+        batches = [None]
+    else:
+        movie_ids = sorted(set(movie_ids))
+        batches = [movie_ids[i:i + BATCH_SIZE] for i in range(0, len(movie_ids), BATCH_SIZE)]
+
+    written = 0
+    for batch in batches:
+        ratings = Rating.objects.all()
+        existing = MovieStats.objects.all()
+        if batch is not None:
+            ratings = ratings.filter(movie_id__in=batch)
+            existing = existing.filter(movie_id__in=batch)
+
+        buckets = defaultdict(dict)
+        for movie_id, rating, n in (
+            ratings.order_by().values_list('movie_id', 'rating').annotate(n=Count('id'))
+        ):
+            buckets[movie_id][rating] = n
+
+        rows = [_build(movie_id, b) for movie_id, b in buckets.items()]
+        with transaction.atomic():
+            existing.delete()
+            MovieStats.objects.bulk_create(rows, batch_size=1000)
+        written += len(rows)
+    return written
+
+
+STATS_FIELDS = ['count', 'total', 'total_sq', 'min_rating', 'max_rating', *MovieStats.HISTOGRAM_FIELDS]
+
+
+def movie_id_ranges(chunk_size):
+    """[lo, hi) movie-id ranges of chunk_size movies each, covering the catalog."""
+    ids = list(Movie.objects.order_by('movie_id').values_list('movie_id', flat=True))
+    bounds = ids[::chunk_size] + ([ids[-1] + 1] if ids else [])
+    return list(zip(bounds, bounds[1:]))
+
+
+def refresh_stats_range(lo, hi):
+    """
+    Recompute MovieStats of the movies lo <= movie_id < hi from one GROUP BY
+    (movie_id, rating) query over the range and write them back with one
+    upsert per batch; rows of movies that lost all their ratings are zeroed.
+    Returns (movies written, ratings counted).
+    """
+    buckets = defaultdict(dict)
+    for movie_id, rating, n in (
+        Rating.objects.filter(movie_id__gte=lo, movie_id__lt=hi)
+        .order_by().values_list('movie_id', 'rating').annotate(n=Count('id'))
+    ):
+        buckets[movie_id][rating] = n
+
+    stale = MovieStats.objects.filter(movie_id__gte=lo, movie_id__lt=hi).exclude(movie_id__in=list(buckets))
+    rows = [_build(movie_id, b) for movie_id, b in buckets.items()]
+    rows += [MovieStats(movie_id=movie_id) for movie_id in stale.values_list('movie_id', flat=True)]
+    # An upsert rather than bulk_update(): the CASE WHEN expressions bulk_update
+    # builds cost milliseconds of Python per row, the upsert is plain VALUES
+    MovieStats.objects.bulk_create(
+        rows, batch_size=BATCH_SIZE,
+        update_conflicts=True, unique_fields=['movie'], update_fields=STATS_FIELDS,
+    )
+    return len(rows), sum(sum(b.values()) for b in buckets.values())
+
+
+DELTA_COLUMNS = ['count', 'total', 'total_sq', 'min_rating', 'max_rating', *MovieStats.HISTOGRAM_FIELDS]
+
+
+def _delta_sql(rows):
+    """
+    One UPDATE adding the deltas of `rows` movies, joined from a VALUES list
+    whose columns are DELTA_COLUMNS then movie_id (column1 ... columnN).
+    """
+    table = connection.ops.quote_name(MovieStats._meta.db_table)
+    # Scalar two-argument min/max
+    least, greatest = ('MIN', 'MAX') if connection.vendor == 'sqlite' else ('LEAST', 'GREATEST')
+    value = {column: f'd.column{i}' for i, column in enumerate(DELTA_COLUMNS, start=1)}
+    assignments = [
+        *(f'{column} = {column} + {value[column]}' for column in DELTA_COLUMNS
+          if column not in ('min_rating', 'max_rating')),
+        f'min_rating = {least}(COALESCE(min_rating, {value["min_rating"]}), {value["min_rating"]})',
+        f'max_rating = {greatest}(COALESCE(max_rating, {value["max_rating"]}), {value["max_rating"]})',
+    ]
+    placeholders = '(' + ', '.join(['%s'] * (len(DELTA_COLUMNS) + 1)) + ')'
+    return (
+        f'UPDATE {table} SET {", ".join(assignments)} '
+        f'FROM (VALUES {", ".join([placeholders] * rows)}) AS d '
+        f'WHERE {table}.movie_id = d.column{len(DELTA_COLUMNS) + 1}'
+    )
+
+
+def apply_rating_deltas(ratings):
+    """
+    Add newly inserted ratings, given as (movie_id, rating) pairs, to
+    MovieStats without scanning `ratings`: the deltas of many movies go in
+    one UPDATE ... FROM (VALUES ...), plus a bulk_create for movies that had
+    no stats row yet.
+    """
+    per_movie = defaultdict(list)
+    for movie_id, rating in ratings:
+        per_movie[movie_id].append(rating)
+    if not per_movie:
+        return
+
+    with transaction.atomic():
+        existing = set(
+            MovieStats.objects.filter(movie_id__in=list(per_movie)).values_list('movie_id', flat=True)
+        )
+        deltas, creates = [], []
+        for movie_id, values in per_movie.items():
+            hist = Counter(histogram_field(r) for r in values)
+            low, high = min(values), max(values)
+            total, total_sq = sum(values), sum(r * r for r in values)
+            if movie_id in existing:
+                deltas.append((
+                    len(values), total, total_sq, low, high,
+                    *(hist.get(field, 0) for field in MovieStats.HISTOGRAM_FIELDS),
+                    movie_id,
+                ))
+            else:
+                creates.append(MovieStats(
+                    movie_id=movie_id, count=len(values), total=total, total_sq=total_sq,
+                    min_rating=low, max_rating=high, **hist,
+                ))
+
+        # As many movies per statement as the bound-parameter limit allows
+        per_statement = max((connection.features.max_query_params or 999) // (len(DELTA_COLUMNS) + 1), 1)
+        with connection.cursor() as cursor:
+            for start in range(0, len(deltas), per_statement):
+                batch = deltas[start:start + per_statement]
+                cursor.execute(_delta_sql(len(batch)), tuple(value for row in batch for value in row))
+        MovieStats.objects.bulk_create(creates, batch_size=1000)
+
+
+def movie_stats_for(movie_id):
+    """Primary-key lookup of a movie's stats; None if it has no ratings."""
+    return MovieStats.objects.filter(movie_id=movie_id).first()
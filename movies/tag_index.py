@@ -0,0 +1,151 @@
+"""
+Inverted index over user tags.
+
+TagTerm is the normalized vocabulary and TagPosting maps each term to the
+movies it was applied to, with a count. "Which movies are tagged X" and
+"top tags of movie Y" are then index lookups instead of GROUP BY scans over
+the whole `tags` table.
+"""
+from collections import Counter
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from .models import Tag, TagPosting, TagTerm
+
+BATCH_SIZE = 500
+
+
+def normalize_tag(tag):
+    """'  Dark   Comedy ' -> 'dark comedy'"""
+    return ' '.join(tag.casefold().split())
+
+
+def _refresh_terms(term_ids):
+    """Recompute movies_count/uses_count of the given terms and drop unused ones."""
+    term_ids = list(term_ids)
+    for i in range(0, len(term_ids), BATCH_SIZE):
+        batch = term_ids[i:i + BATCH_SIZE]
+        totals = {
+            term_id: (movies, uses)
+            for term_id, movies, uses in TagPosting.objects.filter(term_id__in=batch)
+            .values('term_id').annotate(movies=Count('id'), uses=Sum('count'))
+            .values_list('term_id', 'movies', 'uses')
+        }
+        TagTerm.objects.filter(id__in=batch).exclude(id__in=list(totals)).delete()
+        TagTerm.objects.bulk_update(
+            [TagTerm(id=term_id, movies_count=m, uses_count=u) for term_id, (m, u) in totals.items()],
+            ['movies_count', 'uses_count'], batch_size=BATCH_SIZE,
+        )
+
+
+def _term_ids(terms):
+    """Map normalized terms to ids, creating missing vocabulary entries."""
+    terms = set(terms)
+    TagTerm.objects.bulk_create([TagTerm(term=t) for t in terms], ignore_conflicts=True, batch_size=1000)
+    ids = {}
+    terms = list(terms)
+    for i in range(0, len(terms), BATCH_SIZE):
+        ids.update(TagTerm.objects.filter(term__in=terms[i:i + BATCH_SIZE]).values_list('term', 'id'))
+    return ids
+
+
+def rebuild_tag_index(movie_ids=None):
+    """
+    Rebuild postings from `tags`, for every movie or only the given ones.
+    Returns the number of postings written.
+    """
+    tags = Tag.objects.all()
+    postings = TagPosting.objects.all()
+    if movie_ids is not None:
+        movie_ids = sorted(set(movie_ids))
+        if not movie_ids:
+            return 0
+
+    with transaction.atomic():
+        if movie_ids is None:
+            TagPosting.objects.all().delete()
+            TagTerm.objects.all().delete()
+            batches = [None]
+        else:
+            batches = [movie_ids[i:i + BATCH_SIZE] for i in range(0, len(movie_ids), BATCH_SIZE)]
+
+        written = 0
+        affected_terms = set()
+        for batch in batches:
+            batch_tags, batch_postings = tags, postings
+            if batch is not None:
+                batch_tags = tags.filter(movie_id__in=batch)
+                batch_postings = postings.filter(movie_id__in=batch)
+                affected_terms.update(batch_postings.values_list('term_id', flat=True))
+                batch_postings.delete()
+
+            counts = Counter()
+            for movie_id, tag in batch_tags.values_list('movie_id', 'tag').iterator(chunk_size=10000):
+                term = normalize_tag(tag)
+                if term:
+                    counts[(movie_id, term)] += 1
+            ids = _term_ids(term for _, term in counts)
+            TagPosting.objects.bulk_create(
+                [TagPosting(term_id=ids[term], movie_id=movie_id, count=n) for (movie_id, term), n in counts.items()],
+                batch_size=1000,
+            )
+            affected_terms.update(ids.values())
+            written += len(counts)
+
+        _refresh_terms(affected_terms)
+    return written
+
+
+def apply_tag_deltas(added=(), removed=()):
+    """
+    Incrementally maintain postings for single tag writes.
+    `added`/`removed` are (movie_id, raw tag) pairs.
+    """
+    delta = Counter()
+    for movie_id, tag in added:
+        delta[(movie_id, normalize_tag(tag))] += 1
+    for movie_id, tag in removed:
+        delta[(movie_id, normalize_tag(tag))] -= 1
+    delta = {key: n for key, n in delta.items() if n and key[1]}
+    if not delta:
+        return
+
+    with transaction.atomic():
+        ids = _term_ids(term for _, term in delta)
+        for (movie_id, term), n in delta.items():
+            posting = TagPosting.objects.filter(term_id=ids[term], movie_id=movie_id)
+            if n < 0:
+                posting.filter(count__lte=-n).delete()
+            if not posting.update(count=F('count') + n) and n > 0:
+                TagPosting.objects.create(term_id=ids[term], movie_id=movie_id, count=n)
+        _refresh_terms(ids.values())
+
+
+def movies_for_terms(terms, op='and', limit=50):
+    """
+    Movies tagged with all (op='and') or any (op='or') of the given terms.
+    Returns dicts of movie_id, matched (number of terms matched) and score
+    (total tag applications across the matched terms), best first.
+    """
+    wanted = {normalize_tag(t) for t in terms} - {''}
+    term_ids = list(TagTerm.objects.filter(term__in=wanted).values_list('id', flat=True))
+    if not term_ids or (op == 'and' and len(term_ids) < len(wanted)):
+        return []
+
+    postings = (
+        TagPosting.objects.filter(term_id__in=term_ids)
+        .values('movie_id')
+        .annotate(matched=Count('term_id'), score=Sum('count'))
+    )
+    if op == 'and':
+        postings = postings.filter(matched=len(term_ids))
+    return list(postings.order_by('-matched', '-score', 'movie_id')[:limit])
+
+
+def tag_cloud(movie_id, limit=30):
+    """Top terms of one movie with their counts, heaviest first."""
+    return list(
+        TagPosting.objects.filter(movie_id=movie_id)
+        .order_by('-count', 'term__term')
+        .values('term__term', 'count', 'term__movies_count')[:limit]
+    )
+
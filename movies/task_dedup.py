@@ -0,0 +1,102 @@
+"""
+Deduplicated submission of heavy Celery tasks.
+
+submit_once(task, args, scopes) derives an idempotency key from the task
+name, its arguments and the current generation of the cache scopes the
+task reads (see cache_utils), and claims it with cache.add():
+
+- the first caller wins the claim and enqueues the task under a task id it
+  chose, stored in the key;
+- later callers get that task id back instead of enqueueing a duplicate,
+  whether the task is still queued, running or finished;
+- a finished result is served from the result backend until one of the
+  scopes is bumped, which changes the key and so starts a fresh task.
+
+Tasks submitted this way use DeduplicatedTask as their base, which keeps the
+claim for TASK_DEDUP_RESULT_TTL after a success and releases it after a
+failure, so the next caller retries. A claim whose task was lost (worker
+killed, broker flushed) expires after TASK_DEDUP_INFLIGHT_TTL.
+
+With the cache unreachable, tasks are enqueued without deduplication.
+"""
+import hashlib
+import json
+import logging
+import uuid
+from celery import Task, states
+from django.conf import settings
+from django.core.cache import cache
+from redis import RedisError
+from .cache_utils import generational_key
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'task-once:'
+HEADER = 'dedup_key'
+
+SUBMITTED = 'submitted'
+IN_FLIGHT = 'in_flight'
+CACHED = 'cached'
+
+
+def idempotency_key(task_name, args, scopes):
+    digest = hashlib.md5(json.dumps(list(args), sort_keys=True).encode()).hexdigest()
+    return generational_key(f'{KEY_PREFIX}{task_name}:{digest}', *scopes)
+
+
+def submit_once(task, args=(), scopes=()):
+    """
+    Enqueue task(*args) unless an identical one (same arguments, same data
+    generation) is already queued, running or done. Returns (AsyncResult,
+    status) where status is SUBMITTED, IN_FLIGHT or CACHED.
+    """
+    key = idempotency_key(task.name, args, scopes)
+    if key is None:
+        # Generations unavailable (Redis down): nothing to deduplicate against
+        return task.apply_async(args), SUBMITTED
+    try:
+        return _submit_claimed(task, args, key)
+    except RedisError as exc:
+        logger.warning('Task claim of %s unavailable, submitting without deduplication: %s', task.name, exc)
+        return task.apply_async(args), SUBMITTED
+
+
+def _submit_claimed(task, args, key):
+    """submit_once() for a known idempotency key."""
+    for _ in range(3):
+        task_id = str(uuid.uuid4())
+        if cache.add(key, task_id, timeout=settings.TASK_DEDUP_INFLIGHT_TTL):
+            return task.apply_async(args, task_id=task_id, headers={HEADER: key}), SUBMITTED
+        existing = cache.get(key)
+        if existing is None:
+            continue  # Expired between add() and get()
+        result = task.AsyncResult(existing)
+        state = result.state
+        if state == states.SUCCESS:
+            return result, CACHED
+        if state in states.PROPAGATE_STATES:
+            # Failed or revoked: drop the claim and try to become the new owner
+            cache.delete(key)
+            continue
+        return result, IN_FLIGHT
+    # Claim kept changing hands; run it rather than fail the request
+    return task.apply_async(args), SUBMITTED
+
+
+class DeduplicatedTask(Task):
+    """Base for tasks enqueued with submit_once(); maintains the claim."""
+
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        key = (self.request.headers or {}).get(HEADER)
+        if not key:
+            return
+        try:
+            if cache.get(key) != task_id:
+                return
+            if status == states.SUCCESS:
+                cache.touch(key, settings.TASK_DEDUP_RESULT_TTL)
+            else:
+                cache.delete(key)
+        except RedisError as exc:
+            # The claim expires after TASK_DEDUP_INFLIGHT_TTL
+            logger.warning('Task claim %s not updated: %s', key, exc)
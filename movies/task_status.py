@@ -0,0 +1,104 @@
+"""
+Status and progress of Celery tasks, read straight from the result backend.
+
+Tasks report progress with report_progress(), which stores a PROGRESS state
+whose meta holds current/total/percent and, optionally, the partial result
+computed so far. task_status() turns the stored meta into the API payload
+with one backend read (a single Redis GET, no database access).
+
+A status carries a `version` token that changes whenever the state or the
+progress does. wait_for_change() long-polls on it, and task_events() yields
+every change until the task finishes, for Server-Sent Events.
+"""
+import hashlib
+import json
+import time
+from celery import current_app, states
+from django.conf import settings
+
+PROGRESS = 'PROGRESS'
+
+
+def progress_meta(current, total, partial=None, **extra):
+    meta = {
+        'current': current,
+        'total': total,
+        'percent': round(100.0 * current / total, 1) if total else None,
+        **extra,
+    }
+    if partial is not None:
+        meta['partial'] = partial
+    return meta
+
+
+def report_progress(task, current, total, partial=None, **extra):
+    """Record a PROGRESS state for a bound task (`self` inside the task)."""
+    task.update_state(state=PROGRESS, meta=progress_meta(current, total, partial, **extra))
+
+
+def _version(status):
+    payload = json.dumps([status['state'], status.get('progress'), status.get('result')], sort_keys=True, default=str)
+    return hashlib.md5(payload.encode()).hexdigest()[:16]
+
+
+def task_status(task_id):
+    """State, progress and result (or error) of a task, from one backend read."""
+    meta = current_app.backend.get_task_meta(task_id)
+    state = meta['status']
+    result = meta.get('result')
+    status = {'task_id': task_id, 'state': state, 'ready': state in states.READY_STATES}
+    if meta.get('name'):
+        status['task'] = meta['name']
+    if state == PROGRESS and isinstance(result, dict):
+        status['progress'] = result
+        status['percent'] = result.get('percent')
+    elif state == states.SUCCESS:
+        status['percent'] = 100.0
+        status['result'] = result
+    elif state in states.PROPAGATE_STATES:
+        status['error'] = repr(result) if isinstance(result, Exception) else str(result)
+    if meta.get('date_done'):
+        status['date_done'] = meta['date_done']
+    status['version'] = _version(status)
+    return status
+
+
+def wait_for_change(task_id, since=None, timeout=0.0):
+    """
+    The task's status, once its version differs from `since` or it is
+    finished, polling the backend for at most `timeout` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        status = task_status(task_id)
+        if since is None or status['ready'] or status['version'] != since:
+            return status
+        if time.monotonic() >= deadline:
+            return status
+        time.sleep(settings.TASK_STATUS_POLL_INTERVAL)
+
+
+def task_events(task_id, timeout=None):
+    """
+    Server-Sent Events lines for every status change until the task is
+    finished or `timeout` seconds have passed; a comment line keeps idle
+    connections open.
+    """
+    timeout = settings.TASK_EVENTS_MAX_SECONDS if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    last_version = None
+    last_sent = time.monotonic()
+    while time.monotonic() < deadline:
+        status = task_status(task_id)
+        if status['version'] != last_version:
+            last_version = status['version']
+            last_sent = time.monotonic()
+            event = 'done' if status['ready'] else 'status'
+            yield f"event: {event}\nid: {last_version}\ndata: {json.dumps(status, default=str)}\n\n"
+            if status['ready']:
+                return
+        elif time.monotonic() - last_sent > 15:
+            last_sent = time.monotonic()
+            yield ': keep-alive\n\n'
+        time.sleep(settings.TASK_STATUS_POLL_INTERVAL)
+    yield 'event: timeout\ndata: {}\n\n'
@@ -1,6 +1,11 @@
 from celery import shared_task
+import time
 from time import sleep
+from django.db.models import Count
 from .models import Movie, Rating
+from .stats import movie_stats_for
+from .task_dedup import DeduplicatedTask
+from .task_status import report_progress
 from datetime import datetime
 
 
@@ -29,24 +34,25 @@ def scheduled_task_specific_time():
 
 
 # Heavy Task 1: Calculate movie statistics
-@shared_task
-def calculate_movie_stats(movie_id):
+@shared_task(bind=True, base=DeduplicatedTask)
+def calculate_movie_stats(self, movie_id):
     """
     Heavy task: Calculate statistics for a movie
-    Simulates intensive computation
+    Simulates intensive computation, reporting progress every second
     """
-    sleep(5)  # Simulate heavy processing
+    # O(1) lookup in the materialized stats table instead of scanning ratings
+    stats = movie_stats_for(movie_id)
     
-    ratings = Rating.objects.filter(movie_id=movie_id)
-    count = ratings.count()
+    steps = 5
+    for step in range(steps):
+        report_progress(self, step, steps)
+        sleep(1)  # Simulate heavy processing
     
-    if count > 0:
-        total = sum(r.rating for r in ratings)
-        avg = total / count
+    if stats and stats.count > 0:
         return {
             'movie_id': movie_id,
-            'total_ratings': count,
-            'average_rating': round(avg, 2),
+            'total_ratings': stats.count,
+            'average_rating': round(stats.average, 2),
             'message': 'Statistics calculated successfully'
         }
     
@@ -54,24 +60,242 @@ def calculate_movie_stats(movie_id):
 
 
 # Heavy Task 2: Bulk data processing
-@shared_task
-def process_bulk_ratings(user_id):
+def _rating_summary(ratings):
+    """Count, average and half-star histogram of a Rating queryset, grouped in SQL."""
+    counts = {
+        f'{rating:.1f}': n
+        for rating, n in ratings.order_by().values_list('rating').annotate(n=Count('id'))
+    }
+    count = sum(counts.values())
+    total = sum(float(rating) * n for rating, n in counts.items())
+    return {
+        'count': count,
+        'average': round(total / count, 4) if count else None,
+        'histogram': {f'{k / 2:.1f}': counts.get(f'{k / 2:.1f}', 0) for k in range(1, 11)},
+    }
+
+
+@shared_task(bind=True, base=DeduplicatedTask)
+def process_bulk_ratings(self, user_id):
     """
     Heavy task: Process all ratings for a user
-    Simulates data processing
+    Simulates data processing in steps; each step's running totals are
+    published as the partial result
     """
-    sleep(8)  # Simulate heavy processing
-    
+    # Aggregated live in SQL (rating_user_idx), not from the columnar
+    # snapshot, which lags writes until its next rebuild
     ratings = Rating.objects.filter(user_id=user_id)
-    count = ratings.count()
+    summary = _rating_summary(ratings)
+    
+    steps = 8
+    first = ratings.order_by('id').values('id')
+    for step in range(steps):
+        done = summary['count'] * step // steps
+        partial = _rating_summary(Rating.objects.filter(id__in=first[:done])) if done else None
+        report_progress(self, step, steps, partial=partial)
+        sleep(1)  # Simulate heavy processing
     
-    if count > 0:
-        avg = sum(r.rating for r in ratings) / count
+    if summary['count']:
         return {
             'user_id': user_id,
-            'total_ratings': count,
-            'average_rating': round(avg, 2),
+            'total_ratings': summary['count'],
+            'average_rating': round(summary['average'], 2),
+            'histogram': summary['histogram'],
             'message': 'Bulk processing completed'
         }
     
     return {'user_id': user_id, 'message': 'No ratings found'}
+
+
+# Fan-out batch job: MovieStats of the whole catalog, one task per movie-id chunk
+MOVIE_STATS_JOB_KEY = 'movie_stats_job:{}'
+
+
+@shared_task(bind=True)
+def movie_stats_chunk(self, job_id, lo, hi):
+    """Recompute MovieStats for lo <= movie_id < hi (one grouped query, one upsert)."""
+    from django.core.cache import cache
+    from .stats import refresh_stats_range
+
+    start = time.perf_counter()
+    report_progress(self, 0, 1, job_id=job_id, lo=lo, hi=hi)
+    movies, ratings = refresh_stats_range(lo, hi)
+    cache.incr(MOVIE_STATS_JOB_KEY.format(job_id) + ':done')
+    return {
+        'lo': lo,
+        'hi': hi,
+        'movies': movies,
+        'ratings': ratings,
+        'duration_s': round(time.perf_counter() - start, 3),
+    }
+
+
+@shared_task
+def movie_stats_job_done(results, job_id, started_at):
+    """Chord callback: record completion and timing of a movie_stats_job run."""
+    from django.core.cache import cache
+    from .cache_utils import writes_committed
+
+    # Corrected aggregates may differ from what cached reads were built from
+    writes_committed(Rating, movie_ids=None)
+    key = MOVIE_STATS_JOB_KEY.format(job_id)
+    job = cache.get(key) or {'job_id': job_id}
+    job.update(
+        state='SUCCESS',
+        movies=sum(r['movies'] for r in results),
+        ratings=sum(r['ratings'] for r in results),
+        chunk_seconds_total=round(sum(r['duration_s'] for r in results), 3),
+        slowest_chunk_s=max((r['duration_s'] for r in results), default=0),
+        wall_clock_s=round(time.time() - started_at, 3),
+        finished_at=datetime.now().isoformat(timespec='seconds'),
+    )
+    cache.set(key, job, None)
+    return job
+
+
+@shared_task
+def movie_stats_job_failed(request, exc, traceback, job_id):
+    """
+    Errback of the chunks and of the chord callback: a failed chunk means the
+    callback never runs, so record the job as FAILED here.
+    """
+    from django.core.cache import cache
+    from .cache_utils import writes_committed
+
+    # The chunks that did finish have rewritten their MovieStats rows
+    writes_committed(Rating, movie_ids=None)
+    key = MOVIE_STATS_JOB_KEY.format(job_id)
+    job = cache.get(key) or {'job_id': job_id}
+    job.update(
+        state='FAILED',
+        error=f'{type(exc).__name__}: {exc}',
+        failed_task_id=request.id,
+        finished_at=datetime.now().isoformat(timespec='seconds'),
+    )
+    cache.set(key, job, None)
+
+
+def start_movie_stats_job(chunk_size=None):
+    """
+    Dispatch movie_stats_chunk over the whole movie-id space as a chord:
+    the chunks run in parallel on every worker process, movie_stats_job_done
+    runs once they all finished, movie_stats_job_failed if any of them (or
+    the callback) raises. Returns the job record.
+    """
+    import uuid
+    from celery import chord
+    from django.conf import settings
+    from django.core.cache import cache
+    from .stats import movie_id_ranges
+
+    job_id = uuid.uuid4().hex
+    ranges = movie_id_ranges(chunk_size or settings.MOVIE_STATS_CHUNK_SIZE)
+    job = {
+        'job_id': job_id,
+        'state': 'STARTED',
+        'chunks': len(ranges),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    key = MOVIE_STATS_JOB_KEY.format(job_id)
+    cache.set(key, job, None)
+    cache.set(key + ':done', 0, None)
+    cache.set(MOVIE_STATS_JOB_KEY.format('last'), job_id, None)
+    failed = movie_stats_job_failed.s(job_id)
+    chord(
+        movie_stats_chunk.s(job_id, lo, hi).on_error(failed) for lo, hi in ranges
+    )(movie_stats_job_done.s(job_id, time.time()).on_error(failed))
+    return job
+
+
+# Scheduled refresh of the columnar ratings snapshot (scheduled in celery.py)
+@shared_task
+def refresh_ratings_snapshot():
+    """Rebuild the NumPy ratings snapshot used by the analytics endpoints."""
+    from .ratings_store import rebuild_ratings_store
+
+    start = time.perf_counter()
+    rows = rebuild_ratings_store()
+    return {'rows': rows, 'duration_s': round(time.perf_counter() - start, 2)}
+
+
+# Write-behind flush: drain buffered ratings into the database (scheduled in celery.py)
+@shared_task(ignore_result=True)
+def flush_rating_buffer():
+    """
+    Move ratings queued by POST /api/ratings/batch/?write_behind=1 from the
+    Redis stream into the ratings table, one transaction per batch.
+    """
+    from .write_behind import flush_ratings
+
+    return flush_ratings()
+
+
+# Genre bitsets after catalog edits (debounced by genre_index.schedule_rebuild)
+@shared_task(ignore_result=True)
+def rebuild_genre_index():
+    """Recompute the genre bitsets for every edit made since the task was scheduled."""
+    from django.core.cache import cache
+    from .genre_index import REBUILD_PENDING_KEY, rebuild_genre_index as rebuild
+
+    # Released first: edits committed from here on schedule a new rebuild,
+    # since this one may read the catalog before they land
+    cache.delete(REBUILD_PENDING_KEY)
+    return rebuild()
+
+
+# Trending engine: decayed popularity scores in Redis (scheduled in celery.py)
+@shared_task
+def refresh_trending(reset=False):
+    """Fold new ratings into the trending scores and rewrite the top list."""
+    from .trending import refresh_trending as refresh
+
+    start = time.perf_counter()
+    summary = refresh(reset=reset)
+    summary['duration_s'] = round(time.perf_counter() - start, 2)
+    return summary
+
+
+# Rollup engine: genre x release year x month summaries (scheduled in celery.py)
+@shared_task
+def refresh_rating_rollups(full=False):
+    """
+    Refresh RatingRollup from the ratings past the high-water mark
+    (full=True recomputes everything, to pick up deletions).
+    """
+    from .rollups import refresh_rollups
+
+    start = time.perf_counter()
+    summary = refresh_rollups(full=full)
+    summary['duration_s'] = round(time.perf_counter() - start, 2)
+    return summary
+
+
+# Offline Job: item-item collaborative filtering (scheduled nightly in celery.py)
+@shared_task(bind=True)
+def build_item_similarities(self, top_k=None, adjusted=True):
+    """
+    Build the top-K similar movies table from the full rating matrix
+    (sparse CSR, blocked matrix products) and store it for
+    /api/movies/<id>/similar/.
+    """
+    from .similarity import build_item_similarities as build
+
+    def progress(done, total):
+        report_progress(self, done, total)
+
+    return build(k=top_k, adjusted=adjusted, progress=progress)
+
+
+# Offline Job: matrix factorization for per-user recommendations (scheduled nightly in celery.py)
+@shared_task(bind=True)
+def train_recommender(self, factors=None, iterations=None):
+    """
+    Train the implicit ALS model on all ratings and store the factor
+    matrices as memory-mappable .npy files for /api/users/<id>/recommendations/.
+    """
+    from .factorization import train_als
+
+    def progress(done, total):
+        report_progress(self, done, total, unit='iterations')
+
+    return train_als(factors=factors, iterations=iterations, progress=progress)
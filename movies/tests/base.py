@@ -0,0 +1,161 @@
+"""
+Shared test fixtures: test cases that keep test runs out of the working tree,
+an in-memory Redis (fakeredis) behind the cache and the REDIS_URL client,
+catalog rows, MovieLens-style CSV snapshots and a mixin that imports them
+with the import_data command.
+"""
+import csv
+import io
+import tempfile
+from pathlib import Path
+from unittest import mock
+import fakeredis
+from celery.backends.cache import CacheBackend
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from silk.config import SilkyConfig
+from movies import write_behind
+from movies.cache_utils import local_cache
+from movies_api.celery import app as celery_app
+from movies.models import Genre, Movie
+
+class IsolatedMixin:
+    """
+    No silk request recording or profile files for test requests, and a
+    temporary ANALYTICS_DIR for the array stores.
+    """
+
+    def setUp(self):
+        super().setUp()
+        silk = mock.patch.dict(SilkyConfig().attrs, SILKY_INTERCEPT_FUNC=lambda request: False)
+        silk.start()
+        self.addCleanup(silk.stop)
+        analytics = tempfile.TemporaryDirectory()
+        self.addCleanup(analytics.cleanup)
+        self.analytics_dir = Path(analytics.name)
+        analytics_setting = override_settings(ANALYTICS_DIR=self.analytics_dir)
+        analytics_setting.enable()
+        self.addCleanup(analytics_setting.disable)
+
+
+class IsolatedTestCase(IsolatedMixin, TestCase):
+    pass
+
+
+def fake_redis_caches(server):
+    return {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': 'redis://127.0.0.1:6379/1',
+            'OPTIONS': {'connection_class': fakeredis.FakeConnection, 'server': server},
+        }
+    }
+
+
+class RedisMixin(IsolatedMixin):
+    """Cache and REDIS_URL client sharing one fakeredis server, new for every test."""
+
+    def setUp(self):
+        super().setUp()
+        self.redis_server = fakeredis.FakeServer()
+        caches = override_settings(CACHES=fake_redis_caches(self.redis_server))
+        caches.enable()
+        self.addCleanup(caches.disable)
+        self.redis = fakeredis.FakeRedis(server=self.redis_server, decode_responses=True)
+        write_behind._client = self.redis
+        self.addCleanup(setattr, write_behind, '_client', None)
+        local_cache.clear()
+        self.addCleanup(local_cache.clear)
+
+    def redis_down(self):
+        """Make every Redis command fail with ConnectionError."""
+        self.redis_server.connected = False
+        local_cache.clear()
+
+    def redis_up(self):
+        self.redis_server.connected = True
+
+
+class RedisTestCase(RedisMixin, TestCase):
+    pass
+
+
+class RedisTransactionTestCase(RedisMixin, TransactionTestCase):
+    """For code that can't run inside a transaction (schema changes)."""
+
+
+class CeleryTestCase(RedisTestCase):
+    """
+    RedisTestCase that runs tasks eagerly, in process, with an in-memory
+    result backend. Eager results are only stored for tasks declared with
+    store_eager_result=True (read from the config when the task is bound).
+    """
+
+    def setUp(self):
+        super().setUp()
+        backend = mock.patch.object(celery_app, '_backend_cache', CacheBackend(app=celery_app, url='memory://'))
+        backend.start()
+        self.addCleanup(backend.stop)
+        eager = {'task_always_eager': True}
+        self.addCleanup(celery_app.conf.update, {key: celery_app.conf[key] for key in eager})
+        celery_app.conf.update(eager)
+
+
+def make_movies(*specs):
+    """Create movies from (movie_id, title, [genre names]) tuples."""
+    movies = []
+    for movie_id, title, genre_names in specs:
+        movie = Movie.objects.create(movie_id=movie_id, title=title)
+        movie.genres.set([Genre.objects.get_or_create(name=name)[0] for name in genre_names])
+        movies.append(movie)
+    return movies
+
+
+SNAPSHOT_HEADERS = {
+    'movies.csv': ['movieId', 'title', 'genres'],
+    'links.csv': ['movieId', 'imdbId', 'tmdbId'],
+    'ratings.csv': ['userId', 'movieId', 'rating', 'timestamp'],
+    'tags.csv': ['userId', 'movieId', 'tag', 'timestamp'],
+}
+
+MOVIES = [
+    (1, 'Toy Story (1995)', 'Adventure|Animation|Children'),
+    (2, 'Jumanji (1995)', 'Adventure|Children|Fantasy'),
+    (3, 'Heat (1995)', 'Action|Crime|Thriller'),
+]
+LINKS = [(1, '0114709', '862'), (2, '0113497', '8844'), (3, '0113277', '')]
+RATINGS = [
+    (1, 1, 4.0, 964982703), (1, 3, 4.0, 964981247),
+    (2, 1, 5.0, 964983815), (2, 2, 3.0, 964982931),
+    (3, 2, 2.5, 964982224),
+]
+TAGS = [(1, 1, 'pixar', 1445714994), (2, 3, 'heist', 1445714996)]
+
+
+def write_snapshot(directory, movies=(), links=(), ratings=(), tags=()):
+    """Write the four MovieLens CSV files into `directory`; rows are tuples."""
+    directory = Path(directory)
+    for name, rows in (('movies.csv', movies), ('links.csv', links), ('ratings.csv', ratings), ('tags.csv', tags)):
+        with open(directory / name, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(SNAPSHOT_HEADERS[name])
+            writer.writerows(rows)
+    return directory
+
+
+class ImportMixin:
+    """Runs import_data against a snapshot in a temporary --data-dir."""
+
+    def setUp(self):
+        super().setUp()
+        data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(data_dir.cleanup)
+        self.data_dir = data_dir.name
+
+    def snapshot(self, movies=MOVIES, links=LINKS, ratings=RATINGS, tags=TAGS):
+        write_snapshot(self.data_dir, movies, links, ratings, tags)
+
+    def import_data(self, *args):
+        out = io.StringIO()
+        call_command('import_data', '--data-dir', self.data_dir, *args, stdout=out)
+        return out.getvalue()
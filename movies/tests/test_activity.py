@@ -0,0 +1,90 @@
+from datetime import date, datetime, timezone
+from unittest import mock
+from movies import tasks
+from movies.activity import DEFAULT_DAYS, default_range
+from movies.models import Genre, Movie, Rating
+from .base import RedisTestCase, make_movies
+
+
+def ts(year, month, day, hour=12):
+    return int(datetime(year, month, day, hour, tzinfo=timezone.utc).timestamp())
+
+
+class RatingActivityTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        make_movies((1, 'Toy Story (1995)', ['Comedy']), (2, 'Heat (1995)', ['Action']))
+        Rating.objects.bulk_create([
+            Rating(user_id=1, movie_id=1, rating=4.0, timestamp=ts(2020, 1, 30)),
+            Rating(user_id=2, movie_id=1, rating=3.0, timestamp=ts(2020, 1, 30, hour=23)),
+            Rating(user_id=1, movie_id=2, rating=5.0, timestamp=ts(2020, 2, 1, hour=0)),
+            Rating(user_id=3, movie_id=2, rating=2.0, timestamp=ts(2020, 3, 31)),
+        ])
+
+    def activity(self, **params):
+        response = self.client.get('/api/stats/activity/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def series(self, **params):
+        return [(row['bucket'], row['count'], row['average']) for row in self.activity(**params)['results']]
+
+    def test_empty_days_are_filled(self):
+        self.assertEqual(self.series(**{'from': '2020-01-29', 'to': '2020-02-01'}), [
+            ('2020-01-29', 0, None),
+            ('2020-01-30', 2, 3.5),
+            ('2020-01-31', 0, None),
+            ('2020-02-01', 1, 5.0),
+        ])
+
+    def test_days_fold_into_months(self):
+        self.assertEqual(self.series(bucket='month', **{'from': '2019-12-15', 'to': '2020-03-31'}), [
+            ('2019-12', 0, None),
+            ('2020-01', 2, 3.5),
+            ('2020-02', 1, 5.0),
+            ('2020-03', 1, 2.0),
+        ])
+        # The range cuts through a month: only its days inside the range count
+        self.assertEqual(self.series(bucket='month', **{'from': '2020-01-31', 'to': '2020-03-30'}), [
+            ('2020-01', 0, None),
+            ('2020-02', 1, 5.0),
+            ('2020-03', 0, None),
+        ])
+
+    def test_default_range_ends_at_the_newest_rating(self):
+        self.assertEqual(default_range(), (date(2020, 3, 31 - DEFAULT_DAYS + 1), date(2020, 3, 31)))
+        body = self.activity()
+        self.assertEqual((body['from'], body['to'], body['count']), ('2020-03-02', '2020-03-31', DEFAULT_DAYS))
+        self.assertEqual(body['results'][-1], {'bucket': '2020-03-31', 'count': 1, 'average': 2.0})
+        # Only `to` given: the default span ends there
+        body = self.activity(to='2020-02-10')
+        self.assertEqual((body['from'], body['to']), ('2020-01-12', '2020-02-10'))
+
+    def test_movie_and_genre_filters(self):
+        span = {'bucket': 'month', 'from': '2020-01-01', 'to': '2020-03-31'}
+        self.assertEqual(self.series(genre='comedy', **span), [('2020-01', 2, 3.5), ('2020-02', 0, None),
+                                                                ('2020-03', 0, None)])
+        self.assertEqual(self.series(movie=2, **span), [('2020-01', 0, None), ('2020-02', 1, 5.0),
+                                                        ('2020-03', 1, 2.0)])
+        self.assertEqual(self.client.get('/api/stats/activity/', {'genre': 'Western'}).status_code, 404)
+
+    def test_genre_series_follows_membership_changes(self):
+        span = {'bucket': 'month', 'from': '2020-01-01', 'to': '2020-02-29'}
+        self.assertEqual(self.series(genre='comedy', **span), [('2020-01', 2, 3.5), ('2020-02', 0, None)])
+        # No rating changes: the cached series must not survive the new member
+        with mock.patch.object(tasks.rebuild_genre_index, 'apply_async'), \
+                self.captureOnCommitCallbacks(execute=True):
+            Movie.objects.get(movie_id=2).genres.add(Genre.objects.get(name='Comedy'))
+        self.assertEqual(self.series(genre='comedy', **span), [('2020-01', 2, 3.5), ('2020-02', 1, 5.0)])
+        with mock.patch.object(tasks.rebuild_genre_index, 'apply_async'), \
+                self.captureOnCommitCallbacks(execute=True):
+            Genre.objects.get(name='Comedy').movies.remove(Movie.objects.get(movie_id=1))
+        self.assertEqual(self.series(genre='comedy', **span), [('2020-01', 0, None), ('2020-02', 1, 5.0)])
+
+    def test_empty_table_and_invalid_parameters(self):
+        Rating.objects.all().delete()
+        self.assertEqual(self.activity()['results'], [])
+        for params in ({'bucket': 'week'}, {'from': '2020-02-30'}, {'movie': 'one'},
+                       {'from': '2020-02-01', 'to': '2020-01-01'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/stats/activity/', params).status_code, 400)
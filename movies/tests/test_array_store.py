@@ -0,0 +1,28 @@
+import numpy as np
+from django.test import SimpleTestCase
+from movies.array_store import KEEP_VERSIONS, load_arrays, save_arrays, store_dir
+from .base import IsolatedMixin
+
+
+class ArrayStoreTests(IsolatedMixin, SimpleTestCase):
+    def test_saves_in_the_same_second_never_overwrite(self):
+        first = save_arrays('demo', {'values': np.arange(3)})
+        mapped, _ = load_arrays('demo')
+        second = save_arrays('demo', {'values': np.arange(3) * 10}, meta={'n': 2})
+
+        self.assertNotEqual(first, second)
+        # The earlier version's mapped file is untouched
+        self.assertEqual(mapped['values'].tolist(), [0, 1, 2])
+        arrays, meta = load_arrays('demo')
+        self.assertEqual((arrays['values'].tolist(), meta), ([0, 10, 20], {'n': 2}))
+
+    def test_keeps_the_last_versions_and_no_temporaries(self):
+        versions = [save_arrays('demo', {'values': np.arange(n)}) for n in range(5)]
+        remaining = sorted(p.name for p in store_dir('demo').iterdir() if p.is_dir())
+        self.assertEqual(remaining, versions[-KEEP_VERSIONS:])
+        self.assertEqual(
+            sorted(p.name for p in store_dir('demo').iterdir() if p.is_file()), ['manifest.json']
+        )
+
+    def test_missing_store(self):
+        self.assertEqual(load_arrays('missing'), (None, None))
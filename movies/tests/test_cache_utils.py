@@ -0,0 +1,89 @@
+from unittest import mock
+from django.core.cache import cache
+from movies import cache_utils, tasks
+from movies.cache_utils import (
+    HIT, LOCAL_HIT, MISS, bump_generations, fetch, generational_key, local_cache,
+)
+from movies.models import Genre
+from .base import RedisTestCase, make_movies
+
+
+class GenerationalCacheTests(RedisTestCase):
+    def test_fetch_tiers(self):
+        compute = mock.Mock(return_value=42)
+        key = generational_key('answer', 'movies.movie')
+        self.assertEqual(fetch(key, compute, 60), (42, MISS))
+        self.assertEqual(fetch(key, compute, 60), (42, LOCAL_HIT))
+        local_cache.clear()
+        self.assertEqual(fetch(key, compute, 60, beta=0), (42, HIT))
+        compute.assert_called_once()
+
+    def test_bump_changes_only_keys_of_that_scope(self):
+        movie_key = generational_key('movie', 'movie:1')
+        other_key = generational_key('movie', 'movie:2')
+        bump_generations('movie:1')
+        self.assertNotEqual(generational_key('movie', 'movie:1'), movie_key)
+        self.assertEqual(generational_key('movie', 'movie:2'), other_key)
+
+    def test_generations_are_one_round_trip(self):
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            generational_key('answer', 'movies.movie', 'movie:1', 'movie:2')
+        get_many.assert_called_once()
+
+    def test_other_processes_bumps_are_seen_at_once(self):
+        key = generational_key('answer', 'movies.movie')
+        self.assertEqual(fetch(key, lambda: 42, 60), (42, MISS))
+        cache.incr(cache_utils.GENERATION_PREFIX + 'movies.movie')  # Another process's bump
+        fresh = generational_key('answer', 'movies.movie')
+        self.assertNotEqual(fresh, key)
+        # The value in this process's LRU was stored under the old key
+        self.assertEqual(fetch(fresh, lambda: 43, 60), (43, MISS))
+
+    def test_shared_cache_failure_computes_without_caching(self):
+        key = generational_key('answer', 'movies.movie')
+        self.redis_server.connected = False  # The key was built before the outage
+        with self.assertLogs('movies.cache_utils', 'WARNING'):
+            self.assertEqual(fetch(key, lambda: 42, 60), (42, MISS))
+
+    def test_no_key_without_redis(self):
+        self.redis_down()
+        with self.assertLogs('movies.cache_utils', 'WARNING'):
+            self.assertIsNone(generational_key('answer', 'movies.movie'))
+        self.assertEqual(fetch(None, lambda: 42, 60), (42, MISS))
+
+
+class GenreGenerationTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(tasks.rebuild_genre_index, 'apply_async')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.toy_story, self.heat, self.casino = make_movies(
+            (1, 'Toy Story (1995)', ['Comedy']), (2, 'Heat (1995)', ['Crime']), (3, 'Casino (1995)', ['Crime']),
+        )
+
+    def keys(self):
+        return [generational_key('movie', f'movie:{movie_id}') for movie_id in (1, 2, 3)]
+
+    def assertBumped(self, before, movie_ids):
+        after = self.keys()
+        self.assertEqual([a != b for a, b in zip(before, after)], [m in movie_ids for m in (1, 2, 3)])
+
+    def test_membership_changes_bump_the_movies(self):
+        crime = Genre.objects.get(name='Crime')
+        for change, movie_ids in (
+            (lambda: self.toy_story.genres.add(crime), {1}),
+            (lambda: crime.movies.remove(self.heat), {2}),
+            (lambda: self.casino.genres.clear(), {3}),
+        ):
+            before = self.keys()
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            self.assertBumped(before, movie_ids)
+
+    def test_reverse_clear_bumps_the_former_members(self):
+        crime = Genre.objects.get(name='Crime')
+        before = self.keys()
+        with self.captureOnCommitCallbacks(execute=True):
+            crime.movies.clear()
+        self.assertBumped(before, {2, 3})
@@ -0,0 +1,59 @@
+from movies.models import Movie, Rating
+from .base import RedisTestCase, make_movies
+
+
+class ConditionalGetTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        make_movies((1, 'Toy Story (1995)', ['Animation']), (2, 'Heat (1995)', ['Action']))
+
+    def test_matching_etag_gets_304(self):
+        for url in ('/api/movies/', '/api/movies/1/', '/api/movies/1/ratings/'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                etag = response['ETag']
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_etag_varies_with_the_query(self):
+        self.assertNotEqual(
+            self.client.get('/api/movies/')['ETag'],
+            self.client.get('/api/movies/?ordering=year')['ETag'],
+        )
+
+    def test_write_changes_the_etag(self):
+        detail = self.client.get('/api/movies/1/')['ETag']
+        other = self.client.get('/api/movies/2/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(user_id=1, movie_id=1, rating=4.0, timestamp=100)
+        response = self.client.get('/api/movies/1/', HTTP_IF_NONE_MATCH=detail)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['ratings_count'], 1)
+        # Another movie's validator is untouched
+        self.assertEqual(self.client.get('/api/movies/2/', HTTP_IF_NONE_MATCH=other).status_code, 304)
+
+    def test_catalog_write_changes_the_list_etag(self):
+        etag = self.client.get('/api/movies/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Movie.objects.filter(movie_id=2).first().save()
+        self.assertEqual(self.client.get('/api/movies/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_feeds_have_no_last_modified(self):
+        Rating.objects.create(user_id=1, movie_id=1, rating=4.0, timestamp=100)
+        response = self.client.get('/api/movies/1/ratings/')
+        self.assertFalse(response.has_header('Last-Modified'))
+        # A row with an older timestamp must not be hidden behind a 304
+        Rating.objects.create(user_id=2, movie_id=1, rating=3.0, timestamp=50)
+        response = self.client.get(
+            '/api/movies/1/ratings/', HTTP_IF_MODIFIED_SINCE='Thu, 01 Jan 2015 00:00:00 GMT'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_redis_down_serves_without_etag(self):
+        self.redis_down()
+        for url in ('/api/movies/', '/api/movies/1/'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.has_header('ETag'))
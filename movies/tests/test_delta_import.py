@@ -0,0 +1,152 @@
+import time
+from unittest import mock
+from django.core.management import CommandError
+from movies import ratings_store, trending
+from movies.models import ImportChunk, Link, Movie, MovieStats, Rating, Tag
+from movies.rollups import rollup_totals
+from movies.search import search_titles
+from .base import LINKS, MOVIES, RATINGS, TAGS, ImportMixin, RedisTestCase
+
+
+class DeltaImportTests(ImportMixin, RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.snapshot()
+        self.import_data()
+
+    def reimport(self, **changes):
+        self.snapshot(**changes)
+        return self.import_data('--incremental')
+
+    def ratings(self):
+        return sorted(Rating.objects.values_list('user_id', 'movie_id', 'rating', 'timestamp'))
+
+    def test_unchanged_snapshot_is_skipped(self):
+        self.assertEqual(ImportChunk.objects.filter(chunk=-1).count(), 4)
+        output = self.reimport()
+        for source in ('movies', 'links', 'ratings', 'tags'):
+            self.assertIn(f'{source}: unchanged, skipped', output)
+        self.assertEqual(self.ratings(), sorted(RATINGS))
+
+    def test_ratings_diff(self):
+        ratings = [RATINGS[0], (1, 3, 1.0, 964981247), *RATINGS[2:4], (1001, 2, 4.5, 964990000)]
+        output = self.reimport(ratings=ratings)
+        # User 1001 lives in a partition of its own
+        self.assertIn('ratings: 2 changed partitions, 1 inserted, 1 updated, 1 deleted', output)
+        self.assertEqual(self.ratings(), sorted(ratings))
+        # Stats of the touched movies are recomputed after the import
+        self.assertEqual(MovieStats.objects.get(movie_id=3).max_rating, 1.0)
+        self.assertEqual(MovieStats.objects.get(movie_id=2).count, 2)
+        self.assertIn('ratings: unchanged, skipped', self.import_data('--incremental'))
+
+        output = self.reimport(ratings=ratings[:-1])
+        self.assertIn('ratings: 1 changed partitions, 0 inserted, 0 updated, 1 deleted', output)
+        self.assertFalse(ImportChunk.objects.filter(source='ratings', chunk=1).exists())
+
+    def test_movies_and_links_diff(self):
+        output = self.reimport(
+            movies=[MOVIES[0], (2, 'Jumanji (1995)', 'Adventure|Comedy'), (4, 'Casino (1995)', 'Crime')],
+            links=[*LINKS[:2], (4, '0112641', '524')],
+        )
+        self.assertIn('movies: 1 changed partitions, 1 inserted, 1 updated, 1 deleted', output)
+        self.assertEqual(sorted(Movie.objects.values_list('movie_id', flat=True)), [1, 2, 4])
+        self.assertEqual(set(Movie.objects.get(movie_id=2).genres.values_list('name', flat=True)),
+                         {'Adventure', 'Comedy'})
+        self.assertEqual(Link.objects.get(movie_id=4).tmdb_id, '524')
+        # Deleting the movie cascaded to its ratings and tags
+        self.assertFalse(Rating.objects.filter(movie_id=3).exists())
+
+    def test_title_edit_updates_derived_columns_and_search(self):
+        output = self.reimport(movies=[MOVIES[0], (2, 'Jungle Book, The (1967)', MOVIES[1][2]), MOVIES[2]])
+        self.assertIn('movies: 1 changed partitions, 0 inserted, 1 updated, 0 deleted', output)
+        movie = Movie.objects.get(movie_id=2)
+        self.assertEqual((movie.year, movie.normalized_title), (1967, 'the jungle book'))
+        self.assertEqual([row[:3] for row in search_titles('jungle')], [(2, 'Jungle Book, The (1967)', 1967)])
+        self.assertEqual(search_titles('jumanji'), [])
+
+    def test_tags_compared_as_a_multiset(self):
+        Tag.objects.create(user_id=1, movie_id=1, tag='pixar', timestamp=1445714994)
+        output = self.reimport(tags=[*TAGS, (2, 3, 'heist', 1445714996)])
+        self.assertIn('tags: 1 changed partitions, 1 inserted, 0 updated, 1 deleted', output)
+        self.assertEqual(Tag.objects.filter(tag='pixar').count(), 1)
+        self.assertEqual(Tag.objects.filter(tag='heist').count(), 2)
+
+    def test_full_import_refuses_a_populated_database(self):
+        with self.assertRaisesMessage(CommandError, 'use --incremental'):
+            self.import_data()
+
+
+class IncrementalInvalidationTests(ImportMixin, RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.import_data()
+
+    def reimport(self, **changes):
+        self.snapshot(**changes)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.import_data('--incremental')
+
+    def test_link_change_invalidates_only_that_movie(self):
+        changed = self.client.get('/api/movies/3/')
+        other = self.client.get('/api/movies/1/')
+        self.reimport(links=[*LINKS[:2], (3, '0113277', '949')])
+
+        response = self.client.get('/api/movies/3/', HTTP_IF_NONE_MATCH=changed['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['links']['tmdb_id'], '949')
+        self.assertEqual(self.client.get('/api/movies/1/', HTTP_IF_NONE_MATCH=other['ETag']).status_code, 304)
+
+    def test_title_change_invalidates_that_movie(self):
+        etag = self.client.get('/api/movies/2/')['ETag']
+        self.reimport(movies=[MOVIES[0], (2, 'Jumanji (1996)', MOVIES[1][2]), MOVIES[2]])
+        response = self.client.get('/api/movies/2/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['year'], 1996)
+
+
+class IncrementalRefreshTests(ImportMixin, RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.snapshot()
+        self.import_data()
+
+    def import_data_incremental(self, **changes):
+        self.snapshot(**changes)
+        return self.import_data('--incremental')
+
+    def rollup_count(self, genre):
+        return sum(row['ratings'] for row in rollup_totals(['genre'], genre__name=genre))
+
+    def test_rating_changes_refresh_derived_data(self):
+        now = int(time.time())
+        # Deleted and edited ratings keep their old timestamps, so only the
+        # import can tell the rollups which months changed
+        output = self.import_data_incremental(ratings=[
+            (1, 1, 4.0, 964982703), (1, 3, 1.0, 964981247), (2, 1, 5.0, 964983815), (2, 2, 3.0, 964982931),
+            (4, 3, 5.0, now),
+        ])
+        self.assertIn('ratings: 1 changed partitions, 1 inserted, 1 updated, 1 deleted', output)
+        self.assertEqual(self.rollup_count('Fantasy'), 1)
+        self.assertEqual(self.rollup_count('Action'), 2)
+
+        users, half_stars, _ = ratings_store.movie_rows(3)
+        self.assertEqual((users.tolist(), half_stars.tolist()), ([1, 4], [2, 10]))
+        self.assertEqual([row['movie_id'] for row in trending.trending()], [3])
+        self.assertEqual(MovieStats.objects.get(movie_id=3).count, 2)
+
+    def test_link_change_skips_rating_derived_data(self):
+        command = 'movies.management.commands.import_data'
+        with mock.patch(f'{command}.rebuild_ratings_store') as rebuild_store, \
+                mock.patch(f'{command}.refresh_rollups') as rollups, \
+                mock.patch(f'{command}.rebuild_genre_index') as genre_index:
+            self.import_data_incremental(links=[*LINKS[:2], (3, '0113277', '949')])
+        rebuild_store.assert_not_called()
+        rollups.assert_not_called()
+        genre_index.assert_not_called()
+
+    def test_catalog_change_recomputes_all_rollups(self):
+        self.import_data_incremental(movies=[MOVIES[0], (2, 'Jumanji (1995)', 'Adventure|Comedy'), MOVIES[2]])
+        self.assertEqual(self.rollup_count('Comedy'), 2)
+        self.assertEqual(self.rollup_count('Fantasy'), 0)
@@ -0,0 +1,69 @@
+import numpy as np
+from movies.distributions import describe
+from movies.models import Genre, Rating
+from .base import RedisTestCase, make_movies
+
+# movie_id -> [(user_id, rating)]
+RATINGS = {
+    1: [(1, 4.0), (2, 3.5), (3, 5.0), (4, 1.0)],
+    2: [(1, 2.5), (2, 4.0), (5, 4.5)],
+}
+
+
+class DistributionTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        make_movies((1, 'Toy Story (1995)', ['Comedy']), (2, 'Heat (1995)', ['Comedy', 'Drama']),
+                    (3, 'Casino (1995)', ['Drama']))
+        Genre.objects.create(name='Horror')
+        for movie_id, ratings in RATINGS.items():
+            for user_id, rating in ratings:
+                Rating.objects.create(user_id=user_id, movie_id=movie_id, rating=rating, timestamp=1)
+
+    def assertDescribes(self, body, ratings):
+        values = np.array(ratings)
+        self.assertEqual(body['count'], len(values))
+        self.assertAlmostEqual(body['mean'], values.mean(), places=4)
+        self.assertEqual(body['median'], np.median(values))
+        self.assertAlmostEqual(body['std'], values.std(), places=4)
+        self.assertEqual(sum(body['histogram'].values()), len(values))
+        for value in set(ratings):
+            self.assertEqual(body['histogram'][f'{value:.1f}'], ratings.count(value))
+
+    def assertEmpty(self, body):
+        self.assertEqual((body['count'], body['mean'], body['median'], body['std']), (0, None, None, None))
+        self.assertEqual(set(body['histogram'].values()), {0})
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_describe(self):
+        self.assertEmpty(describe([0] * 10))
+        histogram = [0] * 10
+        histogram[0], histogram[9] = 1, 1  # 0.5 and 5.0
+        self.assertEqual(describe(histogram)['median'], 2.75)
+
+    def test_movie_scope(self):
+        body = self.get('/api/movies/1/ratings/distribution/')
+        self.assertEqual((body['scope'], body['movie']), ('movie', 1))
+        self.assertDescribes(body, [rating for _, rating in RATINGS[1]])  # Even count
+        self.assertDescribes(self.get('/api/movies/2/ratings/distribution/'), [rating for _, rating in RATINGS[2]])
+        self.assertEmpty(self.get('/api/movies/3/ratings/distribution/'))
+        self.assertEqual(self.client.get('/api/movies/99/ratings/distribution/').status_code, 404)
+
+    def test_user_scope(self):
+        body = self.get('/api/users/1/ratings/distribution/')
+        self.assertEqual((body['scope'], body['user']), ('user', 1))
+        self.assertDescribes(body, [4.0, 2.5])
+        self.assertDescribes(self.get('/api/users/5/ratings/distribution/'), [4.5])
+        self.assertEmpty(self.get('/api/users/99/ratings/distribution/'))
+
+    def test_genre_scope(self):
+        body = self.get('/api/genres/comedy/ratings/distribution/')
+        self.assertEqual((body['scope'], body['genre']), ('genre', 'Comedy'))
+        self.assertDescribes(body, [rating for ratings in RATINGS.values() for _, rating in ratings])
+        self.assertDescribes(self.get('/api/genres/Drama/ratings/distribution/'), [rating for _, rating in RATINGS[2]])
+        self.assertEmpty(self.get('/api/genres/Horror/ratings/distribution/'))
+        self.assertEqual(self.client.get('/api/genres/Western/ratings/distribution/').status_code, 404)
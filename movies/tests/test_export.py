@@ -0,0 +1,59 @@
+import gzip
+import json
+from django.test import override_settings
+from movies.models import Rating, Tag
+from .base import IsolatedTestCase, make_movies
+
+DAY = 86400
+JAN_1_2020 = 1577836800
+
+
+class ExportTests(IsolatedTestCase):
+    def setUp(self):
+        super().setUp()
+        make_movies((1, 'Toy Story (1995)', []), (2, 'Heat (1995)', []))
+        Rating.objects.bulk_create([
+            Rating(user_id=1, movie_id=1, rating=4.0, timestamp=JAN_1_2020),
+            Rating(user_id=1, movie_id=2, rating=3.5, timestamp=JAN_1_2020 + DAY),
+            Rating(user_id=2, movie_id=1, rating=5.0, timestamp=JAN_1_2020 + 2 * DAY),
+        ])
+        Tag.objects.create(user_id=1, movie_id=2, tag='heist, "classic"', timestamp=JAN_1_2020)
+
+    def export(self, kind='ratings', **params):
+        response = self.client.get(f'/api/export/{kind}/', params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_csv_spans_chunks(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="ratings.csv"')
+        self.assertEqual(body.decode().splitlines(), [
+            'user_id,movie_id,rating,timestamp',
+            f'1,1,4.0,{JAN_1_2020}',
+            f'1,2,3.5,{JAN_1_2020 + DAY}',
+            f'2,1,5.0,{JAN_1_2020 + 2 * DAY}',
+        ])
+
+    def test_ndjson_with_filters(self):
+        _, body = self.export(format='ndjson', movie=1, to='2020-01-02')
+        self.assertEqual([json.loads(line) for line in body.splitlines()], [
+            {'user_id': 1, 'movie_id': 1, 'rating': 4.0, 'timestamp': JAN_1_2020},
+        ])
+        _, body = self.export(format='ndjson', **{'from': JAN_1_2020 + DAY, 'user': 1})
+        self.assertEqual([json.loads(line)['movie_id'] for line in body.splitlines()], [2])
+
+    def test_gzip_tags(self):
+        response, body = self.export('tags', gzip=1)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="tags.csv.gz"')
+        self.assertEqual(gzip.decompress(body).decode().splitlines()[1], f'1,2,"heist, ""classic""",{JAN_1_2020}')
+
+    def test_empty_export_has_a_header(self):
+        _, body = self.export(movie=99)
+        self.assertEqual(body.decode().splitlines(), ['user_id,movie_id,rating,timestamp'])
+
+    def test_invalid_parameters(self):
+        for params in ({'format': 'xml'}, {'movie': 'one'}, {'from': '2020-13-01'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/export/ratings/', params).status_code, 400)
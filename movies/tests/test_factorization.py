@@ -0,0 +1,54 @@
+from movies.factorization import recommend_for_user, train_als
+from movies.models import Rating
+from .base import IsolatedTestCase, make_movies
+
+# user_id -> {movie_id: rating}; users 1 and 2 like the same movies
+RATINGS = {
+    1: {1: 5.0, 2: 4.5},
+    2: {1: 5.0, 2: 4.0, 3: 5.0},
+    3: {4: 4.0, 5: 3.5},
+    4: {1: 1.0, 2: 2.0, 3: 1.5, 4: 4.0},
+}
+
+
+class RecommenderTests(IsolatedTestCase):
+    def setUp(self):
+        super().setUp()
+        make_movies(*((movie_id, f'Movie {movie_id}', []) for movie_id in range(1, 6)))
+        Rating.objects.bulk_create([
+            Rating(user_id=user_id, movie_id=movie_id, rating=rating, timestamp=1)
+            for user_id, rated in RATINGS.items() for movie_id, rating in rated.items()
+        ])
+
+    def train(self):
+        return train_als(factors=4, iterations=8)
+
+    def test_no_model_yet(self):
+        self.assertIsNone(recommend_for_user(1))
+        self.assertEqual(self.client.get('/api/users/1/recommendations/').status_code, 503)
+
+    def test_recommendations_skip_rated_movies(self):
+        self.assertEqual(self.train()['users'], 4)
+        recommendations = recommend_for_user(1, limit=3)
+        self.assertEqual(len(recommendations), 3)
+        self.assertEqual({movie_id for movie_id, _ in recommendations}, {3, 4, 5})
+        # Rated by user 2, who shares user 1's taste
+        self.assertEqual(recommendations[0][0], 3)
+        scores = [score for _, score in recommendations]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_unknown_user(self):
+        self.train()
+        self.assertEqual(recommend_for_user(99), [])
+        self.assertEqual(self.client.get('/api/users/99/recommendations/').status_code, 404)
+
+    def test_limit_clamped_to_unrated_movies(self):
+        self.train()
+        self.assertEqual([movie_id for movie_id, _ in recommend_for_user(4, limit=10)], [5])
+
+    def test_endpoint(self):
+        self.train()
+        body = self.client.get('/api/users/1/recommendations/', {'limit': 2}).json()
+        self.assertEqual(body['user_id'], 1)
+        self.assertEqual([row['title'] for row in body['results']][:1], ['Movie 3'])
+        self.assertEqual(len(body['results']), 2)
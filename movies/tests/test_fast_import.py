@@ -0,0 +1,54 @@
+from django.db import connection
+from movies.models import Link, Movie, MovieStats, Rating, Tag
+from .base import ImportMixin, RedisTransactionTestCase
+
+
+class FastImportTests(ImportMixin, RedisTransactionTestCase):
+    def rating_indexes(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Rating._meta.db_table)
+        return {name for name, index in constraints.items() if index['index'] and not index['unique']}
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def loaded(self):
+        return {
+            'movies': sorted(Movie.objects.values_list('movie_id', 'title')),
+            'genres': sorted(Movie.genres.through.objects.values_list('movie_id', 'genre__name')),
+            'links': sorted(Link.objects.values_list('movie_id', 'imdb_id', 'tmdb_id')),
+            'ratings': sorted(Rating.objects.values_list('user_id', 'movie_id', 'rating', 'timestamp')),
+            'tags': sorted(Tag.objects.values_list('user_id', 'movie_id', 'tag', 'timestamp')),
+        }
+
+    def test_fast_import_loads_every_table(self):
+        self.snapshot()
+        indexes = self.rating_indexes()
+        synchronous = self.pragma('synchronous')
+
+        output = self.import_data('--fast', '--chunk-size', '2')
+        self.assertIn('ratings: 5 rows', output)
+        self.assertEqual(
+            (Movie.objects.count(), Link.objects.count(), Rating.objects.count(), Tag.objects.count()),
+            (3, 3, 5, 2),
+        )
+        self.assertEqual(set(Movie.objects.get(movie_id=1).genres.values_list('name', flat=True)),
+                         {'Adventure', 'Animation', 'Children'})
+        self.assertIsNone(Link.objects.get(movie_id=3).tmdb_id)
+        self.assertEqual(MovieStats.objects.get(movie_id=2).count, 2)
+        # Indexes dropped for the load are back, and the pragmas restored
+        self.assertEqual(self.rating_indexes(), indexes)
+        self.assertEqual(self.pragma('synchronous'), synchronous)
+
+    def test_both_loaders_load_the_same_rows(self):
+        self.snapshot()
+        self.import_data('--fast')
+        fast = self.loaded()
+        for model in (Tag, Rating, Link, Movie):
+            model.objects.all().delete()
+
+        output = self.import_data()
+        self.assertIn('ratings: 5 rows', output)
+        self.assertEqual(self.loaded(), fast)
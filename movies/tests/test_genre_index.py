@@ -0,0 +1,44 @@
+from unittest import mock
+from movies import genre_index, tasks
+from movies.models import Genre
+from .base import RedisTestCase, make_movies
+
+
+class GenreIndexRebuildTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.toy_story, self.heat = make_movies(
+            (1, 'Toy Story (1995)', ['Animation', 'Comedy']),
+            (2, 'Heat (1995)', ['Action']),
+        )
+        patcher = mock.patch.object(tasks.rebuild_genre_index, 'apply_async')
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertGenreNeighbour(self, movie_id, neighbour_id, jaccard):
+        (neighbour, score), = genre_index.similar_by_genres(movie_id)
+        self.assertEqual(neighbour, neighbour_id)
+        self.assertAlmostEqual(score, jaccard, places=6)
+
+    def test_edits_share_one_scheduled_rebuild(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.heat.title = 'Heat (1995) '
+            self.heat.save()
+            self.heat.genres.add(Genre.objects.get(name='Comedy'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.toy_story.save()
+        self.apply_async.assert_called_once()
+
+        tasks.rebuild_genre_index()
+        self.assertGenreNeighbour(2, 1, 1 / 3)
+        # Edits after the task started need a rebuild of their own
+        with self.captureOnCommitCallbacks(execute=True):
+            self.toy_story.genres.add(Genre.objects.get(name='Action'))
+        self.assertEqual(self.apply_async.call_count, 2)
+
+    def test_rebuilds_inline_without_redis(self):
+        self.redis_down()
+        with self.assertLogs('movies.genre_index', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            self.heat.genres.add(Genre.objects.get(name='Comedy'))
+        self.apply_async.assert_not_called()
+        self.assertGenreNeighbour(1, 2, 1 / 3)
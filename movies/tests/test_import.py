@@ -0,0 +1,33 @@
+from movies.models import Link, Movie, MovieStats, Rating, Tag
+from .base import RATINGS, ImportMixin, RedisTestCase
+
+
+class RedisDownImportTests(ImportMixin, RedisTestCase):
+    def test_full_import_completes(self):
+        self.snapshot()
+        self.redis_down()
+        with self.assertLogs('movies.cache_utils', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            output = self.import_data()
+        self.assertIn('All data imported successfully', output)
+        self.assertIn('trending: skipped', output)
+        self.assertEqual((Movie.objects.count(), Rating.objects.count(), Tag.objects.count()), (3, 5, 2))
+        self.assertEqual(MovieStats.objects.get(movie_id=1).count, 2)
+
+    def test_incremental_import_completes(self):
+        self.snapshot()
+        self.import_data()
+        self.snapshot(ratings=RATINGS[:-1])
+        self.redis_down()
+        with self.assertLogs('movies.cache_utils', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            self.import_data('--incremental')
+        self.assertEqual(MovieStats.objects.get(movie_id=2).count, 1)
+
+    def test_single_row_writes_commit(self):
+        self.snapshot()
+        self.import_data()
+        self.redis_down()
+        with self.assertLogs('movies.cache_utils', 'WARNING'):
+            with self.captureOnCommitCallbacks(execute=True):
+                Rating.objects.create(user_id=9, movie_id=3, rating=1.0, timestamp=1)
+                Link.objects.filter(movie_id=3).update(tmdb_id='949')
+        self.assertEqual(MovieStats.objects.get(movie_id=3).count, 2)
@@ -0,0 +1,112 @@
+import time
+from django.db import connection
+from django.test import TestCase
+from movies.models import MovieStats, Rating
+from .base import RedisTestCase, make_movies
+
+
+class RatingsBatchTests(RedisTestCase):
+    url = '/api/ratings/batch/'
+
+    def setUp(self):
+        super().setUp()
+        make_movies((1, 'Toy Story (1995)', ['Animation']), (2, 'Heat (1995)', ['Action']))
+
+    def post(self, records, query=''):
+        return self.client.post(self.url + query, records, content_type='application/json')
+
+    def test_inserts_and_updates_keep_stats_in_sync(self):
+        response = self.post([
+            {'user_id': 1, 'movie_id': 1, 'rating': 4.0, 'timestamp': 100},
+            {'user_id': 2, 'movie_id': 1, 'rating': 3.0, 'timestamp': 100},
+            {'user_id': 1, 'movie_id': 2, 'rating': 5.0, 'timestamp': 100},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['inserted'], 3)
+
+        # Existing stats rows take the UPDATE path, new pairs are inserts
+        response = self.post([
+            {'user_id': 3, 'movie_id': 1, 'rating': 0.5, 'timestamp': 200},
+            {'user_id': 1, 'movie_id': 2, 'rating': 2.0, 'timestamp': 200},
+        ])
+        body = response.json()
+        self.assertEqual((body['inserted'], body['updated']), (1, 1))
+
+        stats = MovieStats.objects.get(movie_id=1)
+        self.assertEqual((stats.count, stats.total, stats.total_sq), (3, 7.5, 25.25))
+        self.assertEqual((stats.min_rating, stats.max_rating), (0.5, 4.0))
+        self.assertEqual((stats.hist_05, stats.hist_30, stats.hist_40), (1, 1, 1))
+        stats = MovieStats.objects.get(movie_id=2)
+        self.assertEqual((stats.count, stats.total, stats.max_rating), (1, 2.0, 2.0))
+
+    def test_logging_cursor(self):
+        # The debug toolbar logs every statement with last_executed_query()
+        def log_query(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            connection.ops.last_executed_query(context['cursor'], sql, params)
+            return result
+
+        self.post([{'user_id': 1, 'movie_id': 1, 'rating': 4.0, 'timestamp': 100}])
+        with connection.execute_wrapper(log_query):
+            response = self.post([{'user_id': 2, 'movie_id': 1, 'rating': 2.0, 'timestamp': 100}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(MovieStats.objects.get(movie_id=1).count, 2)
+
+    def test_single_rating_save_updates_stats(self):
+        Rating.objects.create(user_id=1, movie_id=1, rating=4.0, timestamp=100)
+        Rating.objects.create(user_id=2, movie_id=1, rating=5.0, timestamp=100)
+        stats = MovieStats.objects.get(movie_id=1)
+        self.assertEqual((stats.count, stats.total, stats.max_rating), (2, 9.0, 5.0))
+
+
+class RatingDeltaTests(TestCase):
+    def test_deltas_span_several_statements(self):
+        from movies.stats import apply_rating_deltas
+
+        make_movies(*((movie_id, f'Movie {movie_id}', []) for movie_id in range(1, 151)))
+        apply_rating_deltas([(movie_id, 3.0) for movie_id in range(1, 151)])  # Creates the rows
+        apply_rating_deltas([(movie_id, 1.0) for movie_id in range(1, 151)])  # Updates them
+        self.assertEqual(
+            set(MovieStats.objects.values_list('count', 'total', 'min_rating', 'max_rating', 'hist_10')),
+            {(2, 4.0, 1.0, 3.0, 1)},
+        )
+
+
+class ValidationTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        make_movies((1, 'Toy Story (1995)', []))
+
+    def test_out_of_range_values_are_per_record_errors(self):
+        records = [
+            {'user_id': 1, 'movie_id': 1, 'rating': 4.0, 'timestamp': 100},
+            {'user_id': 2, 'movie_id': 1, 'rating': 4.0, 'timestamp': 10 ** 20},
+            {'user_id': 3, 'movie_id': 1, 'rating': 4.0, 'timestamp': 1e300},
+            {'user_id': 10 ** 20, 'movie_id': 1, 'rating': 4.0, 'timestamp': 100},
+            {'user_id': 4, 'movie_id': 10 ** 20, 'rating': 4.0, 'timestamp': 100},
+            {'user_id': 5, 'movie_id': 1, 'rating': 10 ** 400, 'timestamp': 100},
+            {'user_id': 6, 'movie_id': 1, 'rating': 4.0, 'timestamp': int(time.time()) + 7 * 86400},
+            {'user_id': 7, 'movie_id': 1, 'rating': 4.5, 'timestamp': -1},
+            {'user_id': 8, 'movie_id': 1, 'rating': 2.3, 'timestamp': 100},
+            'not an object',
+        ]
+        response = self.client.post('/api/ratings/batch/', records, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['inserted'], 1)
+        errors = {error['index']: set(error['errors']) for error in body['errors']}
+        self.assertEqual(errors, {
+            1: {'timestamp'}, 2: {'timestamp'}, 3: {'user_id'}, 4: {'movie_id'},
+            5: {'rating'}, 6: {'timestamp'}, 7: {'timestamp'}, 8: {'rating'},
+            9: {'non_field_errors'},
+        })
+        self.assertEqual(Rating.objects.count(), 1)
+
+    def test_last_record_of_a_pair_wins(self):
+        from movies.ingest import validate_ratings
+
+        valid, errors = validate_ratings([
+            {'user_id': 1, 'movie_id': 1, 'rating': 2.0, 'timestamp': 100},
+            {'user_id': 1, 'movie_id': 1, 'rating': 3.5, 'timestamp': 90},
+        ])
+        self.assertEqual((valid, errors), ({(1, 1): (3.5, 90)}, []))
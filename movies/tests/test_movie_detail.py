@@ -0,0 +1,42 @@
+from movies.models import Link, Rating, Tag
+from .base import RedisTestCase, make_movies
+
+
+class MovieDetailTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        make_movies((1, 'Toy Story (1995)', ['Animation', 'Comedy']), (2, 'Heat (1995)', []))
+        Link.objects.create(movie_id=1, imdb_id='0114709', tmdb_id='862')
+        for user_id, rating in ((1, 4.0), (2, 5.0), (3, 2.5)):
+            Rating.objects.create(user_id=user_id, movie_id=1, rating=rating, timestamp=1000 + user_id)
+        Tag.objects.create(user_id=1, movie_id=1, tag='pixar', timestamp=2000)
+
+    def test_response_shape(self):
+        body = self.client.get('/api/movies/1/').json()
+        self.assertEqual(
+            set(body),
+            {'movie_id', 'title', 'year', 'genres', 'links', 'average_rating', 'ratings_count', 'ratings', 'tags'},
+        )
+        self.assertEqual((body['movie_id'], body['title'], body['year']), (1, 'Toy Story (1995)', 1995))
+        self.assertEqual(sorted(genre['name'] for genre in body['genres']), ['Animation', 'Comedy'])
+        self.assertEqual(body['links'], {'imdb_id': '0114709', 'tmdb_id': '862'})
+        self.assertEqual(body['tags']['results'][0]['tag'], 'pixar')
+
+    def test_stats_payload(self):
+        body = self.client.get('/api/movies/1/').json()
+        self.assertEqual((body['average_rating'], body['ratings_count']), (3.83, 3))
+
+        body = self.client.get('/api/movies/2/').json()
+        self.assertEqual((body['average_rating'], body['ratings_count'], body['links']), (None, 0, None))
+        self.assertEqual((body['genres'], body['ratings']['results']), ([], []))
+
+    def test_recent_ratings_continue_on_the_ratings_endpoint(self):
+        body = self.client.get('/api/movies/1/', {'recent': 2}).json()
+        self.assertEqual([rating['user_id'] for rating in body['ratings']['results']], [3, 2])
+        self.assertIn('/api/movies/1/ratings/', body['ratings']['next'])
+        rest = self.client.get(body['ratings']['next']).json()
+        self.assertEqual([rating['user_id'] for rating in rest['results']], [1])
+        self.assertIsNone(body['tags']['next'])
+
+    def test_unknown_movie(self):
+        self.assertEqual(self.client.get('/api/movies/99/').status_code, 404)
@@ -0,0 +1,55 @@
+from movies.models import Movie
+from .base import RedisTestCase, make_movies
+
+
+class MovieCursorPaginationTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        make_movies(
+            (1, 'Toy Story (1995)', ['Animation', 'Comedy']),
+            (2, 'Jumanji (1995)', ['Adventure']),
+            (3, 'American President, The (1995)', ['Comedy']),
+            (4, 'Apollo 13 (1995)', ['Drama']),
+            (5, 'Casablanca (1942)', ['Drama']),
+            (6, 'Unknown Title', ['Comedy']),
+        )
+
+    def walk(self, **params):
+        """Movie ids of every page, following the `next` links."""
+        ids = []
+        response = self.client.get('/api/movies/', {'page_size': 2, **params})
+        while True:
+            body = response.json()
+            self.assertLessEqual(len(body['results']), 2)
+            ids += [movie['movie_id'] for movie in body['results']]
+            if not body['next']:
+                return ids
+            response = self.client.get(body['next'])
+
+    def test_orderings(self):
+        self.assertEqual(self.walk(), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(self.walk(ordering='year'), [5, 1, 2, 3, 4])
+        self.assertEqual(self.walk(ordering='-year'), [4, 3, 2, 1, 5])
+        # Article-first, case-insensitive: "American President, The" sorts as "the american..."
+        self.assertEqual(self.walk(ordering='title'), [4, 5, 2, 3, 1, 6])
+
+    def test_filters(self):
+        self.assertEqual(self.walk(genre='Comedy'), [1, 3, 6])
+        self.assertEqual(self.walk(year_to=1950), [5])
+        self.assertEqual(self.walk(title='Ca'), [5])
+
+    def test_pages_do_not_shift_when_rows_are_inserted(self):
+        first = self.client.get('/api/movies/', {'page_size': 2}).json()
+        Movie.objects.create(movie_id=0, title='Inserted before the cursor')
+        second = self.client.get(first['next']).json()
+        self.assertEqual([movie['movie_id'] for movie in second['results']], [3, 4])
+
+    def test_deep_page_costs_two_queries(self):
+        next_url = self.client.get('/api/movies/', {'page_size': 2}).json()['next']
+        next_url = self.client.get(next_url).json()['next']
+        with self.assertNumQueries(2):
+            self.client.get(next_url)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/movies/', {'ordering': 'rating'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/movies/', {'year_from': 'soon'}).status_code, 400)
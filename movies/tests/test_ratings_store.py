@@ -0,0 +1,33 @@
+from unittest import mock
+import numpy as np
+from movies import ratings_store
+from movies.models import Rating
+from .base import IsolatedTestCase, make_movies
+
+
+class RatingsStoreTests(IsolatedTestCase):
+    def setUp(self):
+        super().setUp()
+        make_movies((1, 'Toy Story (1995)', []), (2, 'Heat (1995)', []))
+        Rating.objects.bulk_create([
+            Rating(user_id=1, movie_id=1, rating=4.0, timestamp=10),
+            Rating(user_id=2, movie_id=1, rating=2.5, timestamp=20),
+            Rating(user_id=2, movie_id=2, rating=5.0, timestamp=30),
+        ])
+
+    def test_snapshot_by_movie_and_user(self):
+        self.assertEqual(ratings_store.rebuild_ratings_store(), 3)
+        users, half_stars, timestamps = ratings_store.movie_rows(1)
+        self.assertEqual((users.tolist(), half_stars.tolist(), timestamps.tolist()), ([1, 2], [8, 5], [10, 20]))
+        movies, half_stars, _ = ratings_store.user_rows(2)
+        self.assertEqual((movies.tolist(), half_stars.tolist()), ([1, 2], [5, 10]))
+        self.assertIsNone(ratings_store.movie_rows(3))
+
+        ids, counts, averages = ratings_store.group_aggregates('movie')
+        self.assertEqual((ids.tolist(), counts.tolist()), ([1, 2], [2, 1]))
+        np.testing.assert_allclose(averages, [3.25, 5.0])
+
+    def test_rows_added_after_count(self):
+        with mock.patch.object(ratings_store, 'LOAD_CHUNK_SIZE', 2), \
+                mock.patch('django.db.models.query.QuerySet.count', return_value=1):
+            self.assertEqual(ratings_store.rebuild_ratings_store(), 3)
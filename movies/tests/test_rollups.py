@@ -0,0 +1,74 @@
+from unittest import mock
+from django.test import TestCase
+from movies import rollups
+from movies.models import Rating, RatingRollup
+from .base import make_movies
+
+JAN_2020 = 1577836800
+FEB_2020 = 1580515200
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        make_movies((1, 'Toy Story (1995)', ['Animation', 'Comedy']), (2, 'Heat (1995)', ['Action']))
+        Rating.objects.bulk_create([
+            Rating(user_id=1, movie_id=1, rating=4.0, timestamp=JAN_2020),
+            Rating(user_id=2, movie_id=1, rating=3.0, timestamp=JAN_2020 + 60),
+            Rating(user_id=1, movie_id=2, rating=5.0, timestamp=FEB_2020),
+        ])
+
+    def cells(self):
+        return {
+            (row['genre__name'], row['month'].month): (row['ratings'], row['total'], row['users'])
+            for row in rollups.rollup_totals(['genre', 'month'])
+        }
+
+    def test_incremental_refresh_recomputes_new_months(self):
+        self.assertEqual(rollups.refresh_rollups()['months'], 2)
+        self.assertEqual(self.cells(), {
+            ('Action', 2): (1, 5.0, 1),
+            ('Animation', 1): (2, 7.0, 2),
+            ('Comedy', 1): (2, 7.0, 2),
+        })
+        Rating.objects.create(user_id=3, movie_id=2, rating=1.0, timestamp=FEB_2020 + 60)
+        self.assertEqual(rollups.refresh_rollups()['months'], 1)
+        self.assertEqual(self.cells()[('Action', 2)], (2, 6.0, 2))
+
+    def test_full_refresh_picks_up_deletions(self):
+        rollups.refresh_rollups()
+        Rating.objects.filter(movie_id=1).delete()  # Old timestamps: unseen by the high-water mark
+        self.assertEqual(rollups.refresh_rollups()['months'], 0)
+        summary = rollups.refresh_rollups(full=True)
+        self.assertEqual((summary['months'], summary['rows']), (1, 1))
+        self.assertEqual(self.cells(), {('Action', 2): (1, 5.0, 1)})
+        # The staging table is gone: the next full refresh creates it again
+        self.assertEqual(rollups.refresh_rollups(full=True)['rows'], 1)
+
+    def test_load_streams_chunks_into_a_growing_array(self):
+        ratings = Rating.objects.all()
+        with mock.patch.object(rollups, 'LOAD_CHUNK_SIZE', 2), \
+                mock.patch.object(type(ratings), 'count', return_value=1):
+            rows = rollups._load(ratings)
+        self.assertEqual(rows.shape, (3, 4))
+        self.assertEqual(sorted(rows[:, 2].tolist()), [3.0, 4.0, 5.0])
+
+    def test_failed_full_refresh_keeps_the_old_rollups(self):
+        rollups.refresh_rollups()
+        before = self.cells()
+        state = rollups.RollupState.objects.get()
+        aggregate = rollups._aggregate
+        calls = []
+
+        def failing_second_batch(ratings, lookup):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError('worker killed')
+            return aggregate(ratings, lookup)
+
+        with mock.patch.object(rollups, 'MONTHS_PER_BATCH', 1), \
+                mock.patch.object(rollups, '_aggregate', failing_second_batch), \
+                self.assertRaises(RuntimeError):
+            rollups.refresh_rollups(full=True)
+        self.assertEqual(self.cells(), before)
+        self.assertEqual(rollups.RollupState.objects.get().refreshed_at, state.refreshed_at)
+        self.assertEqual(RatingRollup.objects.count(), 3)
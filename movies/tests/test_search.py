@@ -0,0 +1,51 @@
+from movies.models import Movie
+from movies.search import match_expression, search_titles
+from .base import RedisTestCase, make_movies
+
+
+class TitleSearchTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        make_movies(
+            (1, 'Star Wars: Episode IV - A New Hope (1977)', []),
+            (2, 'Star Trek (2009)', []),
+            (3, 'Lone Star (1996)', []),
+            (4, 'Amélie (Fabuleux destin d\'Amélie Poulain, Le) (2001)', []),
+            (5, 'Wars of the Roses, The (1989)', []),
+        )
+
+    def ids(self, query, **kwargs):
+        return [row[0] for row in search_titles(query, **kwargs)]
+
+    def test_every_word_is_a_prefix(self):
+        self.assertEqual(self.ids('star wa'), [1])
+        self.assertEqual(set(self.ids('sta')), {1, 2, 3})
+        self.assertEqual(self.ids('amelie'), [4])  # Diacritics folded
+
+    def test_year_filters_and_ordering(self):
+        self.assertEqual(set(self.ids('star', year_from=1990)), {2, 3})
+        self.assertEqual(self.ids('star', ordering='year'), [1, 3, 2])
+        self.assertEqual(self.ids('star', ordering='-year'), [2, 3, 1])
+
+    def test_index_follows_title_writes(self):
+        movie = Movie.objects.get(movie_id=2)
+        movie.title = 'Galaxy Quest (1999)'
+        movie.save()
+        self.assertEqual(self.ids('trek'), [])
+        self.assertEqual(self.ids('galaxy'), [2])
+        Movie.objects.filter(movie_id=3).delete()
+        self.assertEqual(self.ids('lone'), [])
+
+    def test_user_input_is_never_fts_syntax(self):
+        self.assertEqual(match_expression('star AND "wars" OR -x*'), '"star"* "AND"* "wars"* "OR"* "x"*')
+        self.assertEqual(self.ids('") OR ('), [])
+        self.assertEqual(self.ids(''), [])
+
+    def test_search_endpoint(self):
+        body = self.client.get('/api/movies/search/', {'q': 'star', 'limit': 2}).json()
+        self.assertEqual((body['query'], body['count']), ('star', 2))
+        self.assertLessEqual(set(row['movie_id'] for row in body['results']), {1, 2, 3})
+        body = self.client.get('/api/movies/search/', {'q': 'star', 'ordering': 'year', 'year_to': 2000}).json()
+        self.assertEqual([row['movie_id'] for row in body['results']], [1, 3])
+        self.assertEqual(body['results'][0]['year'], 1977)
+        self.assertEqual(self.client.get('/api/movies/search/', {'q': 'star', 'ordering': 'title'}).status_code, 400)
@@ -0,0 +1,47 @@
+from unittest import mock
+import numpy as np
+from movies import similarity
+from movies.models import Rating
+from .base import IsolatedTestCase, make_movies
+
+
+class SimilarityTests(IsolatedTestCase):
+    def setUp(self):
+        super().setUp()
+        make_movies(*((movie_id, f'Movie {movie_id}', []) for movie_id in range(1, 9)))
+        rng = np.random.default_rng(7)
+        Rating.objects.bulk_create([
+            Rating(user_id=user_id, movie_id=movie_id, rating=float(rng.integers(1, 11)) / 2, timestamp=1)
+            for user_id in range(1, 31)
+            for movie_id in range(1, 9)
+            if rng.random() < 0.6
+        ])
+
+    def test_load_ratings_tolerates_rows_added_after_count(self):
+        expected = sorted(Rating.objects.values_list('user_id', 'movie_id', 'rating'))
+        # count() is stale (rows inserted meanwhile): the arrays grow
+        with mock.patch.object(similarity, 'LOAD_CHUNK_SIZE', 7), \
+                mock.patch('django.db.models.query.QuerySet.count', return_value=3):
+            users, movies, values = similarity.load_ratings()
+        self.assertEqual(sorted(zip(users.tolist(), movies.tolist(), values.tolist())), expected)
+
+    def test_blocks_match_brute_force(self):
+        users, movies, values = similarity.load_ratings()
+        matrix, movie_ids = similarity.item_user_matrix(users, movies, values)
+        dense = matrix.toarray()
+        expected = dense @ dense.T
+        np.fill_diagonal(expected, -np.inf)
+
+        # A budget of one row per block exercises the blocking
+        neighbours, scores = similarity.compute_similarities(matrix, k=3, memory_mb=1e-9, workers=2)
+        for row in range(len(movie_ids)):
+            best = np.sort(expected[row])[::-1][:3]
+            np.testing.assert_allclose(scores[row], best, rtol=1e-5, atol=1e-6)
+            np.testing.assert_allclose(expected[row, neighbours[row]], scores[row], rtol=1e-5, atol=1e-6)
+
+    def test_build_and_lookup(self):
+        summary = similarity.build_item_similarities(k=3)
+        self.assertEqual((summary['movies'], summary['k']), (8, 3))
+        similar = similarity.similar_movies(1, limit=3)
+        self.assertTrue(all(movie_id != 1 for movie_id, _ in similar))
+        self.assertEqual([score for _, score in similar], sorted((score for _, score in similar), reverse=True))
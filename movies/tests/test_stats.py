@@ -0,0 +1,97 @@
+from unittest import mock
+from django.forms.models import model_to_dict
+from django.test import TestCase
+from movies.models import MovieStats, Rating
+from movies.stats import STATS_FIELDS, apply_rating_deltas, rebuild_movie_stats, refresh_stats_range
+from .base import CeleryTestCase, make_movies
+
+
+def stats_of(movie_id):
+    return model_to_dict(MovieStats.objects.get(movie_id=movie_id), fields=STATS_FIELDS)
+
+
+class MovieStatsTests(TestCase):
+    def setUp(self):
+        make_movies((1, 'Toy Story (1995)', []), (2, 'Heat (1995)', []), (3, 'Casino (1995)', []))
+
+    def assertMatchesRebuild(self, *movie_ids):
+        maintained = {movie_id: stats_of(movie_id) for movie_id in movie_ids}
+        rebuild_movie_stats(movie_ids)
+        self.assertEqual(maintained, {movie_id: stats_of(movie_id) for movie_id in movie_ids})
+
+    def test_signals_maintain_stats(self):
+        first = Rating.objects.create(user_id=1, movie_id=1, rating=4.0, timestamp=1)
+        Rating.objects.create(user_id=2, movie_id=1, rating=2.5, timestamp=2)
+        stats = stats_of(1)
+        self.assertEqual((stats['count'], stats['total'], stats['total_sq']), (2, 6.5, 22.25))
+        self.assertEqual((stats['min_rating'], stats['max_rating'], stats['hist_25'], stats['hist_40']), (2.5, 4.0, 1, 1))
+
+        first.rating = 1.0
+        first.save()
+        self.assertEqual(stats_of(1)['min_rating'], 1.0)
+        self.assertMatchesRebuild(1)
+        first.delete()
+        self.assertEqual((stats_of(1)['count'], stats_of(1)['max_rating']), (1, 2.5))
+
+    def test_deltas_create_and_update_rows(self):
+        Rating.objects.bulk_create([
+            Rating(user_id=1, movie_id=1, rating=3.0, timestamp=1),
+            Rating(user_id=1, movie_id=2, rating=5.0, timestamp=1),
+            Rating(user_id=2, movie_id=2, rating=0.5, timestamp=1),
+        ])
+        rebuild_movie_stats([1])
+        apply_rating_deltas([(2, 5.0), (2, 0.5)])  # Creates the row
+        Rating.objects.create(user_id=2, movie_id=1, rating=5.0, timestamp=1)  # Updates it
+        self.assertEqual((stats_of(1)['count'], stats_of(2)['count']), (2, 2))
+        self.assertMatchesRebuild(1, 2)
+
+    def test_refresh_range_zeroes_movies_without_ratings(self):
+        Rating.objects.create(user_id=1, movie_id=2, rating=3.0, timestamp=1)
+        Rating.objects.create(user_id=2, movie_id=3, rating=4.0, timestamp=1)
+        Rating.objects.filter(movie_id=2).update(movie_id=3)  # Bypasses the signals
+        self.assertEqual(refresh_stats_range(1, 4), (2, 2))
+        self.assertEqual((stats_of(2)['count'], stats_of(2)['max_rating']), (0, None))
+        self.assertEqual(stats_of(3)['count'], 2)
+
+
+class MovieStatsJobTests(CeleryTestCase):
+    def setUp(self):
+        super().setUp()
+        make_movies(*((movie_id, f'Movie {movie_id}', []) for movie_id in range(1, 6)))
+        for user_id, movie_id, rating in ((1, 1, 4.0), (2, 1, 2.0), (1, 3, 5.0), (1, 5, 1.5)):
+            Rating.objects.create(user_id=user_id, movie_id=movie_id, rating=rating, timestamp=1)
+        MovieStats.objects.update(count=99, total=0)  # Drifted, bypassing the signals
+
+    def test_job_recomputes_every_chunk(self):
+        response = self.client.post('/api/celery/movie-stats/?chunk_size=2')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual((response.json()['state'], response.json()['chunks']), ('STARTED', 3))
+
+        # Eager chord: the chunks and the callback ran inside the POST
+        job = self.client.get('/api/celery/movie-stats/').json()
+        self.assertEqual(
+            (job['state'], job['chunks'], job['chunks_done'], job['movies'], job['ratings']),
+            ('SUCCESS', 3, 3, 3, 4),
+        )
+        self.assertEqual((stats_of(1)['count'], stats_of(1)['total']), (2, 6.0))
+        self.assertEqual(self.client.get('/api/celery/movie-stats/', {'job_id': job['job_id']}).json(), job)
+
+    def test_view_errors(self):
+        self.assertEqual(self.client.get('/api/celery/movie-stats/').status_code, 404)
+        self.assertEqual(self.client.get('/api/celery/movie-stats/', {'job_id': 'nope'}).status_code, 404)
+        self.assertEqual(self.client.post('/api/celery/movie-stats/?chunk_size=0').status_code, 400)
+
+    def test_failed_chunk_marks_the_job_failed(self):
+        def refresh(lo, hi):
+            if lo <= 3 < hi:
+                raise RuntimeError('database is locked')
+            return refresh_stats_range(lo, hi)
+
+        with mock.patch('movies.stats.refresh_stats_range', side_effect=refresh):
+            # Eager chord: the failure propagates to the caller as well
+            with self.assertRaises(RuntimeError):
+                self.client.post('/api/celery/movie-stats/?chunk_size=2')
+        job = self.client.get('/api/celery/movie-stats/').json()
+        self.assertEqual((job['state'], job['error']), ('FAILED', 'RuntimeError: database is locked'))
+        self.assertNotIn('movies', job)
+        self.assertEqual(job['chunks_done'], 2)  # The other chunks still ran
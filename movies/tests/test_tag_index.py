@@ -0,0 +1,113 @@
+from movies.models import Tag, TagPosting, TagTerm
+from movies.tag_index import _refresh_terms, apply_tag_deltas, normalize_tag, rebuild_tag_index
+from .base import IsolatedTestCase, RedisTestCase, make_movies
+
+
+def postings():
+    return {
+        (term, movie_id): count
+        for term, movie_id, count in TagPosting.objects.values_list('term__term', 'movie_id', 'count')
+    }
+
+
+def terms():
+    return {
+        term: (movies, uses)
+        for term, movies, uses in TagTerm.objects.values_list('term', 'movies_count', 'uses_count')
+    }
+
+
+class TagIndexTests(IsolatedTestCase):
+    def setUp(self):
+        super().setUp()
+        make_movies((1, 'Toy Story (1995)', []), (2, 'Heat (1995)', []), (3, 'Casino (1995)', []))
+        Tag.objects.bulk_create([
+            Tag(user_id=1, movie_id=1, tag='Pixar', timestamp=1),
+            Tag(user_id=2, movie_id=1, tag='  pixar ', timestamp=1),
+            Tag(user_id=1, movie_id=2, tag='Dark  Comedy', timestamp=1),
+            Tag(user_id=2, movie_id=3, tag='dark comedy', timestamp=1),
+            Tag(user_id=3, movie_id=3, tag='   ', timestamp=1),
+        ])
+        rebuild_tag_index()
+
+    def test_normalize_tag(self):
+        self.assertEqual(normalize_tag('  Dark   Comedy '), 'dark comedy')
+        self.assertEqual(normalize_tag('STRASSE'), normalize_tag('straße'))
+        self.assertEqual(normalize_tag(' \t'), '')
+
+    def test_full_rebuild(self):
+        self.assertEqual(postings(), {('pixar', 1): 2, ('dark comedy', 2): 1, ('dark comedy', 3): 1})
+        self.assertEqual(terms(), {'pixar': (1, 2), 'dark comedy': (2, 2)})
+
+    def test_rebuild_selected_movies(self):
+        Tag.objects.filter(movie_id=3).update(tag='Heist')  # Bypasses the signals
+        Tag.objects.filter(movie_id=1).update(tag='ignored')
+        self.assertEqual(rebuild_tag_index(movie_ids=[3]), 1)
+        self.assertEqual(postings(), {('pixar', 1): 2, ('dark comedy', 2): 1, ('heist', 3): 2})
+        self.assertEqual(terms(), {'pixar': (1, 2), 'dark comedy': (1, 1), 'heist': (1, 2)})
+        self.assertEqual(rebuild_tag_index(movie_ids=[]), 0)
+
+    def test_deltas(self):
+        apply_tag_deltas(added=[(2, 'PIXAR'), (1, 'pixar')], removed=[(3, 'Dark Comedy')])
+        self.assertEqual(postings(), {('pixar', 1): 3, ('pixar', 2): 1, ('dark comedy', 2): 1})
+        self.assertEqual(terms(), {'pixar': (2, 4), 'dark comedy': (1, 1)})
+
+    def test_deltas_to_zero_drop_postings_and_terms(self):
+        apply_tag_deltas(removed=[(2, 'dark comedy'), (3, 'dark comedy'), (1, 'pixar')])
+        self.assertEqual(postings(), {('pixar', 1): 1})
+        self.assertEqual(terms(), {'pixar': (1, 1)})
+        # A delta that nets out writes nothing
+        apply_tag_deltas(added=[(1, 'new')], removed=[(1, 'NEW')])
+        self.assertNotIn('new', terms())
+
+    def test_refresh_terms_prunes_unused_terms(self):
+        unused = TagTerm.objects.create(term='unused', movies_count=5, uses_count=5)
+        TagPosting.objects.filter(movie_id=3).delete()
+        _refresh_terms([unused.id, *TagTerm.objects.values_list('id', flat=True)])
+        self.assertEqual(terms(), {'pixar': (1, 2), 'dark comedy': (1, 1)})
+
+    def test_signals_follow_tag_writes(self):
+        tag = Tag.objects.create(user_id=4, movie_id=2, tag='Heist', timestamp=2)
+        self.assertEqual(postings()[('heist', 2)], 1)
+
+        tag.tag = 'pixar'
+        tag.save()
+        self.assertNotIn('heist', terms())
+        self.assertEqual(postings()[('pixar', 2)], 1)
+
+        tag.delete()
+        Tag.objects.get(movie_id=2).delete()
+        self.assertEqual(terms(), {'pixar': (1, 2), 'dark comedy': (1, 1)})
+
+
+class TagEndpointTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        make_movies((1, 'Toy Story (1995)', []), (2, 'Heat (1995)', []), (3, 'Casino (1995)', []))
+        for user_id, movie_id, tag in (
+            (1, 1, 'funny'), (2, 1, 'funny'), (1, 1, 'pixar'), (1, 2, 'funny'), (1, 2, 'heist'), (1, 3, 'heist'),
+        ):
+            Tag.objects.create(user_id=user_id, movie_id=movie_id, tag=tag, timestamp=1)
+
+    def test_tag_lookup(self):
+        body = self.client.get('/api/tags/', {'q': ' F'}).json()
+        self.assertEqual(body, {'query': 'f', 'results': [{'term': 'funny', 'movies_count': 2, 'uses_count': 3}]})
+        body = self.client.get('/api/tags/', {'limit': 2}).json()
+        self.assertEqual([row['term'] for row in body['results']], ['funny', 'heist'])
+
+    def test_tag_movies(self):
+        body = self.client.get('/api/tags/movies/', {'tags': 'funny,Heist'}).json()
+        self.assertEqual(body['results'], [{'movie_id': 2, 'title': 'Heat (1995)', 'matched_tags': 2, 'score': 2}])
+        body = self.client.get('/api/tags/movies/', {'tags': 'funny,heist', 'op': 'or'}).json()
+        self.assertEqual([(row['movie_id'], row['matched_tags'], row['score']) for row in body['results']],
+                         [(2, 2, 2), (1, 1, 2), (3, 1, 1)])
+        self.assertEqual(self.client.get('/api/tags/movies/', {'tags': 'funny,unknown'}).json()['count'], 0)
+        self.assertEqual(self.client.get('/api/tags/movies/', {'tags': 'funny', 'op': 'xor'}).status_code, 400)
+
+    def test_movie_tag_cloud(self):
+        body = self.client.get('/api/movies/1/tag-cloud/').json()
+        self.assertEqual(body, {'movie_id': 1, 'tags': [
+            {'tag': 'funny', 'count': 2, 'movies_with_tag': 2},
+            {'tag': 'pixar', 'count': 1, 'movies_with_tag': 1},
+        ]})
+        self.assertEqual(self.client.get('/api/movies/99/tag-cloud/').json()['tags'], [])
@@ -0,0 +1,59 @@
+from unittest import mock
+from movies.cache_utils import bump_generations
+from movies.task_dedup import CACHED, IN_FLIGHT, SUBMITTED, DeduplicatedTask, submit_once
+from movies_api.celery import app as celery_app
+from .base import CeleryTestCase
+
+calls = []
+
+
+@celery_app.task(bind=True, base=DeduplicatedTask, store_eager_result=True)
+def double(self, x):
+    calls.append(x)
+    if x < 0:
+        raise ValueError('negative')
+    return 2 * x
+
+
+class TaskDedupTests(CeleryTestCase):
+    def setUp(self):
+        super().setUp()
+        calls.clear()
+
+    def test_finished_result_is_reused_until_the_scope_changes(self):
+        first, status = submit_once(double, [21], scopes=['movies.rating'])
+        self.assertEqual((status, first.get()), (SUBMITTED, 42))
+        again, status = submit_once(double, [21], scopes=['movies.rating'])
+        self.assertEqual((status, again.id, again.result), (CACHED, first.id, 42))
+        self.assertEqual(submit_once(double, [1], scopes=['movies.rating'])[1], SUBMITTED)
+
+        bump_generations('movies.rating')
+        fresh, status = submit_once(double, [21], scopes=['movies.rating'])
+        self.assertEqual(status, SUBMITTED)
+        self.assertNotEqual(fresh.id, first.id)
+        self.assertEqual(calls, [21, 1, 21])
+
+    def test_queued_task_is_shared(self):
+        def enqueue(args, task_id=None, headers=None):
+            return double.AsyncResult(task_id)
+
+        with mock.patch.object(double, 'apply_async', side_effect=enqueue) as apply_async:
+            first, status = submit_once(double, [5])
+            self.assertEqual(status, SUBMITTED)
+            second, status = submit_once(double, [5])
+        self.assertEqual((status, second.id), (IN_FLIGHT, first.id))
+        apply_async.assert_called_once()
+
+    def test_failure_releases_the_claim(self):
+        self.assertEqual(submit_once(double, [-1])[1], SUBMITTED)
+        self.assertEqual(submit_once(double, [-1])[1], SUBMITTED)
+        self.assertEqual(calls, [-1, -1])
+
+    def test_no_dedup_without_redis(self):
+        self.redis_down()
+        with self.assertLogs('movies.cache_utils', 'WARNING'):
+            self.assertEqual(submit_once(double, [3], scopes=['movies.rating'])[1], SUBMITTED)
+        # Without scopes no generation is read, the claim itself fails
+        with self.assertLogs('movies.task_dedup', 'WARNING'):
+            self.assertEqual(submit_once(double, [3])[1], SUBMITTED)
+        self.assertEqual(calls, [3, 3])
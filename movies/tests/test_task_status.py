@@ -0,0 +1,89 @@
+from unittest import mock
+from celery import states
+from movies_api.celery import app as celery_app
+from movies.models import Rating
+from movies.ratings_store import rebuild_ratings_store
+from movies.task_status import PROGRESS, progress_meta, task_status
+from movies.tasks import process_bulk_ratings
+from .base import CeleryTestCase, make_movies
+
+
+class TaskStatusTests(CeleryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.backend = celery_app.backend
+
+    def test_progress_then_success(self):
+        self.backend.store_result('job-1', progress_meta(2, 8, partial={'count': 3}), PROGRESS)
+        status = self.client.get('/api/tasks/job-1/').json()
+        self.assertEqual((status['state'], status['percent'], status['ready']), (PROGRESS, 25.0, False))
+        self.assertEqual(status['progress']['partial'], {'count': 3})
+
+        self.backend.store_result('job-1', {'rows': 8}, states.SUCCESS)
+        done = self.client.get('/api/tasks/job-1/', {'since': status['version'], 'wait': 1}).json()
+        self.assertEqual((done['state'], done['result'], done['ready']), (states.SUCCESS, {'rows': 8}, True))
+        self.assertNotEqual(done['version'], status['version'])
+
+    def test_unknown_task_is_pending(self):
+        self.assertEqual(task_status('no-such-task')['state'], states.PENDING)
+
+    def test_long_poll_returns_after_wait_without_change(self):
+        version = task_status('job-2')['version']
+        with self.settings(TASK_STATUS_POLL_INTERVAL=0.01):
+            status = self.client.get('/api/tasks/job-2/', {'since': version, 'wait': 0.05}).json()
+        self.assertEqual(status['version'], version)
+
+    def test_invalid_wait(self):
+        for wait in ('nan', 'inf', '-inf', 'soon'):
+            with self.subTest(wait=wait):
+                response = self.client.get('/api/tasks/job-3/', {'wait': wait})
+                self.assertEqual(response.status_code, 400)
+
+
+class BulkRatingsTaskTests(CeleryTestCase):
+    def run_task(self, user_id):
+        with mock.patch('movies.tasks.sleep'), mock.patch('movies.tasks.report_progress') as report:
+            result = process_bulk_ratings.apply(args=[user_id]).result
+        return result, [call.kwargs['partial'] for call in report.call_args_list]
+
+    def test_summary_reads_the_live_table(self):
+        movies = make_movies(*((i, f'Movie {i}', []) for i in range(1, 10)))
+        for movie, rating in zip(movies, (4.0, 4.0, 3.5, 5.0, 2.0, 4.0, 1.0, 3.0)):
+            Rating.objects.create(user_id=1, movie=movie, rating=rating, timestamp=1)
+        rebuild_ratings_store()
+        # Written after the snapshot: still part of the result
+        Rating.objects.create(user_id=1, movie=movies[8], rating=0.5, timestamp=2)
+
+        result, partials = self.run_task(1)
+        self.assertEqual((result['total_ratings'], result['average_rating']), (9, 3.0))
+        self.assertEqual(result['histogram']['4.0'], 3)
+        self.assertEqual(result['histogram']['0.5'], 1)
+        self.assertEqual(sum(result['histogram'].values()), 9)
+        self.assertEqual(len(partials), 8)
+        self.assertIsNone(partials[0])
+        # Running totals over the user's ratings in insertion order
+        self.assertEqual((partials[1]['count'], partials[1]['average']), (1, 4.0))
+        self.assertEqual([p['count'] for p in partials[1:]], [9 * step // 8 for step in range(1, 8)])
+
+    def test_user_without_ratings(self):
+        result, partials = self.run_task(99)
+        self.assertEqual(result['message'], 'No ratings found')
+        self.assertEqual(partials, [None] * 8)
+
+    def test_view_reuses_the_result_until_ratings_change(self):
+        movie, = make_movies((1, 'Movie 1', []))
+        Rating.objects.create(user_id=1, movie=movie, rating=4.0, timestamp=1)
+        with mock.patch('movies.tasks.sleep'), mock.patch.object(process_bulk_ratings, 'store_eager_result', True):
+            first = self.client.get('/api/celery/task2/').json()
+            again = self.client.get('/api/celery/task2/').json()
+            self.assertEqual((first['dedup'], again['dedup']), ('submitted', 'cached'))
+            self.assertEqual(again['task_id'], first['task_id'])
+            self.assertEqual(again['result']['total_ratings'], 1)
+
+            other, = make_movies((2, 'Movie 2', []))
+            with self.captureOnCommitCallbacks(execute=True):
+                Rating.objects.create(user_id=1, movie=other, rating=1.0, timestamp=2)
+            fresh = self.client.get('/api/celery/task2/').json()
+        self.assertEqual(fresh['dedup'], 'submitted')
+        result = process_bulk_ratings.AsyncResult(fresh['task_id']).result
+        self.assertEqual((result['total_ratings'], result['average_rating']), (2, 2.5))
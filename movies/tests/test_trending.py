@@ -0,0 +1,49 @@
+import time
+from unittest import mock
+from movies import trending
+from movies.models import Rating
+from .base import RedisTestCase, make_movies
+
+HALF_LIFE = 72 * 3600
+
+
+class TrendingTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        make_movies((1, 'Toy Story (1995)', []), (2, 'Heat (1995)', []))
+        self.now = int(time.time())
+        Rating.objects.bulk_create([
+            Rating(user_id=1, movie_id=1, rating=4.0, timestamp=self.now - HALF_LIFE),
+            Rating(user_id=2, movie_id=1, rating=3.0, timestamp=self.now - HALF_LIFE),
+            Rating(user_id=1, movie_id=2, rating=5.0, timestamp=self.now),
+        ])
+
+    def scores(self):
+        return {row['movie_id']: row['score'] for row in trending.trending()}
+
+    def refresh_at(self, now):
+        with mock.patch.object(trending.time, 'time', return_value=now):
+            return trending.refresh_trending()
+
+    def test_scores_are_ratings_as_of_now(self):
+        self.assertEqual(self.refresh_at(self.now)['ratings'], 3)
+        scores = self.scores()
+        self.assertAlmostEqual(scores[1], 1.0, places=3)
+        self.assertAlmostEqual(scores[2], 1.0, places=3)
+
+    def test_scores_keep_decaying_without_new_ratings(self):
+        self.refresh_at(self.now)
+        summary = self.refresh_at(self.now + HALF_LIFE)
+        self.assertEqual((summary['ratings'], summary['as_of']), (0, self.now + HALF_LIFE))
+        scores = self.scores()
+        self.assertAlmostEqual(scores[1], 0.5, places=3)
+        self.assertAlmostEqual(scores[2], 0.5, places=3)
+        # The rating checkpoint stays at the newest rating
+        self.assertEqual(int(self.redis.hget(trending.STATE_KEY, 'timestamp')), self.now)
+
+    def test_new_ratings_are_folded_in_once(self):
+        self.refresh_at(self.now)
+        Rating.objects.create(user_id=3, movie_id=2, rating=2.0, timestamp=self.now)
+        self.assertEqual(self.refresh_at(self.now)['ratings'], 1)
+        self.assertEqual(self.refresh_at(self.now)['ratings'], 0)
+        self.assertAlmostEqual(self.scores()[2], 2.0, places=3)
@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.test import override_settings
+from movies.models import MovieStats, Rating
+from movies.write_behind import buffer_metrics, flush_ratings
+from .base import RedisTestCase, make_movies
+
+
+class WriteBehindTests(RedisTestCase):
+    url = '/api/ratings/batch/?write_behind=1'
+
+    def setUp(self):
+        super().setUp()
+        make_movies((1, 'Toy Story (1995)', []), (2, 'Heat (1995)', []))
+
+    def post(self, records):
+        return self.client.post(self.url, records, content_type='application/json')
+
+    def test_queue_then_flush(self):
+        response = self.post([
+            {'user_id': 1, 'movie_id': 1, 'rating': 4.0, 'timestamp': 100},
+            {'user_id': 2, 'movie_id': 2, 'rating': 3.0, 'timestamp': 100},
+        ])
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['queued'], 2)
+        self.assertEqual(Rating.objects.count(), 0)
+        self.assertEqual(buffer_metrics()['buffered'], 2)
+
+        summary = flush_ratings()
+        self.assertEqual((summary['entries'], summary['inserted']), (2, 2))
+        self.assertEqual(Rating.objects.count(), 2)
+        self.assertEqual(buffer_metrics()['buffered'], 0)
+
+    def test_replayed_older_rating_is_skipped(self):
+        self.post([{'user_id': 1, 'movie_id': 1, 'rating': 4.0, 'timestamp': 200}])
+        self.post([{'user_id': 1, 'movie_id': 1, 'rating': 1.0, 'timestamp': 100}])
+        flush_ratings(batch_size=1)
+        self.assertEqual(Rating.objects.get().rating, 4.0)
+        self.assertEqual(MovieStats.objects.get(movie_id=1).total, 4.0)
+
+    def test_redis_down_writes_synchronously(self):
+        self.redis_down()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post([
+                {'user_id': 1, 'movie_id': 1, 'rating': 4.0, 'timestamp': 100},
+                {'user_id': 1, 'movie_id': 99, 'rating': 4.0, 'timestamp': 100},
+            ])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertTrue(body['mode'].startswith('synchronous'))
+        self.assertEqual((body['inserted'], body['rejected']), (1, 1))
+        self.assertEqual(Rating.objects.count(), 1)
+
+    def test_redis_down_buffer_stats(self):
+        self.redis_down()
+        self.assertEqual(self.client.get('/api/ratings/buffer/').status_code, 503)
+
+
+@override_settings(RATINGS_FLUSH_CLAIM_IDLE=0, RATINGS_FLUSH_MAX_DELIVERIES=3)
+class PoisonEntryTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        make_movies((1, 'Toy Story (1995)', []))
+
+    def add(self, user_id, timestamp):
+        self.redis.xadd(settings.RATINGS_STREAM, {
+            'user_id': user_id, 'movie_id': 1, 'rating': 4.0, 'timestamp': timestamp,
+        })
+
+    def test_failing_entry_is_dead_lettered(self):
+        self.add(1, 100)
+        self.add(2, 10 ** 20)  # Overflows SQLite's integer on write
+
+        with self.assertLogs('movies.write_behind', 'ERROR'):
+            self.assertEqual(flush_ratings()['failed_batches'], 1)
+        with self.assertLogs('movies.write_behind', 'ERROR'):
+            self.assertEqual(flush_ratings()['failed_batches'], 1)
+        self.assertEqual(Rating.objects.count(), 0)
+
+        # Third delivery: one by one, the bad entry leaves the stream
+        self.add(3, 100)
+        with self.assertLogs('movies.write_behind', 'WARNING'):
+            summary = flush_ratings()
+        self.assertEqual((summary['inserted'], summary['dead_lettered'], summary['failed_batches']), (2, 1, 0))
+        self.assertEqual(set(Rating.objects.values_list('user_id', flat=True)), {1, 3})
+
+        metrics = buffer_metrics()
+        self.assertEqual((metrics['buffered'], metrics['pending_delivery'], metrics['dead_letters']), (0, 0, 1))
+        [(_, fields)] = self.redis.xrange(settings.RATINGS_DEAD_LETTER_STREAM)
+        self.assertEqual(fields['user_id'], '2')
+        self.assertIn('OverflowError', fields['error'])
+
+    def test_failed_batch_does_not_block_later_entries(self):
+        self.add(1, 10 ** 20)
+        with self.assertLogs('movies.write_behind', 'ERROR'):
+            flush_ratings(batch_size=1, max_batches=1)
+        self.add(2, 100)
+        with override_settings(RATINGS_FLUSH_CLAIM_IDLE=60):
+            summary = flush_ratings(batch_size=1)
+        self.assertEqual(summary['inserted'], 1)
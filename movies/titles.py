@@ -0,0 +1,45 @@
+"""
+Helpers for MovieLens titles, which look like "Toy Story (1995)" or
+"Matrix, The (1999)".
+"""
+import re
+import unicodedata
+
+# Trailing "(1995)", also "(2007-)" / "(1994-1998)" for series
+YEAR_RE = re.compile(r'\((\d{4})(?:\s*[-–]\s*\d{0,4})?\)\s*$')
+
+
+def release_year(title):
+    """Release year from the end of a title, or None."""
+    match = YEAR_RE.search(title or '')
+    return int(match.group(1)) if match else None
+
+
+# "Matrix, The" / "Dolce Vita, La" / "Auberge espagnole, L'", optionally
+# followed by an alternate title in parentheses
+ARTICLE_RE = re.compile(
+    r"^(?P<base>.+?),\s+(?P<article>the|a|an|l'|la|le|les|il|lo|gli|die|der|das|el|los|las|un|une)"
+    r"(?P<rest>\s*\(.*\))?$",
+    re.IGNORECASE,
+)
+
+
+def normalize_title(title):
+    """
+    Sort/lookup form of a title: release year removed, a trailing article
+    moved to the front, whitespace collapsed and case folded, so
+    "Matrix, The (1999) " becomes "the matrix".
+    """
+    title = unicodedata.normalize('NFKC', YEAR_RE.sub('', title or ''))
+    title = ' '.join(title.split())
+    match = ARTICLE_RE.match(title)
+    if match:
+        article = match.group('article')
+        separator = '' if article.endswith("'") else ' '
+        title = f"{article}{separator}{match.group('base')}{match.group('rest') or ''}"
+    return title.casefold()
+
+
+def title_fields(title):
+    """The columns Movie derives from its title, for bulk writes that skip save()."""
+    return {'year': release_year(title), 'normalized_title': normalize_title(title)}
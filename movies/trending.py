@@ -0,0 +1,142 @@
+"""
+Trending movies: an exponentially decayed rating count per movie, kept in
+Redis.
+
+A rating at time t adds exp((t - epoch) / tau) to its movie's score in the
+`trending:scores` sorted set, with tau = TRENDING_HALF_LIFE_HOURS / ln 2.
+Because every score carries the same exp(-epoch / tau) factor, decaying all
+movies as time passes needs no work at all: ranking by the stored value is
+ranking by the decayed score. When the newest event gets far from the epoch
+the whole set is rebased (ZUNIONSTORE with WEIGHTS = exp(-shift / tau)) so
+the values stay in floating point range, and movies whose score has decayed
+to nothing are dropped.
+
+refresh_trending() (the refresh_trending Beat task) reads only the ratings
+past its (timestamp, id) checkpoint, sums their weights per movie in NumPy,
+and applies the increments and the new checkpoint in one MULTI. It then
+rewrites `trending:top`, the top TRENDING_TOP_K movies with their titles
+encoded in the member and their scores expressed as "ratings as of the
+refresh" (the current time, not the newest rating), so the API is a
+single ZREVRANGE with no SQL.
+"""
+import json
+import math
+import time
+import numpy as np
+from django.conf import settings
+from django.db.models import Max, Q
+from .models import Movie, Rating
+from .write_behind import get_redis_client
+
+SCORES_KEY = 'trending:scores'
+TOP_KEY = 'trending:top'
+STATE_KEY = 'trending:state'
+LOCK_KEY = 'trending:lock'
+LOAD_CHUNK_SIZE = 100000
+REBASE_AFTER = 200  # e-foldings between the epoch and the newest event (e^200 ~ 1e87)
+MIN_SCORE = 1e-3  # In ratings as of the checkpoint; lower scores are dropped on rebase
+
+
+def _tau():
+    return settings.TRENDING_HALF_LIFE_HOURS * 3600 / math.log(2)
+
+
+def _weights(rows, epoch, tau):
+    """(movie_ids, summed weights) of an array of (movie_id, timestamp) rows."""
+    movies, inverse = np.unique(rows[:, 0], return_inverse=True)
+    weights = np.exp((rows[:, 1] - epoch) / tau)
+    return movies, np.bincount(inverse.ravel(), weights=weights)
+
+
+def _new_ratings(state, marks, as_of):
+    """(movie_id, timestamp) of the ratings past the checkpoint, as a float64 array."""
+    # Bounded by the new checkpoint, so rows written meanwhile are left to the next run
+    ratings = Rating.objects.order_by().filter(id__lte=marks['id'], timestamp__lte=marks['ts'])
+    if state:
+        ratings = ratings.filter(Q(timestamp__gt=int(state['timestamp'])) | Q(id__gt=int(state['id'])))
+    else:
+        # First run: older ratings would contribute less than 2^-20 of a rating each
+        ratings = ratings.filter(timestamp__gte=as_of - 20 * settings.TRENDING_HALF_LIFE_HOURS * 3600)
+    chunks = []
+    rows = ratings.values_list('movie_id', 'timestamp')
+    chunk = []
+    for row in rows.iterator(chunk_size=LOAD_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) == LOAD_CHUNK_SIZE:
+            chunks.append(np.array(chunk, dtype=np.float64))
+            chunk = []
+    chunks.append(np.array(chunk, dtype=np.float64).reshape(-1, 2))
+    return np.concatenate(chunks)
+
+
+def _rewrite_top(client, epoch, as_of, tau):
+    top = client.zrevrange(SCORES_KEY, 0, settings.TRENDING_TOP_K - 1, withscores=True)
+    titles = dict(
+        Movie.objects.filter(movie_id__in=[int(m) for m, _ in top]).values_list('movie_id', 'title')
+    )
+    scale = math.exp((epoch - as_of) / tau)
+    members = {
+        json.dumps([int(m), titles.get(int(m), '')]): score * scale
+        for m, score in top
+    }
+    pipe = client.pipeline()
+    pipe.delete(TOP_KEY)
+    if members:
+        pipe.zadd(TOP_KEY, members)
+    pipe.execute()
+
+
+def refresh_trending(reset=False):
+    """
+    Fold the ratings past the checkpoint into the trending scores and
+    rewrite the top list. reset=True starts over from the newest ratings
+    (after a full import replaced the table). Returns a summary dict.
+    """
+    client = get_redis_client()
+    if not client.set(LOCK_KEY, 1, nx=True, ex=settings.TRENDING_LOCK_TIMEOUT):
+        return {'skipped': 'another refresh is running'}
+    try:
+        if reset:
+            client.delete(SCORES_KEY, TOP_KEY, STATE_KEY)
+        state = client.hgetall(STATE_KEY)
+        marks = Rating.objects.aggregate(ts=Max('timestamp'), id=Max('id'))
+        if marks['id'] is None:
+            return {'ratings': 0, 'movies': 0}
+        # Scores decay with the clock, not with the newest rating: without
+        # new ratings a movie keeps cooling down. Ratings timestamped ahead
+        # of the clock count as of their own time.
+        as_of = max(time.time(), float(marks['ts']))
+        rows = _new_ratings(state, marks, as_of)
+
+        tau = _tau()
+        epoch = float(state['epoch']) if state else float(marks['ts'])
+        pipe = client.pipeline()  # MULTI: increments and checkpoint land together
+        if (as_of - epoch) / tau > REBASE_AFTER:
+            pipe.zunionstore(SCORES_KEY, {SCORES_KEY: math.exp((epoch - as_of) / tau)})
+            pipe.zremrangebyscore(SCORES_KEY, '-inf', MIN_SCORE)
+            epoch = as_of
+        movies, weights = _weights(rows, epoch, tau) if len(rows) else ([], [])
+        for movie_id, weight in zip(movies, weights):
+            pipe.zincrby(SCORES_KEY, float(weight), int(movie_id))
+        pipe.hset(STATE_KEY, mapping={
+            'timestamp': max(marks['ts'], int(state.get('timestamp', 0))),
+            'id': marks['id'],
+            'epoch': epoch,
+        })
+        pipe.execute()
+
+        _rewrite_top(client, epoch, as_of, tau)
+        return {'ratings': len(rows), 'movies': len(movies), 'as_of': int(as_of)}
+    finally:
+        client.delete(LOCK_KEY)
+
+
+def trending(limit=20):
+    """Top movies by decayed score: one ZREVRANGE of the precomputed top list."""
+    client = get_redis_client()
+    rows = client.zrevrange(TOP_KEY, 0, limit - 1, withscores=True)
+    results = []
+    for member, score in rows:
+        movie_id, title = json.loads(member)
+        results.append({'movie_id': movie_id, 'title': title, 'score': round(score, 4)})
+    return results
@@ -4,6 +4,35 @@ from . import views
 urlpatterns = [
     # API Root - shows all available endpoints
     path("", views.api_root, name="api-root"),
+    # Movie catalog
+    path("movies/", views.movie_list, name="movie-list"),
+    path("movies/search/", views.movie_search, name="movie-search"),
+    path("movies/search/compare/", views.compare_search_methods, name="movie-search-compare"),
+    path("movies/by-genres/", views.movies_by_genres, name="movies-by-genres"),
+    path("movies/trending/", views.movie_trending, name="movie-trending"),
+    path("movies/<int:movie_id>/", views.movie_detail, name="movie-detail"),
+    path("movies/<int:movie_id>/ratings/", views.movie_ratings, name="movie-ratings"),
+    path("movies/<int:movie_id>/tags/", views.movie_tags, name="movie-tags"),
+    path("movies/<int:movie_id>/tag-cloud/", views.movie_tag_cloud, name="movie-tag-cloud"),
+    path("movies/<int:movie_id>/similar/", views.movie_similar, name="movie-similar"),
+    path("movies/<int:movie_id>/similar-genres/", views.movie_similar_genres, name="movie-similar-genres"),
+    # Rating distributions
+    path("movies/<int:movie_id>/ratings/distribution/", views.movie_rating_distribution, name="movie-rating-distribution"),
+    path("users/<int:user_id>/ratings/distribution/", views.user_rating_distribution, name="user-rating-distribution"),
+    path("genres/<str:genre>/ratings/distribution/", views.genre_rating_distribution, name="genre-rating-distribution"),
+    # Rollup dashboard
+    path("stats/rollups/", views.rating_rollups, name="rating-rollups"),
+    path("stats/activity/", views.rating_activity, name="rating-activity"),
+    # Rating ingestion
+    path("ratings/batch/", views.ratings_batch, name="ratings-batch"),
+    path("ratings/buffer/", views.ratings_buffer_stats, name="ratings-buffer"),
+    path("export/ratings/", views.export_ratings, name="export-ratings"),
+    path("export/tags/", views.export_tags, name="export-tags"),
+    # Per-user recommendations
+    path("users/<int:user_id>/recommendations/", views.user_recommendations, name="user-recommendations"),
+    # Tag search
+    path("tags/", views.tag_lookup, name="tag-lookup"),
+    path("tags/movies/", views.tag_movies, name="tag-movies"),
     # Optimization Endpoints
     path("movies/n-plus-one/", views.movies_n_plus_one, name="movies-n-plus-one"),
     path(
@@ -32,8 +61,12 @@ urlpatterns = [
     path("cache/manual/", views.cache_manual_example, name="cache-manual"),
     path("cache/per-view/", views.cache_per_view_example, name="cache-per-view"),
     path("cache/partial/", views.cache_partial_example, name="cache-partial"),
+    path("cache/stats/", views.cache_stats, name="cache-stats"),
     
     # Celery Background Tasks - Simple GET requests
     path("celery/task1/", views.test_heavy_task_1, name="celery-task1"),
     path("celery/task2/", views.test_heavy_task_2, name="celery-task2"),
+    path("celery/movie-stats/", views.movie_stats_job, name="celery-movie-stats"),
+    path("tasks/<str:task_id>/", views.task_status, name="task-status"),
+    path("tasks/<str:task_id>/events/", views.task_events, name="task-events"),
 ]
@@ -1,13 +1,22 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from django.db import connection, reset_queries
 from django.conf import settings
 from django.db.models import Q, F, Avg, Count
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition
 from .models import Movie, Rating, Tag, Link, Genre
+from .pagination import MovieCursorPagination, RecentFirstCursorPagination
+from .serializers import MovieListSerializer, MovieDetailSerializer, RatingSerializer, TagSerializer
+from .stats import rebuild_movie_stats
+from .cache_utils import writes_committed
+from .conditional import catalog_etag, movie_etag
 import cProfile
 import pstats
 import io
+import math
+import os
 from functools import wraps
 import time
 
@@ -57,6 +66,35 @@ def api_root(request, format=None):
                 "select-related-optimization": reverse("movies-select-related", request=request, format=format),
                 "prefetch-related-optimization": reverse("movies-prefetch-related", request=request, format=format),
             },
+            "catalog": {
+                "movie-list": reverse("movie-list", request=request, format=format),
+                "movie-detail": reverse("movie-detail", args=[1], request=request, format=format),
+                "title-search": reverse("movie-search", request=request, format=format) + "?q=star wars",
+                "title-search-benchmark": reverse("movie-search-compare", request=request, format=format) + "?q=star",
+            },
+            "tags": {
+                "tag-lookup": reverse("tag-lookup", request=request, format=format) + "?q=fun",
+                "movies-by-tags": reverse("tag-movies", request=request, format=format) + "?tags=funny,dark comedy&op=or",
+                "movie-tag-cloud": reverse("movie-tag-cloud", args=[1], request=request, format=format),
+            },
+            "ratings": {
+                "movie-distribution": reverse("movie-rating-distribution", args=[1], request=request, format=format),
+                "user-distribution": reverse("user-rating-distribution", args=[1], request=request, format=format),
+                "genre-distribution": reverse("genre-rating-distribution", args=["Comedy"], request=request, format=format),
+                "rollups": reverse("rating-rollups", request=request, format=format) + "?by=genre,release_year&genre=Comedy",
+                "activity": reverse("rating-activity", request=request, format=format) + "?bucket=month&from=2017-01-01&to=2017-12-31",
+                "ratings-batch": reverse("ratings-batch", request=request, format=format),
+                "write-behind-buffer": reverse("ratings-buffer", request=request, format=format),
+                "export-ratings": reverse("export-ratings", request=request) + "?format=csv&movie=1",
+                "export-tags": reverse("export-tags", request=request) + "?format=ndjson&gzip=1",
+            },
+            "recommendations": {
+                "similar-movies": reverse("movie-similar", args=[1], request=request, format=format),
+                "user-recommendations": reverse("user-recommendations", args=[1], request=request, format=format),
+                "similar-genres": reverse("movie-similar-genres", args=[1], request=request, format=format),
+                "trending": reverse("movie-trending", request=request, format=format),
+                "movies-by-genres": reverse("movies-by-genres", request=request, format=format) + "?all=Action,Comedy",
+            },
             "advanced_orm_features": {
                 "q-expression-filters": reverse("movies-q-filters", request=request, format=format),
                 "f-expression-update": reverse("movies-f-update", request=request, format=format),
@@ -70,10 +108,14 @@ def api_root(request, format=None):
                 "manual-cache": reverse("cache-manual", request=request, format=format),
                 "per-view-cache": reverse("cache-per-view", request=request, format=format),
                 "partial-cache": reverse("cache-partial", request=request, format=format),
+                "cache-stats": reverse("cache-stats", request=request, format=format),
             },
             "celery_background_tasks": {
                 "heavy-task-1": reverse("celery-task1", request=request, format=format) + " (5 sec)",
                 "heavy-task-2": reverse("celery-task2", request=request, format=format) + " (8 sec)",
+                "movie-stats-job": reverse("celery-movie-stats", request=request, format=format) + " (POST starts it)",
+                "task-status": reverse("api-root", request=request) + "tasks/<task_id>/?since=<version>&wait=25",
+                "task-events": reverse("api-root", request=request) + "tasks/<task_id>/events/ (Server-Sent Events)",
                 "flower-monitor": "http://localhost:5555",
             },
             "profiling_tools": {
@@ -84,6 +126,720 @@ def api_root(request, format=None):
     )
 
 
+def prefix_range(prefix):
+    """
+    Turn a prefix into a half-open [low, high) range, e.g. 'Toy' -> ('Toy', 'Toz').
+    Unlike LIKE 'Toy%' (which SQLite cannot serve from an index when Django adds
+    ESCAPE), a range comparison is answered by the B-tree index on the column.
+    """
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def year_range(params):
+    """
+    (year_from, year_to) release year bounds, either may be None, from
+    ?year=, ?year_from=, ?year_to= and ?decade= (1990 or 1990s).
+    Raises ValueError on a malformed value.
+    """
+    low = high = None
+    if params.get("year"):
+        low = high = int(params["year"])
+    if params.get("year_from"):
+        low = max(int(params["year_from"]), low or 0)
+    if params.get("year_to"):
+        high = min(int(params["year_to"]), high or 9999)
+    decade = params.get("decade")
+    if decade:
+        start = int(decade.removesuffix("s"))
+        if start % 10:
+            raise ValueError(decade)
+        low = max(start, low or 0)
+        high = min(start + 9, high or 9999)
+    return low, high
+
+
+# Movie catalog - keyset (cursor) pagination
+@condition(etag_func=catalog_etag)
+@api_view(["GET"])
+def movie_list(request):
+    """
+    Paginated movie catalog.
+    Query params:
+      - genre: genre name, e.g. ?genre=Comedy
+      - title: case-sensitive title prefix, e.g. ?title=Toy (uses movie_title_idx)
+      - year, year_from, year_to: release year or range, e.g. ?year_from=1990&year_to=1995
+      - decade: e.g. ?decade=1990s
+      - ordering: movie_id (default), year, -year or title (article-first,
+        case-insensitive); movies without a year are left out when sorting by year
+      - page_size: 1-100 (default 20)
+      - cursor: opaque cursor from the `next`/`previous` links
+    Costs 2 queries per page (movies + prefetched genres) however deep the page is;
+    year filters and orderings are answered by movie_year_idx.
+    """
+    movies = Movie.objects.prefetch_related("genres")
+
+    ordering = request.query_params.get("ordering", "movie_id")
+    if ordering not in MovieCursorPagination.ORDERINGS:
+        return Response(
+            {"error": f"ordering must be one of {', '.join(MovieCursorPagination.ORDERINGS)}"},
+            status=400,
+        )
+    try:
+        year_from, year_to = year_range(request.query_params)
+    except ValueError:
+        return Response({"error": "year filters take integers, decade takes e.g. 1990 or 1990s"}, status=400)
+
+    genre = request.query_params.get("genre")
+    if genre:
+        movies = movies.filter(genres__name=genre)
+
+    title = request.query_params.get("title")
+    if title:
+        low, high = prefix_range(title)
+        movies = movies.filter(title__gte=low, title__lt=high)
+
+    if year_from is not None:
+        movies = movies.filter(year__gte=year_from)
+    if year_to is not None:
+        movies = movies.filter(year__lte=year_to)
+    if ordering in ("year", "-year"):
+        movies = movies.filter(year__isnull=False)
+
+    paginator = MovieCursorPagination(ordering)
+    page = paginator.paginate_queryset(movies, request)
+    serializer = MovieListSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+# Full-text title search (SQLite FTS5)
+@condition(etag_func=catalog_etag)
+@api_view(["GET"])
+def movie_search(request):
+    """
+    Ranked, prefix-capable title search: ?q=star wa&limit=20
+    Every word is matched as a prefix; results are ordered by bm25 rank.
+    Also takes the movie list's year, year_from, year_to and decade filters,
+    and ordering=year or -year (then by rank).
+    """
+    from .search import search_titles
+
+    query = request.query_params.get("q", "").strip()
+    try:
+        limit = min(max(int(request.query_params.get("limit", 20)), 1), 100)
+    except ValueError:
+        limit = 20
+    ordering = request.query_params.get("ordering", "rank")
+    if ordering not in ("rank", "year", "-year"):
+        return Response({"error": "ordering must be rank, year or -year"}, status=400)
+    try:
+        year_from, year_to = year_range(request.query_params)
+    except ValueError:
+        return Response({"error": "year filters take integers, decade takes e.g. 1990 or 1990s"}, status=400)
+
+    results = search_titles(query, limit, year_from=year_from, year_to=year_to, ordering=ordering)
+    return Response({
+        "query": query,
+        "count": len(results),
+        "results": [
+            {"movie_id": movie_id, "title": title, "year": year, "rank": round(rank, 4)}
+            for movie_id, title, year, rank in results
+        ],
+    })
+
+
+# Trending movies - precomputed top list in Redis
+@api_view(["GET"])
+def movie_trending(request):
+    """
+    Movies with the highest time-decayed rating counts: ?limit=20 (up to
+    TRENDING_TOP_K). score is the number of ratings as of the last refresh,
+    each weighted down by half every TRENDING_HALF_LIFE_HOURS. Served by one
+    ZREVRANGE, no database query.
+    """
+    from redis import RedisError
+    from .trending import trending
+
+    try:
+        limit = min(max(int(request.query_params.get("limit", 20)), 1), settings.TRENDING_TOP_K)
+    except ValueError:
+        limit = 20
+    try:
+        results = trending(limit)
+    except RedisError as exc:
+        return Response({"error": f"Redis unavailable: {exc}"}, status=503)
+    return Response({
+        "method": "Redis sorted set (ZREVRANGE)",
+        "half_life_hours": settings.TRENDING_HALF_LIFE_HOURS,
+        "count": len(results),
+        "results": results,
+    })
+
+
+# Search Performance Comparison
+@api_view(["GET"])
+def compare_search_methods(request):
+    """
+    Compare title__icontains (full table scan) with the FTS5 index
+    on the full catalog: ?q=star&runs=5
+    """
+    from .search import search_titles
+
+    query = request.query_params.get("q", "star").strip() or "star"
+    try:
+        runs = min(max(int(request.query_params.get("runs", 5)), 1), 50)
+    except ValueError:
+        runs = 5
+
+    def best_of(fn):
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        return min(timings), result
+
+    # Whole result set in both cases, so the comparison isn't skewed by LIMIT
+    time_icontains, icontains_results = best_of(
+        lambda: list(Movie.objects.filter(title__icontains=query).values_list("movie_id", flat=True))
+    )
+    catalog_size = Movie.objects.count() or 1
+    time_fts, fts_results = best_of(lambda: search_titles(query, limit=catalog_size))
+
+    return Response({
+        "method": "Title Search Comparison",
+        "query": query,
+        "runs": runs,
+        "icontains": {
+            "time_ms": round(time_icontains, 2),
+            "results_count": len(icontains_results),
+            "note": "LIKE '%q%' - scans every title",
+        },
+        "fts5": {
+            "time_ms": round(time_fts, 2),
+            "results_count": len(fts_results),
+            "note": "word-prefix match on the inverted index, ranked by bm25",
+        },
+        "speedup": round(time_icontains / time_fts, 2) if time_fts > 0 else "N/A",
+    })
+
+
+# Item-item recommendations - served from the precomputed similarity store
+@api_view(["GET"])
+def movie_similar(request, movie_id):
+    """
+    Movies most similar to this one (adjusted cosine over user ratings): ?limit=10
+    Neighbours are computed offline by the build_item_similarities task.
+    """
+    from .similarity import similar_movies
+
+    try:
+        limit = min(max(int(request.query_params.get("limit", 10)), 1), settings.SIMILAR_MOVIES_TOP_K)
+    except ValueError:
+        limit = 10
+
+    neighbours = similar_movies(movie_id, limit)
+    if neighbours is None:
+        return Response(
+            {"error": "Similarity table not built yet, run the build_item_similarities task"},
+            status=503,
+        )
+    titles = dict(
+        Movie.objects.filter(movie_id__in=[m for m, _ in neighbours]).values_list("movie_id", "title")
+    )
+    return Response({
+        "movie_id": movie_id,
+        "results": [
+            {"movie_id": m, "title": titles.get(m), "similarity": round(score, 4)}
+            for m, score in neighbours
+        ],
+    })
+
+
+# Per-user recommendations - matrix factorization model, memory-mapped
+@api_view(["GET"])
+def user_recommendations(request, user_id):
+    """
+    Top-N movies the user hasn't rated yet, scored by the ALS model: ?limit=10
+    The model is trained offline by the train_recommender task.
+    """
+    from .factorization import recommend_for_user
+
+    try:
+        limit = min(max(int(request.query_params.get("limit", 10)), 1), 100)
+    except ValueError:
+        limit = 10
+
+    start = time.perf_counter()
+    recommendations = recommend_for_user(user_id, limit)
+    scoring_ms = (time.perf_counter() - start) * 1000
+    if recommendations is None:
+        return Response(
+            {"error": "Recommender not trained yet, run the train_recommender task"},
+            status=503,
+        )
+    if not recommendations:
+        return Response({"error": f"No model factors for user {user_id}"}, status=404)
+
+    titles = dict(
+        Movie.objects.filter(movie_id__in=[m for m, _ in recommendations]).values_list("movie_id", "title")
+    )
+    return Response({
+        "user_id": user_id,
+        "scoring_ms": round(scoring_ms, 2),
+        "results": [
+            {"movie_id": m, "title": titles.get(m), "score": round(score, 4)}
+            for m, score in recommendations
+        ],
+    })
+
+
+# Genre similarity and filters - packed genre bitsets held in memory
+@api_view(["GET"])
+def movie_similar_genres(request, movie_id):
+    """
+    Movies whose genre sets are closest to this one's (Jaccard): ?limit=20
+    Ties are broken by number of ratings.
+    """
+    from .genre_index import genres_of, similar_by_genres
+
+    try:
+        limit = min(max(int(request.query_params.get("limit", 20)), 1), 100)
+    except ValueError:
+        limit = 20
+
+    start = time.perf_counter()
+    neighbours = similar_by_genres(movie_id, limit)
+    scoring_ms = (time.perf_counter() - start) * 1000
+    if neighbours is None:
+        return Response({"error": f"Movie {movie_id} not found"}, status=404)
+
+    movies = Movie.objects.filter(movie_id__in=[m for m, _ in neighbours]).prefetch_related("genres")
+    by_id = {movie.movie_id: movie for movie in movies}
+    return Response({
+        "movie_id": movie_id,
+        "scoring_ms": round(scoring_ms, 2),
+        "results": [
+            {
+                "movie_id": m,
+                "title": by_id[m].title,
+                "genres": [g.name for g in by_id[m].genres.all()],
+                "jaccard": round(score, 4),
+            }
+            for m, score in neighbours
+            if m in by_id
+        ],
+    })
+
+
+@api_view(["GET"])
+def movies_by_genres(request):
+    """
+    Movies having all (?all=Action,Comedy) or any (?any=Action,Comedy) of
+    the given genres, most rated first: &limit=50&offset=0
+    """
+    from .genre_index import genre_mask, movies_with_genres
+
+    match = "all" if "all" in request.query_params else "any"
+    names = [n for n in request.query_params.get(match, "").split(",") if n.strip()]
+    if not names:
+        return Response({"error": "Pass ?all=<genres> or ?any=<genres>"}, status=400)
+    try:
+        mask = genre_mask(names)
+    except KeyError as exc:
+        return Response({"error": f"Unknown genre {exc}"}, status=400)
+    try:
+        limit = min(max(int(request.query_params.get("limit", 50)), 1), 100)
+        offset = max(int(request.query_params.get("offset", 0)), 0)
+    except ValueError:
+        limit, offset = 50, 0
+
+    start = time.perf_counter()
+    total, movie_ids = movies_with_genres(mask, match, limit, offset)
+    filter_ms = (time.perf_counter() - start) * 1000
+
+    titles = dict(Movie.objects.filter(movie_id__in=movie_ids).values_list("movie_id", "title"))
+    return Response({
+        "match": match,
+        "genres": names,
+        "count": total,
+        "filter_ms": round(filter_ms, 2),
+        "results": [{"movie_id": m, "title": titles.get(m)} for m in movie_ids],
+    })
+
+
+# Tag search - backed by the TagTerm/TagPosting inverted index
+@api_view(["GET"])
+def tag_lookup(request):
+    """
+    Tag vocabulary lookup: ?q=<prefix>&limit=20
+    Terms are case-folded; results are ordered by how many movies use them.
+    """
+    from .tag_index import normalize_tag
+    from .models import TagTerm
+
+    prefix = normalize_tag(request.query_params.get("q", ""))
+    try:
+        limit = min(max(int(request.query_params.get("limit", 20)), 1), 100)
+    except ValueError:
+        limit = 20
+
+    terms = TagTerm.objects.all()
+    if prefix:
+        low, high = prefix_range(prefix)
+        terms = terms.filter(term__gte=low, term__lt=high)
+    terms = terms.order_by("-movies_count", "term").values("term", "movies_count", "uses_count")[:limit]
+
+    return Response({"query": prefix, "results": list(terms)})
+
+
+@api_view(["GET"])
+def tag_movies(request):
+    """
+    Movies tagged with all (op=and, default) or any (op=or) of the given tags:
+    ?tags=funny,dark comedy&op=and&limit=50
+    """
+    from .tag_index import movies_for_terms
+
+    tags = [t for t in request.query_params.get("tags", "").split(",") if t.strip()]
+    op = request.query_params.get("op", "and").lower()
+    if op not in ("and", "or"):
+        return Response({"error": "op must be 'and' or 'or'"}, status=400)
+    try:
+        limit = min(max(int(request.query_params.get("limit", 50)), 1), 500)
+    except ValueError:
+        limit = 50
+
+    matches = movies_for_terms(tags, op=op, limit=limit)
+    titles = dict(
+        Movie.objects.filter(movie_id__in=[m["movie_id"] for m in matches]).values_list("movie_id", "title")
+    )
+    return Response({
+        "tags": tags,
+        "op": op,
+        "count": len(matches),
+        "results": [
+            {
+                "movie_id": m["movie_id"],
+                "title": titles.get(m["movie_id"]),
+                "matched_tags": m["matched"],
+                "score": m["score"],
+            }
+            for m in matches
+        ],
+    })
+
+
+@condition(etag_func=movie_etag)
+@api_view(["GET"])
+def movie_tag_cloud(request, movie_id):
+    """
+    Top tags of a movie with their weights: ?limit=30
+    """
+    from .tag_index import tag_cloud
+
+    try:
+        limit = min(max(int(request.query_params.get("limit", 30)), 1), 200)
+    except ValueError:
+        limit = 30
+
+    cloud = tag_cloud(movie_id, limit)
+    return Response({
+        "movie_id": movie_id,
+        "tags": [
+            {"tag": t["term__term"], "count": t["count"], "movies_with_tag": t["term__movies_count"]}
+            for t in cloud
+        ],
+    })
+
+
+# Movie detail - aggregates from MovieStats, newest ratings/tags by cursor
+@condition(etag_func=movie_etag)
+@api_view(["GET"])
+def movie_detail(request, movie_id):
+    """
+    Movie detail with precomputed aggregates and the most recent
+    ratings and tags (?recent=N, default 10, max 100).
+    The `next` links continue on /movies/<id>/ratings/ and /movies/<id>/tags/.
+    Query count is constant (movie+links+stats, genres, one page each of
+    ratings and tags), no matter how many ratings the movie has.
+    """
+    movie = get_object_or_404(
+        Movie.objects.select_related("links", "stats").prefetch_related("genres"),
+        movie_id=movie_id,
+    )
+    try:
+        recent = min(max(int(request.query_params.get("recent", 10)), 1), 100)
+    except ValueError:
+        recent = 10
+
+    data = MovieDetailSerializer(movie).data
+    for name, model, serializer_class, url_name in (
+        ("ratings", Rating, RatingSerializer, "movie-ratings"),
+        ("tags", Tag, TagSerializer, "movie-tags"),
+    ):
+        paginator = RecentFirstCursorPagination()
+        page = paginator.paginate_embedded(
+            model.objects.filter(movie_id=movie_id),
+            request,
+            base_url=reverse(url_name, args=[movie_id], request=request),
+            page_size=recent,
+        )
+        data[name] = {
+            "next": paginator.get_next_link(),
+            "results": serializer_class(page, many=True).data,
+        }
+    return Response(data)
+
+
+@condition(etag_func=movie_etag)
+@api_view(["GET"])
+def movie_ratings(request, movie_id):
+    """
+    Ratings of a movie, newest first, keyset-paginated on timestamp.
+    """
+    paginator = RecentFirstCursorPagination()
+    page = paginator.paginate_queryset(Rating.objects.filter(movie_id=movie_id), request)
+    return paginator.get_paginated_response(RatingSerializer(page, many=True).data)
+
+
+@condition(etag_func=movie_etag)
+@api_view(["GET"])
+def movie_tags(request, movie_id):
+    """
+    Tags of a movie, newest first, keyset-paginated on timestamp.
+    """
+    paginator = RecentFirstCursorPagination()
+    page = paginator.paginate_queryset(Tag.objects.filter(movie_id=movie_id), request)
+    return paginator.get_paginated_response(TagSerializer(page, many=True).data)
+
+
+# Rating distributions - one grouped query per scope, cached per scope
+def _distribution_response(scope, key, distribution):
+    (result, outcome) = distribution
+    return Response({"scope": scope, scope: key, **result, "cache_status": outcome.upper()})
+
+
+@api_view(["GET"])
+def movie_rating_distribution(request, movie_id):
+    """Half-star histogram, mean, median and std of a movie's ratings (from MovieStats)."""
+    from .distributions import movie_distribution
+
+    get_object_or_404(Movie.objects.only("movie_id"), movie_id=movie_id)
+    return _distribution_response("movie", movie_id, movie_distribution(movie_id))
+
+
+@api_view(["GET"])
+def user_rating_distribution(request, user_id):
+    """Half-star histogram, mean, median and std of one user's ratings."""
+    from .distributions import user_distribution
+
+    return _distribution_response("user", user_id, user_distribution(user_id))
+
+
+@api_view(["GET"])
+def genre_rating_distribution(request, genre):
+    """
+    Half-star histogram, mean, median and std of every rating of the genre's
+    movies, summed from MovieStats (one row per movie, not per rating).
+    """
+    from .distributions import genre_distribution
+
+    genre_obj = get_object_or_404(Genre, name__iexact=genre)
+    return _distribution_response("genre", genre_obj.name, genre_distribution(genre_obj))
+
+
+# Rollup dashboard - reads RatingRollup rows, never the ratings table
+@api_view(["GET"])
+def rating_rollups(request):
+    """
+    Rating count, average and distinct users from the genre x release year x
+    rating month rollups.
+    Query params:
+      - by: comma-separated grouping, any of genre, release_year, month (default genre)
+      - genre, year, year_from, year_to: filters
+      - from, to: rating month range as YYYY-MM
+    distinct_users is exact only for by=genre,release_year,month; coarser
+    groupings report distinct_users_upper_bound (a user is counted once per cell).
+    Every rating is in one cell per genre of its movie, so results must be
+    grouped or filtered by genre.
+    """
+    from datetime import date
+    from .models import RollupState
+    from .rollups import STATE_NAME, rollup_totals
+
+    group_by = [f for f in request.query_params.get("by", "genre").split(",") if f]
+    if not group_by or not set(group_by) <= {"genre", "release_year", "month"}:
+        return Response({"error": "by must be a list of genre, release_year, month"}, status=400)
+
+    filters = {}
+    params = request.query_params
+    try:
+        if params.get("genre"):
+            filters["genre__name__iexact"] = params["genre"]
+        if params.get("year"):
+            filters["release_year"] = int(params["year"])
+        if params.get("year_from"):
+            filters["release_year__gte"] = int(params["year_from"])
+        if params.get("year_to"):
+            filters["release_year__lte"] = int(params["year_to"])
+        if params.get("from"):
+            filters["month__gte"] = date(*map(int, params["from"].split("-")[:2]), 1)
+        if params.get("to"):
+            filters["month__lte"] = date(*map(int, params["to"].split("-")[:2]), 1)
+    except (TypeError, ValueError):
+        return Response({"error": "year filters take integers, from/to take YYYY-MM"}, status=400)
+    if "genre" not in group_by and "genre__name__iexact" not in filters:
+        return Response(
+            {"error": "Group by genre or filter on ?genre=, ratings are counted once per genre"},
+            status=400,
+        )
+
+    reset_queries()
+    exact = len(set(group_by)) == 3
+    rows = []
+    for row in rollup_totals(group_by, **filters):
+        entry = {field: row[{"genre": "genre__name"}.get(field, field)] for field in group_by}
+        if "month" in entry:
+            entry["month"] = entry["month"].strftime("%Y-%m")
+        entry["ratings"] = row["ratings"]
+        entry["average"] = round(row["total"] / row["ratings"], 4) if row["ratings"] else None
+        entry["distinct_users" if exact else "distinct_users_upper_bound"] = row["users"]
+        rows.append(entry)
+    state = RollupState.objects.filter(name=STATE_NAME).first()
+
+    return Response({
+        "method": "Rollup table (RatingRollup)",
+        "group_by": group_by,
+        "refreshed_at": state.refreshed_at if state else None,
+        "count": len(rows),
+        "results": rows,
+        "queries_count": len(connection.queries),
+    })
+
+
+# Rating activity over time - range scan on rating_ts_idx
+@api_view(["GET"])
+def rating_activity(request):
+    """
+    Rating count and average per day or month.
+    Query params:
+      - from, to: UTC dates as YYYY-MM-DD, inclusive (default: the 30 days
+        up to the newest rating)
+      - bucket: day (default) or month
+      - movie: movie id, or genre: genre name, to narrow the ratings
+    Reads only the index entries of the range, so the cost follows the range
+    queried, not the size of the ratings table.
+    """
+    from datetime import date
+    from .activity import BUCKETS, default_range, rating_activity as activity_series
+
+    params = request.query_params
+    bucket = params.get("bucket", "day")
+    if bucket not in BUCKETS:
+        return Response({"error": "bucket must be day or month"}, status=400)
+    try:
+        movie_id = int(params["movie"]) if params.get("movie") else None
+        start = date.fromisoformat(params["from"]) if params.get("from") else None
+        end = date.fromisoformat(params["to"]) if params.get("to") else None
+    except ValueError:
+        return Response({"error": "from/to take YYYY-MM-DD, movie takes an id"}, status=400)
+    genre_id = None
+    if params.get("genre"):
+        genre_id = get_object_or_404(Genre, name__iexact=params["genre"]).id
+
+    reset_queries()
+    if start is None or end is None:
+        default = default_range()
+        if default is None:
+            return Response({"bucket": bucket, "count": 0, "results": []})
+        start = start or (end - (default[1] - default[0]) if end else default[0])
+        end = end or default[1]
+    if start > end:
+        return Response({"error": "from must not be after to"}, status=400)
+
+    series, outcome = activity_series(start, end, bucket, movie_id=movie_id, genre_id=genre_id)
+    return Response({
+        "method": "Bucketed GROUP BY over a timestamp index range",
+        "from": start,
+        "to": end,
+        "bucket": bucket,
+        "movie": movie_id,
+        "genre": params.get("genre"),
+        "cache": outcome,
+        "count": len(series),
+        "results": series,
+        "queries_count": len(connection.queries),
+    })
+
+
+# Rating ingestion - validated in memory, upserted with one statement per chunk
+@api_view(["POST"])
+def ratings_batch(request):
+    """
+    Bulk-submit ratings: a JSON list (or {"ratings": [...]}) of
+    {user_id, movie_id, rating, timestamp} records. An existing rating of the
+    same user and movie is updated. Invalid records are skipped and reported
+    by index in "errors"; the rest of the batch is still written.
+    ?write_behind=1 only queues the valid records in Redis (202) for the
+    flush_rating_buffer task, falling back to a direct write if Redis is down.
+    """
+    from .ingest import validate_ratings, write_ratings
+
+    records = request.data.get("ratings") if isinstance(request.data, dict) else request.data
+    if not isinstance(records, list):
+        return Response({"error": "Expected a list of rating records"}, status=400)
+    if len(records) > settings.RATINGS_BATCH_MAX_RECORDS:
+        return Response(
+            {"error": f"At most {settings.RATINGS_BATCH_MAX_RECORDS} records per batch"},
+            status=413,
+        )
+    write_behind = request.query_params.get("write_behind")
+    write_behind = settings.RATINGS_WRITE_BEHIND if write_behind is None else write_behind in ("1", "true")
+
+    reset_queries()
+    start = time.perf_counter()
+    valid, errors = validate_ratings(records)
+    result = {"received": len(records), "rejected": len(errors), "errors": errors}
+    status = 200
+    mode = "synchronous"
+    if write_behind:
+        from redis import RedisError
+        from .write_behind import enqueue_ratings
+
+        try:
+            result["queued"] = enqueue_ratings(valid)
+            mode, status = "write-behind", 202
+        except RedisError as exc:
+            # Redis is down: keep accepting ratings, just pay the database write now
+            mode = f"synchronous (write-behind unavailable: {exc.__class__.__name__})"
+    if status == 200:
+        result.update(write_ratings(valid, chunk_size=settings.RATINGS_BATCH_CHUNK_SIZE))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    return Response({
+        "method": "Batched upsert (bulk_create with update_conflicts)",
+        "mode": mode,
+        **result,
+        "elapsed_ms": round(elapsed_ms, 2),
+        "queries_count": len(connection.queries),
+    }, status=status)
+
+
+@api_view(["GET"])
+def ratings_buffer_stats(request):
+    """
+    Lag of the write-behind rating buffer: entries not yet flushed to the
+    database, entries delivered but not acknowledged, age of the oldest one.
+    """
+    from redis import RedisError
+    from .write_behind import buffer_metrics
+
+    try:
+        return Response(buffer_metrics())
+    except RedisError as exc:
+        return Response({"error": f"Redis unavailable: {exc}"}, status=503)
+
+
 # N+1 Query Problem
 # this is results from monitoring:
 # Avg. Time 342ms
@@ -277,6 +1033,11 @@ def update_with_f_expression(request):
         rating=F('rating') * 1.0  # Keep same rating (demo purpose)
     )
     
+    # .update() bypasses signals, so refresh the derived per-movie stats
+    # and invalidate cached rating data explicitly
+    rebuild_movie_stats(Rating.objects.filter(user_id=1).values_list('movie_id', flat=True))
+    writes_committed(Rating, movie_ids=None)
+    
     queries_count = len(connection.queries)
     
     return Response({
@@ -402,7 +1163,9 @@ def movies_as_tuples(request):
 def compare_indexed_vs_non_indexed(request):
     """
     Compare query performance on indexed vs non-indexed columns.
-    Rating.user_id is indexed, Rating.timestamp is not.
+    Rating.user_id is indexed; the timestamp query filters on timestamp + 0,
+    an expression rating_ts_idx can't serve, so it scans the table as an
+    unindexed column would.
     """
     reset_queries()
     
@@ -414,9 +1177,10 @@ def compare_indexed_vs_non_indexed(request):
     
     queries_after_indexed = len(connection.queries)
     
-    # Query on NON-INDEXED field (timestamp)
+    # Query on NON-INDEXED expression (timestamp + 0)
+    unindexed = Rating.objects.alias(ts_unindexed=F("timestamp") + 0)
     start_non_indexed = time.time()
-    non_indexed_results = Rating.objects.filter(timestamp__gt=1000000000)[:100]
+    non_indexed_results = unindexed.filter(ts_unindexed__gt=1000000000)[:100]
     list(non_indexed_results)  # Force evaluation
     time_non_indexed = (time.time() - start_non_indexed) * 1000
     
@@ -431,10 +1195,10 @@ def compare_indexed_vs_non_indexed(request):
             "results_count": len(list(Rating.objects.filter(user_id=1)[:100]))
         },
         "non_indexed_field": {
-            "field": "timestamp",
+            "field": "timestamp + 0",
             "has_index": False,
             "time_ms": round(time_non_indexed, 2),
-            "results_count": len(list(Rating.objects.filter(timestamp__gt=1000000000)[:100]))
+            "results_count": len(list(unindexed.filter(ts_unindexed__gt=1000000000)[:100]))
         },
         "performance_difference": {
             "speedup": round(time_non_indexed / time_indexed, 2) if time_indexed > 0 else "N/A",
@@ -450,6 +1214,10 @@ def compare_indexed_vs_non_indexed(request):
 from django.core.cache import cache
 from django.views.decorators.cache import cache_page
 from datetime import datetime
+from .cache_utils import cache_stats as two_tier_cache_stats, fetch, generational_key, model_scope
+
+# Generational keys are invalidated on write, so TTLs only bound memory use
+CACHE_LONG_TTL = 60 * 60 * 6
 
 
 # the first request not hit the cache so the time is high 
@@ -462,36 +1230,26 @@ def cache_manual_example(request):
     """
     Low-Level Manual Caching - Full control over what and when to cache
     """
-    cache_key = 'manual_movies_list'
-    
-    # Try to get from cache first
-    cached_data = cache.get(cache_key)
+    # The key embeds the Movie generation, so any movie write invalidates it
+    cache_key = generational_key('manual_movies_list', model_scope(Movie))
     
-    if cached_data:
-        return Response({
-            'method': 'Low-Level Manual Cache',
-            'cache_status': 'HIT - Data from cache',
-            'cached_at': cached_data['timestamp'],
-            'data': cached_data['movies']
-        })
-    
-    # Cache miss - fetch from database
-    movies = Movie.objects.all()[:5]
-    movies_data = [{'id': m.movie_id, 'title': m.title} for m in movies]
-    
-    # Store in cache for 5 minutes (300 seconds)
-    cache_data = {
-        'timestamp': datetime.now().isoformat(),
-        'movies': movies_data
-    }
-    cache.set(cache_key, cache_data, timeout=300)
+    def load():
+        movies = Movie.objects.all()[:5]
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'movies': [{'id': m.movie_id, 'title': m.title} for m in movies],
+        }
+
+    # Local LRU -> Redis -> database, one worker recomputes on a miss
+    cached_data, outcome = fetch(cache_key, load, ttl=CACHE_LONG_TTL)
     
     return Response({
         'method': 'Low-Level Manual Cache',
-        'cache_status': 'MISS - Data from database',
-        'cached_at': cache_data['timestamp'],
-        'data': movies_data,
-        'note': 'Next request will be cached for 5 minutes'
+        'cache_status': outcome.upper(),
+        'cached_at': cached_data['timestamp'],
+        'data': cached_data['movies'],
+        'cache_key': cache_key,
+        'note': 'Cached for 6 hours; writes to movies change the key, so it is never stale'
     })
 
 
@@ -522,21 +1280,19 @@ def cache_partial_example(request):
     Partial/Fragment Caching - Cache only parts of the response
     """
     # Cache only the expensive query
-    cache_key = 'expensive_query_result'
-    expensive_data = cache.get(cache_key)
-    
-    if not expensive_data:
-        # Simulate expensive operation
-        expensive_data = Movie.objects.select_related('links').prefetch_related('genres')[:10]
-        expensive_data = [{
+    def expensive_query():
+        movies = Movie.objects.select_related('links').prefetch_related('genres')[:10]
+        return [{
             'id': m.movie_id,
             'title': m.title,
             'genres': [g.name for g in m.genres.all()]
-        } for m in expensive_data]
-        cache.set(cache_key, expensive_data, timeout=180) 
-        cache_status = 'MISS'
-    else:
-        cache_status = 'HIT'
+        } for m in movies]
+
+    cache_key = generational_key(
+        'expensive_query_result', model_scope(Movie), model_scope(Genre), model_scope(Link)
+    )
+    expensive_data, outcome = fetch(cache_key, expensive_query, ttl=CACHE_LONG_TTL)
+    cache_status = outcome.upper()
     
     current_time = datetime.now().isoformat()
     
@@ -549,49 +1305,206 @@ def cache_partial_example(request):
     })
 
 
+# 4. CACHE STATISTICS
+@api_view(['GET'])
+def cache_stats(request):
+    """
+    Hit/miss counters of the two-tier cache in this worker process: ?reset=1 clears them
+    """
+    from .cache_utils import reset_cache_stats
+
+    stats = two_tier_cache_stats()
+    if request.query_params.get('reset'):
+        reset_cache_stats()
+    return Response({
+        'method': 'Two-Tier Cache Statistics',
+        'pid': os.getpid(),
+        **stats,
+        'note': 'Counters are per process; each worker keeps its own'
+    })
+
+
 # Celery Background Tasks - Simple GET endpoints
 
 @api_view(['GET'])
 def test_heavy_task_1(request):
     """
     Heavy Task 1: Calculate movie statistics (takes 5 seconds)
+    Identical requests share one task until the movie's ratings change.
     """
+    from .cache_utils import movie_scopes
+    from .task_dedup import CACHED, submit_once
     from .tasks import calculate_movie_stats
     
     movie_id = 1  
     
-    # Run task in background
-    task = calculate_movie_stats.delay(movie_id)
+    # Run task in background, or reuse the queued/running/finished one
+    task, dedup = submit_once(calculate_movie_stats, [movie_id], scopes=movie_scopes(movie_id))
     
-    return Response({
+    response = {
         'task': 'Movie Statistics Calculation',
         'duration': '5 seconds',
         'task_id': task.id,
         'movie_id': movie_id,
+        'dedup': dedup,
         'status': 'Task started in background',
+        'status_url': reverse('task-status', args=[task.id], request=request),
+        'events_url': reverse('task-events', args=[task.id], request=request),
         'monitor': 'Check Flower at http://localhost:5555',
         'note': 'Task is running in background. Response returned immediately!'
-    })
+    }
+    if dedup == CACHED:
+        response.update(status='Result of an identical finished task', result=task.result)
+    return Response(response)
 
 
 @api_view(['GET'])
 def test_heavy_task_2(request):
     """
     Heavy Task 2: Bulk ratings processing (takes 8 seconds)
+    Identical requests share one task until ratings change.
     """
+    from .cache_utils import model_scope
+    from .task_dedup import CACHED, submit_once
     from .tasks import process_bulk_ratings
     
     user_id = 1  
     
-    # Run task in background
-    task = process_bulk_ratings.delay(user_id)
+    # Run task in background, or reuse the queued/running/finished one; the
+    # task reads the live ratings table, so a finished result holds until a
+    # rating write bumps the Rating generation
+    task, dedup = submit_once(process_bulk_ratings, [user_id], scopes=[model_scope(Rating)])
     
-    return Response({
+    response = {
         'task': 'Bulk Ratings Processing',
         'duration': '8 seconds',
         'task_id': task.id,
         'user_id': user_id,
+        'dedup': dedup,
         'status': 'Task started in background',
+        'status_url': reverse('task-status', args=[task.id], request=request),
+        'events_url': reverse('task-events', args=[task.id], request=request),
         'monitor': 'Check Flower at http://localhost:5555',
         'note': 'Task is running in background. Response returned immediately!'
-    })
+    }
+    if dedup == CACHED:
+        response.update(status='Result of an identical finished task', result=task.result)
+    return Response(response)
+
+
+@api_view(['GET', 'POST'])
+def movie_stats_job(request):
+    """
+    Fan-out recomputation of MovieStats for the whole catalog.
+    POST starts a job (?chunk_size= movies per task): a Celery chord of one
+    task per movie-id chunk, run in parallel on all worker processes.
+    GET reports the last job (or ?job_id=): chunks done out of total, then
+    totals and timing once the chord callback has run.
+    """
+    from django.core.cache import cache
+    from .tasks import MOVIE_STATS_JOB_KEY, start_movie_stats_job
+
+    if request.method == 'POST':
+        try:
+            chunk_size = int(request.query_params.get('chunk_size', settings.MOVIE_STATS_CHUNK_SIZE))
+            if chunk_size < 1:
+                raise ValueError
+        except ValueError:
+            return Response({'error': 'chunk_size must be a positive integer'}, status=400)
+        job = start_movie_stats_job(chunk_size)
+        return Response({
+            **job,
+            'status': 'Chunks dispatched to the workers',
+            'monitor': 'Check Flower at http://localhost:5555',
+        }, status=202)
+
+    job_id = request.query_params.get('job_id') or cache.get(MOVIE_STATS_JOB_KEY.format('last'))
+    key = MOVIE_STATS_JOB_KEY.format(job_id)
+    values = cache.get_many([key, key + ':done'])
+    job, done = values.get(key), values.get(key + ':done')
+    if job is None:
+        return Response({'error': 'No such job'}, status=404)
+    return Response({**job, 'chunks_done': done or 0})
+
+
+# Task status - one result-backend read per lookup, no database access
+@api_view(['GET'])
+@authentication_classes([])  # No session/user lookup: this endpoint is polled
+@permission_classes([])
+def task_status(request, task_id):
+    """
+    State of a Celery task: PENDING, STARTED, PROGRESS (with percent and the
+    task's partial result), SUCCESS (with the result) or FAILURE.
+    Long poll: pass the `version` of the last response as ?since= and
+    ?wait=<seconds> (up to TASK_STATUS_MAX_WAIT); the response comes as soon
+    as the status changes or the task finishes.
+    Unknown task ids report PENDING, as Celery can't tell them apart.
+    """
+    from .task_status import wait_for_change
+
+    try:
+        wait = float(request.query_params.get('wait', 0))
+    except ValueError:
+        wait = math.nan
+    # nan would make the deadline unreachable (every comparison is False)
+    if not math.isfinite(wait):
+        return Response({'error': 'wait takes seconds'}, status=400)
+    wait = min(max(wait, 0.0), settings.TASK_STATUS_MAX_WAIT)
+    return Response(wait_for_change(task_id, since=request.query_params.get('since'), timeout=wait))
+
+
+def task_events(request, task_id):
+    """
+    Server-Sent Events stream of a task's status: a `status` event per change,
+    `done` when it finishes. Plain Django view: the body is a stream, not a
+    DRF Response.
+    """
+    from django.http import StreamingHttpResponse
+    from .task_status import task_events as events
+
+    response = StreamingHttpResponse(events(task_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let a proxy buffer the events
+    return response
+
+
+# Streaming export - constant memory, rows are encoded as they are read
+def _export(request, kind):
+    from django.http import JsonResponse, StreamingHttpResponse
+    from .export import FORMATS, parse_time, stream_export
+
+    params = request.GET
+    fmt = params.get("format", "csv")
+    if fmt not in FORMATS:
+        return JsonResponse({"error": f"format must be one of {', '.join(FORMATS)}"}, status=400)
+    try:
+        filters = {
+            "movie_id": int(params["movie"]) if params.get("movie") else None,
+            "user_id": int(params["user"]) if params.get("user") else None,
+            "start": parse_time(params["from"]) if params.get("from") else None,
+            "end": parse_time(params["to"], end=True) if params.get("to") else None,
+        }
+    except ValueError:
+        return JsonResponse(
+            {"error": "movie and user take ids, from/to take YYYY-MM-DD or a Unix timestamp"}, status=400
+        )
+
+    compress = params.get("gzip") in ("1", "true", "yes")
+    content, content_type, filename = stream_export(kind, fmt, compress=compress, **filters)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_ratings(request):
+    """
+    Stream ratings as CSV (default) or NDJSON: ?format=csv|ndjson
+    Filters: movie, user, from, to (YYYY-MM-DD or Unix timestamp, inclusive).
+    ?gzip=1 compresses the stream on the fly (ratings.csv.gz).
+    """
+    return _export(request, "ratings")
+
+
+def export_tags(request):
+    """Stream tags, with the same formats and filters as export_ratings."""
+    return _export(request, "tags")
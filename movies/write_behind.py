@@ -0,0 +1,214 @@
+"""
+Write-behind buffer for incoming ratings.
+
+Under SQLite every writer serializes on one database lock, so a burst of
+rating submissions turns into web latency. In write-behind mode the request
+only validates the records and appends them to a Redis stream; the
+flush_rating_buffer Celery task (run by Beat every few seconds) drains the
+stream through a consumer group in large batches, one transaction per
+batch, then acknowledges and deletes the entries.
+
+Delivery is at-least-once: entries of a batch that failed, or of a worker
+that died, stay pending and are claimed again after RATINGS_FLUSH_CLAIM_IDLE.
+Replays are harmless because the write is an upsert on (user, movie) that
+skips rows older than the stored rating. A failed batch does not stop the
+run, later entries are still flushed. Entries delivered
+RATINGS_FLUSH_MAX_DELIVERIES times are written one by one, and those that
+still fail are moved to the RATINGS_DEAD_LETTER_STREAM stream with their
+error, so one bad record can't hold the buffer back.
+
+If Redis is unreachable, enqueue_ratings() raises RedisError and the
+caller writes synchronously instead.
+"""
+import logging
+import os
+import socket
+import time
+import redis
+from django.conf import settings
+from .ingest import write_ratings
+
+GROUP = 'ratings-flush'
+LAST_FLUSH_KEY = 'ratings:flush:last'
+FIELDS = ('user_id', 'movie_id', 'rating', 'timestamp')
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+
+def get_redis_client():
+    """Process-wide client for REDIS_URL (not the cache or broker database)."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            decode_responses=True,
+        )
+    return _client
+
+
+def _consumer_name():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def ensure_group(client):
+    try:
+        client.xgroup_create(settings.RATINGS_STREAM, GROUP, id='0', mkstream=True)
+    except redis.ResponseError as exc:
+        if 'BUSYGROUP' not in str(exc):
+            raise
+
+
+def enqueue_ratings(rows):
+    """
+    Append validated {(user_id, movie_id): (rating, timestamp)} rows to the
+    stream in one pipeline round trip. Returns the number queued.
+    """
+    client = get_redis_client()
+    pipe = client.pipeline(transaction=False)
+    for (user_id, movie_id), (rating, timestamp) in rows.items():
+        pipe.xadd(settings.RATINGS_STREAM, {
+            'user_id': user_id, 'movie_id': movie_id, 'rating': rating, 'timestamp': timestamp,
+        })
+    pipe.execute()
+    return len(rows)
+
+
+def _parse(entries):
+    """Stream entries -> ordered {(user_id, movie_id): (rating, timestamp)}, last one wins."""
+    rows = {}
+    for _, fields in entries:
+        try:
+            key = (int(fields['user_id']), int(fields['movie_id']))
+            value = (float(fields['rating']), int(fields['timestamp']))
+        except (KeyError, ValueError):
+            continue  # Malformed entry; acknowledged and dropped with the batch
+        rows.pop(key, None)
+        rows[key] = value
+    return rows
+
+
+def _acknowledge(client, ids):
+    pipe = client.pipeline(transaction=False)
+    pipe.xack(settings.RATINGS_STREAM, GROUP, *ids)
+    pipe.xdel(settings.RATINGS_STREAM, *ids)
+    pipe.execute()
+
+
+def _flush_batch(client, entries):
+    rows = _parse(entries)
+    counts = write_ratings(rows, chunk_size=max(len(rows), 1), newer_only=True)
+    _acknowledge(client, [entry_id for entry_id, _ in entries])
+    return counts
+
+
+def _flush_each(client, entries):
+    """Write entries one by one, dead-lettering those that fail."""
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'dead_lettered': 0}
+    for entry_id, fields in entries:
+        try:
+            for name, n in write_ratings(_parse([(entry_id, fields)]), newer_only=True).items():
+                counts[name] += n
+        except Exception as exc:
+            logger.warning('Dead-lettering rating entry %s: %r', entry_id, exc)
+            client.xadd(settings.RATINGS_DEAD_LETTER_STREAM, {**fields, 'entry_id': entry_id, 'error': repr(exc)})
+            counts['dead_lettered'] += 1
+        _acknowledge(client, [entry_id])
+    return counts
+
+
+def _split_redelivered(client, consumer, entries):
+    """(entries to flush as a batch, entries delivered too often to trust in one)."""
+    if not entries:
+        return [], []
+    pending = client.xpending_range(
+        settings.RATINGS_STREAM, GROUP, min=entries[0][0], max=entries[-1][0],
+        count=len(entries), consumername=consumer,
+    )
+    limit = settings.RATINGS_FLUSH_MAX_DELIVERIES
+    suspect = {p['message_id'] for p in pending if p['times_delivered'] >= limit}
+    return (
+        [entry for entry in entries if entry[0] not in suspect],
+        [entry for entry in entries if entry[0] in suspect],
+    )
+
+
+def flush_ratings(batch_size=None, max_batches=None):
+    """
+    Drain the stream into the ratings table, batch_size entries per
+    transaction, for at most max_batches batches. Returns a summary dict.
+    """
+    batch_size = batch_size or settings.RATINGS_FLUSH_BATCH_SIZE
+    max_batches = max_batches or settings.RATINGS_FLUSH_MAX_BATCHES
+    client = get_redis_client()
+    ensure_group(client)
+    consumer = _consumer_name()
+
+    start = time.perf_counter()
+    summary = {
+        'batches': 0, 'entries': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0,
+        'failed_batches': 0, 'dead_lettered': 0,
+    }
+
+    def add(counts):
+        for name, n in counts.items():
+            summary[name] += n
+
+    # First take over entries left pending by a failed or dead flusher
+    _, entries, _ = client.xautoclaim(
+        settings.RATINGS_STREAM, GROUP, consumer,
+        min_idle_time=settings.RATINGS_FLUSH_CLAIM_IDLE * 1000, start_id='0-0', count=batch_size,
+    )
+    entries, suspect = _split_redelivered(client, consumer, entries)
+    if suspect:
+        add(_flush_each(client, suspect))
+        summary['entries'] += len(suspect)
+    while summary['batches'] < max_batches:
+        if not entries:
+            response = client.xreadgroup(GROUP, consumer, {settings.RATINGS_STREAM: '>'}, count=batch_size)
+            entries = response[0][1] if response else []
+        if not entries:
+            break
+        summary['batches'] += 1
+        try:
+            add(_flush_batch(client, entries))
+            summary['entries'] += len(entries)
+        except Exception:
+            # Left pending: retried after RATINGS_FLUSH_CLAIM_IDLE, one by one
+            # once delivered RATINGS_FLUSH_MAX_DELIVERIES times
+            logger.exception('Rating flush batch of %d entries failed', len(entries))
+            summary['failed_batches'] += 1
+        entries = []
+
+    summary['duration_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    if summary['entries'] or summary['failed_batches']:
+        client.hset(LAST_FLUSH_KEY, mapping={'at': time.time(), **summary})
+    return summary
+
+
+def buffer_metrics():
+    """Lag of the write-behind buffer: entries waiting, pending, oldest age."""
+    client = get_redis_client()
+    ensure_group(client)
+    stream = settings.RATINGS_STREAM
+    waiting = client.xlen(stream)
+    pending = client.xpending(stream, GROUP)['pending']
+    dead_letters = client.xlen(settings.RATINGS_DEAD_LETTER_STREAM)
+    oldest = client.xrange(stream, count=1)
+    # Stream ids start with the append time in milliseconds
+    oldest_age = time.time() - int(oldest[0][0].split('-')[0]) / 1000 if oldest else 0.0
+    last_flush = client.hgetall(LAST_FLUSH_KEY)
+    return {
+        'stream': stream,
+        'buffered': waiting,
+        'pending_delivery': pending,
+        'dead_letters': dead_letters,
+        'oldest_age_seconds': round(oldest_age, 3),
+        'last_flush': {
+            **last_flush,
+            'seconds_ago': round(time.time() - float(last_flush['at']), 1),
+        } if last_flush else None,
+    }
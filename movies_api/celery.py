@@ -3,6 +3,7 @@ Celery Configuration for movies_api project
 """
 import os
 from celery import Celery
+from celery.schedules import crontab
 
 # Set default Django settings module for 'celery' program
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'movies_api.settings')
@@ -24,6 +25,35 @@ app.conf.beat_schedule = {
         'task': 'movies.tasks.scheduled_task_every_3_min',
         'schedule': 180.0,  # 3 minutes = 180 seconds
     },
+    'flush-rating-buffer': {
+        'task': 'movies.tasks.flush_rating_buffer',
+        'schedule': 5.0,  # Write-behind ratings reach the database within ~5 seconds
+    },
+    'refresh-trending': {
+        'task': 'movies.tasks.refresh_trending',
+        'schedule': 60.0,  # Only ratings past the checkpoint are read
+    },
+    'rating-rollups-every-3-minutes': {
+        'task': 'movies.tasks.refresh_rating_rollups',
+        'schedule': 180.0,  # Incremental, only months with new ratings
+    },
+    'rating-rollups-full-nightly': {
+        'task': 'movies.tasks.refresh_rating_rollups',
+        'schedule': crontab(hour=2, minute=30),
+        'kwargs': {'full': True},  # Also picks up deleted ratings
+    },
+    'ratings-snapshot-hourly': {
+        'task': 'movies.tasks.refresh_ratings_snapshot',
+        'schedule': crontab(minute=15),  # Every hour at :15
+    },
+    'item-similarities-nightly': {
+        'task': 'movies.tasks.build_item_similarities',
+        'schedule': crontab(hour=3, minute=0),  # Every day at 03:00
+    },
+    'train-recommender-nightly': {
+        'task': 'movies.tasks.train_recommender',
+        'schedule': crontab(hour=4, minute=0),  # Every day at 04:00
+    },
 }
 
 @app.task(bind=True, ignore_result=True)
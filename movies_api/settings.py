@@ -171,6 +171,14 @@ CACHES = {
     }
 }
 
+# Two-tier cache (movies.cache_utils)
+CACHE_LOCAL_MAX_ENTRIES = 1024  # In-process LRU size
+CACHE_LOCAL_TTL = 5  # Seconds a value may be served from process memory
+CACHE_STALE_TTL = 300  # Seconds an expired value is served while refreshing
+CACHE_LOCK_TIMEOUT = 30  # Single-flight recompute lock
+CACHE_LOCK_WAIT = 5  # How long lock losers wait for the winner's value
+CACHE_XFETCH_BETA = 1.0  # Early refresh eagerness, 0 disables it
+
 # ============================================
 # Celery Configuration (Redis as Message Broker)
 # ============================================
@@ -189,10 +197,66 @@ CELERY_RESULT_EXTENDED = True  # Store additional task metadata
 CELERY_TASK_TRACK_STARTED = True  # Track when tasks start
 CELERY_TASK_TIME_LIMIT = 30 * 60  # Task timeout: 30 minutes
 CELERY_TASK_SOFT_TIME_LIMIT = 25 * 60  # Soft timeout: 25 minutes (warning)
+CELERY_RESULT_EXPIRES = 60 * 60 * 24  # Results kept 1 day in the backend
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1  # Long chunk tasks spread over all processes instead of queueing behind one
+
+# Task status API (movies.task_status)
+TASK_STATUS_MAX_WAIT = 30  # Seconds a long-poll request may wait for a change
+TASK_STATUS_POLL_INTERVAL = 0.5  # Seconds between result-backend reads while waiting
+TASK_EVENTS_MAX_SECONDS = 300  # Lifetime of one Server-Sent Events stream
+
+# Deduplicated heavy tasks (movies.task_dedup)
+TASK_DEDUP_INFLIGHT_TTL = CELERY_TASK_TIME_LIMIT + 60  # A lost task stops blocking retries after this
+TASK_DEDUP_RESULT_TTL = 60 * 60 * 6  # A finished result is reused this long (must be < CELERY_RESULT_EXPIRES)
+
+MOVIE_STATS_CHUNK_SIZE = 2000  # Movies per movie_stats_chunk task (~30 chunks for 60k movies)
 
 # Celery Beat (Periodic Tasks Scheduler) - Optional
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'  # If using django-celery-beat
 
+# ============================================
+# Rating Ingestion
+# ============================================
+RATINGS_BATCH_MAX_RECORDS = 10000  # Per POST /api/ratings/batch/
+RATINGS_BATCH_CHUNK_SIZE = 1000  # Records upserted per transaction
+EXPORT_CHUNK_SIZE = 5000  # Rows read and encoded at a time by /api/export/
+
+# Write-behind mode (movies.write_behind): requests append to a Redis stream,
+# the flush_rating_buffer Beat task drains it into the ratings table
+REDIS_URL = 'redis://127.0.0.1:6379/2'  # Database 2 for application data
+REDIS_SOCKET_TIMEOUT = 1.0  # Seconds before falling back to a synchronous write
+RATINGS_WRITE_BEHIND = False  # Default mode, ?write_behind=1/0 overrides it
+RATINGS_STREAM = 'ratings:incoming'
+RATINGS_FLUSH_BATCH_SIZE = 5000  # Stream entries per transaction
+RATINGS_FLUSH_MAX_BATCHES = 20  # Per task run
+RATINGS_FLUSH_CLAIM_IDLE = 60  # Seconds before another flusher retries a pending entry
+RATINGS_FLUSH_MAX_DELIVERIES = 3  # Then entries are retried one by one, failures dead-lettered
+RATINGS_DEAD_LETTER_STREAM = 'ratings:dead-letter'
+
+# Trending movies (movies.trending): decayed rating counts in Redis (REDIS_URL)
+TRENDING_HALF_LIFE_HOURS = 72  # A rating counts half as much three days later
+TRENDING_TOP_K = 100  # Movies kept in the ready-sorted top list
+TRENDING_LOCK_TIMEOUT = 300  # Seconds; one refresh at a time
+
+# ============================================
+# Offline Analytics (precomputed NumPy arrays)
+# ============================================
+# Versioned .npy stores written by Celery jobs and memory-mapped by web workers
+ANALYTICS_DIR = BASE_DIR / 'analytics'
+
+# Genre bitsets (movies.genre_index)
+GENRE_INDEX_REBUILD_DELAY = 10  # Seconds; catalog edits within this window share one rebuild
+
+# Item-item recommender (movies.similarity)
+SIMILAR_MOVIES_TOP_K = 50  # Neighbours stored per movie
+SIMILARITY_MEMORY_MB = 512  # Budget for the dense score blocks of all threads together
+
+# Per-user recommender, implicit ALS (movies.factorization)
+RECOMMENDER_FACTORS = 64
+RECOMMENDER_ITERATIONS = 10
+RECOMMENDER_REGULARIZATION = 0.1
+RECOMMENDER_ALPHA = 10.0  # Confidence = 1 + alpha * rating
+
 # ============================================
 # PER-SITE CACHE (Site-Wide Caching)
 # ============================================